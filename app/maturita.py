@@ -1,50 +1,45 @@
-
 import sys
-import json
-import shutil
+import bisect
+import multiprocessing
 import os
 import pathlib
+import threading
+import time
+import traceback
+from collections import Counter
 from typing import Dict, List, Optional, Tuple
-from urllib.parse import quote
+
+# časy fází startu (import, load_state, build_ui, první vykreslení); výpis s MATURITA_TIMING=1
+STARTUP_MARKS: List[Tuple[str, float]] = [("start", time.perf_counter())]
+
+def mark_startup(phase: str):
+    STARTUP_MARKS.append((phase, time.perf_counter()))
+
+def startup_report() -> str:
+    parts = [f"{name} {(t - prev) * 1000:.0f} ms" for (_, prev), (name, t) in zip(STARTUP_MARKS, STARTUP_MARKS[1:])]
+    total = (STARTUP_MARKS[-1][1] - STARTUP_MARKS[0][1]) * 1000
+    return f"Start: {', '.join(parts)} (celkem {total:.0f} ms)"
 
 from PySide6.QtWidgets import (
     QApplication, QWidget, QHBoxLayout, QVBoxLayout, QPushButton, QListWidget,
     QListWidgetItem, QLabel, QTextEdit, QFileDialog, QListView, QSplitter,
     QComboBox, QMessageBox, QAbstractItemView, QFrame, QStyledItemDelegate,
-    QStyleOptionViewItem, QTabWidget
+    QStyleOptionViewItem, QTabWidget, QLineEdit, QTableWidget, QTableWidgetItem, QHeaderView, QDialog
+)
+from PySide6.QtGui import Qt, QDragEnterEvent, QDropEvent, QDesktopServices, QColor, QFont, QFontMetrics, QPalette, QBrush, QIcon, QTextCursor
+from PySide6.QtCore import QUrl, QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, QTimer, Signal
+
+from maturita_core import (
+    attachment_digest, attachment_name, attachment_path, attachment_refs, AUTO_BACKUP, AUTO_SAVE, backup_due,
+    BACKUP_INTERVAL, BOOKS, cached_attachment_text, CATALOG, ClassDashboard, CATALOG_WARNINGS, czech_key, DB_FILE, expand_paths, ImportCancelled, list_backups,
+    load_state_synced, merge_entry, new_entry, note_terms, NotesHistory, NotesIndex, ORIGINAL_20, remove_attachment_files, RESOURCE_DIR, restore_backup, RULES, RuleSolver,
+    RuleTally, create_backup, scan_attachments, SqliteStore, StateSaver, store_attachment, traced, tracing_from_env, disable_tracing,
+    USE_SQLITE, VIOLATION_LABELS
 )
-from PySide6.QtGui import Qt, QDragEnterEvent, QDropEvent, QDesktopServices, QColor, QFont, QFontMetrics, QPalette, QBrush, QIcon
-from PySide6.QtCore import QUrl
-
-RESOURCE_DIR = pathlib.Path(getattr(sys, "_MEIPASS", pathlib.Path(__file__).parent))
-
-def _get_appdata_dir():
-    # prefer Windows APPDATA, then XDG_CONFIG_HOME / LOCALAPPDATA, fall back to home
-    appdata = os.environ.get("APPDATA") or os.environ.get("XDG_CONFIG_HOME") or os.environ.get("LOCALAPPDATA")
-    if appdata:
-        return pathlib.Path(appdata)
-    return pathlib.Path.home()
-
-# Always use AppData (or fallback) as the persistent storage location
-BASE_DIR = _get_appdata_dir() / "MaturitaApp"
-
-# Ensure directory exists; if creation fails, fall back to user home
-try:
-    BASE_DIR.mkdir(parents=True, exist_ok=True)
-except Exception:
-    BASE_DIR = pathlib.Path.home() / "MaturitaApp"
-    BASE_DIR.mkdir(parents=True, exist_ok=True)
-
-DATA_FILE = BASE_DIR / "maturita_data.json"
-ATTACH_DIR = BASE_DIR / "attachments"
-ATTACH_DIR.mkdir(parents=True, exist_ok=True)
 
 # Keep APP_DIR pointing to the resource dir so icon loading still works
 APP_DIR = RESOURCE_DIR
 
-# keep any existing flag you use
-AUTO_SAVE = True
-
 COLOR_BG = "#2b2b2b"
 COLOR_TEXT = "#ffffff"
 COLOR_ALTERNATE = "#333333"
@@ -55,179 +50,313 @@ COLOR_RIGHT_BG = "#252525"
 COLOR_SEPARATOR = "#444444"
 COLOR_OK = "#7CFC00"
 COLOR_BAD = "#ff4d4d"
+COLOR_BLOCKED = "#777777"
 
-# (BOOKS + ORIGINAL_20 + RULES remain the same as v předchozím souboru)
-# Kopíruju sem pro úplnost — uprav si podle potřeby.
-
-BOOKS = [
-    {"author": "Dante Alighieri", "title": "Božská komedie", "genre": "Poezie", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "Giovanni Boccaccio", "title": "Dekameron", "genre": "Próza", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "Jan Amos Komenský", "title": "Labyrint světa a ráj srdce", "genre": "Próza", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "William Shakespeare", "title": "Hamlet", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "Molière", "title": "Lakomec", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "William Shakespeare", "title": "Othello", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "Daniel Defoe", "title": "Robinson Crusoe", "genre": "Próza", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "William Shakespeare", "title": "Romeo a Julie", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "Carlo Goldoni", "title": "Sluha dvou pánů", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "Johann Wolfgang Goethe", "title": "Utrpení mladého Werthera", "genre": "Próza", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "Molière", "title": "Zdravý nemocný", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "William Shakespeare", "title": "Zkrocení zlé ženy", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
-
-    {"author": "Božena Němcová", "title": "Babička", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Božena Němcová", "title": "Divá Bára", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Viktor Hugo", "title": "Chrám Matky Boží v Paříži", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Karel Havlíček Borovský", "title": "Král Lávra", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Karel Jaromír Erben", "title": "Kytice", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Karel Hynek Mácha", "title": "Máj", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Jaroslav Vrchlický", "title": "Noc na Karlštejně", "genre": "Drama", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Svatopluk Čech", "title": "Pán Brouček - výlet", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Gustave Flaubert", "title": "Paní Bovaryová", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Jan Neruda", "title": "Povídky malostranské", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Nikolaj Vasiljevič Gogol", "title": "Revizor", "genre": "Drama", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Josef Kajetán Tyl", "title": "Strakonický dudák", "genre": "Drama", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Karel Havlíček Borovský", "title": "Tyrolské elegie", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Edgar Allan Poe", "title": "Vraždy v ulici Morgue", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Božena Němcová", "title": "V zámku a v podzámčí", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Fjodor Michajlovič Dostojevskij", "title": "Zločin a trest", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-
-    {"author": "Erich Maria Remarque", "title": "Cesta zpátky", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Mika Waltari", "title": "Egypťan Sinuhet", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "George Orwell", "title": "Farma zvířat", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Joseph Heller", "title": "Hlava XXII", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Alberto Moravia", "title": "Horalka", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Umberto Eco", "title": "Jméno růže", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Gabriel García Márquez", "title": "Kronika ohlášené smrti", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Vladimir Nabokov", "title": "Lolita", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Ray Bradbury", "title": "Marťanská kronika", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Jack Kerouac", "title": "Na cestě", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Erich Maria Remarque", "title": "Na západní frontě klid", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Romain Rolland", "title": "Petr a Lucie", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Ernest Hemingway", "title": "Sbohem, armádo", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Ernest Hemingway", "title": "Stařec a moře", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "William Styron", "title": "Sophiina volba", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Erich Maria Remarque", "title": "Tři kamarádi", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Francis Scott Fitzgerald", "title": "Veliký Gatsby", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-
-    {"author": "Michal Viewegh", "title": "Báječná léta pod psa", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Karel Čapek", "title": "Bílá nemoc", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Karel Poláček", "title": "Bylo nás pět", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Zdeněk Svěrák a Ladislav Smoljak", "title": "České nebe", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Ota Pavel", "title": "Jak jsem potkal ryby", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Květa Legátová", "title": "Jozova Hanule", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Pavel Kohout", "title": "Katyně", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Viktor Dyk", "title": "Krysař", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Vítězslav Nezval", "title": "Manon Lescaut", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Vladislav Vančura", "title": "Markéta Lazarová", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Radek John", "title": "Memento", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Arnošt Lustig", "title": "Modlitba pro Kateřinu Horovitzovou", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Rudolf Křesťan", "title": "Myš v 11. patře", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Ivan Olbracht", "title": "Nikola Šuhaj loupežník", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Bohumil Hrabal", "title": "Obsluhoval jsem anglického krále", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Bohumil Hrabal", "title": "Ostře sledované vlaky", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Jaroslav Hašek", "title": "Osudy dobrého vojáka Švejka za světové války", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Karel Čapek", "title": "Povídky z jedné a druhé kapsy", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Franz Kafka", "title": "Proměna", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Jan Otčenášek", "title": "Romeo, Julie a tma", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Karel Čapek", "title": "R.U.R.", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Petr Bezruč", "title": "Slezské písně", "genre": "Poezie", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Ota Pavel", "title": "Smrt krásných srnců", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Ladislav Fuks", "title": "Spalovač mrtvol", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Michal Viewegh", "title": "Švédské stoly aneb Jací jsme", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Karel Čapek", "title": "Trapné povídky", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Michal Viewegh", "title": "Účastníci zájezdu", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Karel Čapek", "title": "Válka s Mloky", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Karel Čapek", "title": "Výlet do Španěl", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Josef Škvorecký", "title": "Zbabělci", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Viktor Dyk", "title": "Zmoudření Dona Quijota", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Milan Kundera", "title": "Žert", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-]
-
-ORIGINAL_20 = [
-    {"author": "Molière", "title": "Lakomec", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "Carlo Goldoni", "title": "Sluha dvou pánů", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
-    {"author": "Božena Němcová", "title": "Babička", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Karel Havlíček Borovský", "title": "Král Lávra", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Karel Jaromír Erben", "title": "Kytice", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Nikolaj Vasiljevič Gogol", "title": "Revizor", "genre": "Drama", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Karel Havlíček Borovský", "title": "Tyrolské elegie", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Edgar Allan Poe", "title": "Vraždy v ulici Morgue", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
-    {"author": "Erich Maria Remarque", "title": "Cesta zpátky", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Erich Maria Remarque", "title": "Na západní frontě klid", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Romain Rolland", "title": "Petr a Lucie", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Francis Scott Fitzgerald", "title": "Veliký Gatsby", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
-    {"author": "Zdeněk Svěrák a Ladislav Smoljak", "title": "České nebe", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Ota Pavel", "title": "Jak jsem potkal ryby", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Bohumil Hrabal", "title": "Obsluhoval jsem anglického krále", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Bohumil Hrabal", "title": "Ostře sledované vlaky", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Jaroslav Hašek", "title": "Osudy dobrého vojáka Švejka za světové války", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Franz Kafka", "title": "Proměna", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Karel Čapek", "title": "R.U.R.", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
-    {"author": "Ota Pavel", "title": "Smrt krásných srnců", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
-]
-
-RULES = {
-    "total": 20,
-    "section_counts": {
-        "Světová a česká literatura do konce 18. stol.": 2,
-        "Světová a česká literatura do konce 19. stol.": 3,
-        "Světová literatura 20. a 21. stol.": 4,
-        "Česká literatura 20. a 21. stol.": 5,
-    },
-    "genre_min_each": 2,
-    "max_per_author": 2,
-}
-
-# ---------- persistence helpers (upraveno) ----------
-def make_id(item: Dict):
-    key = f"{item['author']}|{item['title']}"
-    return quote(key, safe='')
-
-def load_state() -> Tuple[Dict[str, dict], Optional[List[str]]]:
+# měření s MATURITA_TRACE: tep smyčky událostí a od jakého zpoždění jde o zaseknutí (zapisuje se do trace)
+HEARTBEAT_MS = 50
+STALL_MS = 100
+
+# text poznámek se z dokumentu převezme po chvíli klidu, při souvislém psaní nejpozději po NOTES_MAX_DELAY
+NOTES_IDLE_MS = 400
+NOTES_MAX_DELAY = 5.0   # s
+
+# první automatická záloha až chvíli po startu, ať nebrzdí načítání; dál každých BACKUP_INTERVAL
+BACKUP_FIRST_DELAY_MS = 30_000
+
+class LatencyMonitor(QObject):
     """
-    Vrací (entries, custom_selection).
-    - entries: mapping id -> {completed, notes, attachments}
-    - custom_selection: seznam id nebo None
-    Tento formát je tolerantní i k dřívějšímu souboru (pokud byl uložen pouze dict entries).
+    Tep smyčky událostí: QTimer každých HEARTBEAT_MS. O kolik tik přijde později, tak dlouho byla
+    smyčka zablokovaná – každé zpoždění jde do p50/p99, zaseknutí nad STALL_MS i do trace.
     """
-    if DATA_FILE.exists():
+    def __init__(self, tracer, parent=None):
+        super().__init__(parent)
+        self.tracer = tracer
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(HEARTBEAT_MS)
+        self.timer.timeout.connect(self._tick)
+        self._last = 0.0
+
+    def start(self):
+        self._last = time.perf_counter()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def _tick(self):
+        now = time.perf_counter()
+        lag = max(0.0, (now - self._last) * 1000 - HEARTBEAT_MS)
+        self._last = now
+        self.tracer.record("event_loop", lag, log=lag >= STALL_MS)
+
+class FeasibilitySignals(QObject):
+    done = Signal(int, dict)
+
+class FeasibilityTask(QRunnable):
+    """Na pozadí spočítá, které nevybrané knihy by DIY výběr udělaly neřešitelným."""
+    def __init__(self, generation: int, solver: "RuleSolver", selected: List[Dict]):
+        super().__init__()
+        self.generation = generation
+        self.solver = solver
+        self.selected = selected
+        self.signals = FeasibilitySignals()
+
+    def run(self):
         try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                raw = json.load(f)
-            if isinstance(raw, dict) and "entries" in raw:
-                entries = raw.get("entries", {})
-                custom = raw.get("custom_selection")
-                return entries, custom
-            else:
-                # starý formát: celý file je entries dict
-                return raw, None
+            blocked = self.solver.blocked_additions(self.selected)
         except Exception:
-            return {}, None
-    return {}, None
+            traceback.print_exc()
+            return
+        try:
+            self.signals.done.emit(self.generation, blocked)
+        except RuntimeError:
+            pass    # okno se mezitím zavřelo a signálový objekt už neexistuje
+
+class ImportSignals(QObject):
+    # index souboru, počet souborů, jméno, fáze, hotovo v souboru, velikost souboru, hotovo celkem, celkem
+    progress = Signal(int, int, str, str, int, int, int, int)
+    # id díla, nové přílohy, chyby (cesta, text), zrušeno
+    finished = Signal(str, list, list, bool)
+
+class AttachmentImportTask(QRunnable):
+    """Ukládá soubory do úložiště příloh mimo GUI vlákno; výsledek předá najednou signálem finished."""
+    PROGRESS_EVERY = 0.05   # s – častěji GUI stejně nepřekreslí
 
-def save_state(entries: Dict[str, dict], custom_selection: Optional[List[str]] = None):
+    def __init__(self, bid: str, paths: List[str]):
+        super().__init__()
+        self.bid = bid
+        self.paths = paths
+        self.signals = ImportSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @traced("import_attachments")
+    def run(self):
+        added, errors = [], []
+        try:
+            files = expand_paths(self.paths)
+            sizes = []
+            for p in files:
+                try:
+                    sizes.append(os.path.getsize(p))
+                except OSError:
+                    sizes.append(0)
+            total = sum(sizes)
+            done_before = 0
+            for i, p in enumerate(files):
+                if self._cancel.is_set():
+                    raise ImportCancelled()
+                name = os.path.basename(p)
+                size = sizes[i]
+                seen = {"hash": 0, "copy": 0}
+                last = [0.0]
+
+                def on_chunk(phase, n):
+                    if self._cancel.is_set():
+                        raise ImportCancelled()
+                    seen[phase] += n
+                    now = time.monotonic()
+                    if now - last[0] >= self.PROGRESS_EVERY:
+                        last[0] = now
+                        self.signals.progress.emit(i, len(files), name, phase, seen[phase], size,
+                                                   done_before + seen["hash"], total)
+
+                self.signals.progress.emit(i, len(files), name, "hash", 0, size, done_before, total)
+                try:
+                    added.append(store_attachment(p, on_chunk))
+                except ImportCancelled:
+                    raise
+                except Exception as e:
+                    errors.append((p, str(e)))
+                done_before += size
+        except ImportCancelled:
+            self.signals.finished.emit(self.bid, [], errors, True)
+            return
+        except Exception:
+            traceback.print_exc()
+        self.signals.finished.emit(self.bid, added, errors, False)
+
+class TextSignals(QObject):
+    # cesta k souboru, hash obsahu, slova textu (Counter z note_terms)
+    extracted = Signal(str, str, object)
+    finished = Signal()
+
+class AttachmentTextTask(QRunnable):
     """
-    Uloží do DATA_FILE objekt { entries: {...}, custom_selection: [...] }
+    Projde přílohy, vytáhne jejich text (z cache, nebo nově) a spočítá jeho slova. GUI vlákno
+    pak jen promítne hotový Counter do indexu – skládání až 2M znaků na přílohu ho neblokuje.
     """
-    data = {"entries": entries}
-    if custom_selection is not None:
-        data["custom_selection"] = custom_selection
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-# (ostatní utility: copy_attachment, NotesEdit, KeepColorDelegate - beze změny)
-def copy_attachment(src_path: str) -> str:
-    src = pathlib.Path(src_path)
-    if not src.exists():
-        raise FileNotFoundError(src_path)
-    dest = ATTACH_DIR / src.name
-    base = dest.stem
-    ext = dest.suffix
-    i = 1
-    while dest.exists():
-        dest = ATTACH_DIR / f"{base}_{i}{ext}"
-        i += 1
-    shutil.copy2(src, dest)
-    return dest.name
+    def __init__(self, items: List[Tuple[str, Optional[str]]]):
+        super().__init__()
+        self.items = items    # (cesta, hash obsahu nebo None)
+        self.signals = TextSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        for path, digest in self.items:
+            if self._cancel.is_set():
+                break
+            try:
+                if not os.path.isfile(path):
+                    continue
+                digest, text = cached_attachment_text(pathlib.Path(path), digest)
+                terms = note_terms(text) if text else None
+            except Exception:
+                traceback.print_exc()
+                continue
+            if terms:
+                self.signals.extracted.emit(path, digest, terms)
+        self.signals.finished.emit()
+
+class DashboardSignals(QObject):
+    progress = Signal(int, int)
+    finished = Signal(object)    # stats z ClassDashboard.refresh, None při chybě
+
+class DashboardTask(QRunnable):
+    """Obnoví přehled třídy mimo GUI vlákno; změněné soubory čte ClassDashboard v procesech."""
+    def __init__(self, folder: str):
+        super().__init__()
+        self.dashboard = ClassDashboard(folder)
+        self.signals = DashboardSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            stats = self.dashboard.refresh(progress=self.signals.progress.emit, cancelled=self._cancel.is_set)
+        except Exception:
+            traceback.print_exc()
+            stats = None
+        try:
+            self.signals.finished.emit(stats)
+        except RuntimeError:
+            pass    # okno už je zavřené
+
+class ScanSignals(QObject):
+    progress = Signal(object, object)    # zahashováno bajtů, celkem (může přesáhnout 32 bitů)
+    finished = Signal(object)            # výsledek scan_attachments, None při chybě
+
+class AttachmentScanTask(QRunnable):
+    """Kontrola ATTACH_DIR proti odkazům ze stavu; hashe počítá scan_attachments ve vláknech."""
+    def __init__(self, refs):
+        super().__init__()
+        self.refs = refs
+        self.signals = ScanSignals()
+        self._cancel = threading.Event()
+        self._last_emit = 0.0
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _progress(self, done, total):
+        now = time.monotonic()
+        if now - self._last_emit >= 0.05 or done >= total:
+            self._last_emit = now
+            self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            report = scan_attachments(self.refs, progress=self._progress, cancelled=self._cancel.is_set)
+        except Exception:
+            traceback.print_exc()
+            report = None
+        try:
+            self.signals.finished.emit(report)
+        except RuntimeError:
+            pass    # okno už je zavřené
+
+class BackupSignals(QObject):
+    finished = Signal(object)    # výsledek create_backup / restore_backup, None při chybě
+
+class BackupTask(QRunnable):
+    """Záloha dat mimo GUI vlákno; s restore=jméno místo toho obnoví tuto zálohu."""
+    def __init__(self, restore: Optional[str] = None):
+        super().__init__()
+        self.restore = restore
+        self.signals = BackupSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()    # obnova se nepřerušuje, jen záloha
+
+    def run(self):
+        try:
+            if self.restore:
+                result = dict(restore_backup(self.restore), restored=True)
+            else:
+                result = create_backup(cancelled=self._cancel.is_set)
+        except Exception:
+            traceback.print_exc()
+            result = None
+        try:
+            self.signals.finished.emit(result)
+        except RuntimeError:
+            pass    # okno už je zavřené
+
+class SyncSignals(QObject):
+    # z vlákna StateSaveru: {"entries": {id: položka}, "local": {id}, případně "custom_selection"} z jiného okna
+    external = Signal(object)
+
+class NotesHistoryDialog(QDialog):
+    """Seznam uložených verzí poznámek jednoho díla s náhledem; accept() = obnovit vybranou verzi."""
+    def __init__(self, history: NotesHistory, bid: str, title: str, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.bid = bid
+        self.restored_text: Optional[str] = None
+        self.setWindowTitle(f"Historie poznámek – {title}")
+        self.resize(820, 520)
+        lay = QVBoxLayout(self)
+        split = QSplitter(Qt.Horizontal)
+        self.version_list = QListWidget()
+        self.version_list.currentRowChanged.connect(self.on_version_selected)
+        split.addWidget(self.version_list)
+        self.preview = QTextEdit()
+        self.preview.setReadOnly(True)
+        split.addWidget(self.preview)
+        split.setSizes([260, 560])
+        lay.addWidget(split, 1)
+        btns = QHBoxLayout()
+        btns.addStretch()
+        self.btn_restore = QPushButton("Obnovit tuto verzi")
+        self.btn_restore.setEnabled(False)
+        self.btn_restore.clicked.connect(self.restore)
+        btns.addWidget(self.btn_restore)
+        btn_close = QPushButton("Zavřít")
+        btn_close.clicked.connect(self.reject)
+        btns.addWidget(btn_close)
+        lay.addLayout(btns)
+
+        versions = history.versions(bid)
+        # nejnovější nahoře; index verze v UserRole
+        for i, (t, n) in reversed(list(enumerate(versions))):
+            diff = "" if i == 0 else f" ({n - versions[i - 1][1]:+d})"
+            it = QListWidgetItem(f"{time.strftime('%d.%m.%Y %H:%M', time.localtime(t))} · {n} znaků{diff}")
+            it.setData(Qt.UserRole, i)
+            self.version_list.addItem(it)
+        if not versions:
+            self.version_list.addItem(QListWidgetItem("Zatím žádné uložené verze"))
+
+    def on_version_selected(self, row: int):
+        it = self.version_list.item(row)
+        index = it.data(Qt.UserRole) if it is not None else None
+        if index is None:
+            self.btn_restore.setEnabled(False)
+            return
+        self.preview.setPlainText(self.history.text_at(self.bid, index))
+        self.btn_restore.setEnabled(True)
+
+    def restore(self):
+        self.restored_text = self.preview.toPlainText()
+        self.accept()
 
 class NotesEdit(QTextEdit):
     def __init__(self, parent=None, on_files_dropped=None):
@@ -264,6 +393,195 @@ class KeepColorDelegate(QStyledItemDelegate):
             opt.palette.setColor(QPalette.HighlightedText, color)
         super().paint(painter, opt, index)
 
+class BookListModel(QAbstractListModel):
+    """
+    Model hlavního seznamu nad katalogem. Žádné položky per řádek – text, barva
+    dokončení, zebra pozadí a písmo se vrací z data() a brush/font jsou sdílené.
+    """
+    def __init__(self, state: Dict[str, dict], parent=None):
+        super().__init__(parent)
+        self.state = state
+        self.books: List[Dict] = []
+        self.ids: List[str] = []
+        self.row_of: Dict[str, int] = {}
+        self._fg_done = QBrush(QColor(COLOR_COMPLETED))
+        self._fg_text = QBrush(QColor(COLOR_TEXT))
+        self._bg = (QBrush(QColor(COLOR_ALTERNATE)), QBrush(QColor(COLOR_ALTERNATE2)))
+        self._font = QFont()
+        self._font.setPointSize(10)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.books)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        b = self.books[row]
+        if role == Qt.DisplayRole:
+            return f"{b['author']} — {b['title']}"
+        if role == Qt.ForegroundRole:
+            completed = self.state.get(self.ids[row], {}).get("completed", False)
+            return self._fg_done if completed else self._fg_text
+        if role == Qt.BackgroundRole:
+            return self._bg[row % 2]
+        if role == Qt.FontRole:
+            return self._font
+        if role == Qt.ToolTipRole:
+            return f"{b['genre']} — {b['section']}"
+        if role == Qt.UserRole:
+            return self.ids[row]
+        return None
+
+    def set_books(self, books: List[Dict]):
+        """Nový obsah seznamu. Pokud jde jen o jiné pořadí stejných knih, stačí layoutChanged."""
+        ids = [CATALOG.id_of(b) for b in books]
+        if len(ids) == len(self.ids) and set(ids) == set(self.ids):
+            self.layoutAboutToBeChanged.emit()
+            new_row = {bid: r for r, bid in enumerate(ids)}
+            old = self.persistentIndexList()
+            self.changePersistentIndexList(old, [self.index(new_row[self.ids[i.row()]]) for i in old])
+            self.books, self.ids, self.row_of = list(books), ids, new_row
+            self.layoutChanged.emit()
+        else:
+            self.beginResetModel()
+            self.books, self.ids = list(books), ids
+            self.row_of = {bid: r for r, bid in enumerate(ids)}
+            self.endResetModel()
+
+    def refresh_rows(self):
+        """Přebarví všechny řádky (změna dokončení u mnoha děl) – jen signál, view překreslí viditelné řádky."""
+        if self.books:
+            self.dataChanged.emit(self.index(0), self.index(len(self.books) - 1), [Qt.ForegroundRole])
+
+    def refresh_row(self, bid: str):
+        """Přebarví jediný řádek podle id – row_of je index, žádné hledání v seznamu."""
+        row = self.row_of.get(bid)
+        if row is not None:
+            idx = self.index(row)
+            self.dataChanged.emit(idx, idx, [Qt.ForegroundRole])
+
+class BookProxyModel(QAbstractListModel):
+    """
+    Řazení a filtr hlavního seznamu nad BookListModel. Zdrojový model drží základní seznam,
+    proxy jen přepočítá mapování řádků – view se nepřestavuje a výběr zůstane na své knize.
+    Klíče pro řazení (czech_key) se počítají jednou na knihu a pole a pořadí se počítá
+    v Pythonu přes sorted(). QSortFilterProxyModel by při každém porovnání volal data()
+    zdrojového modelu (u 10k řádků sekundy) a QAbstractProxyModel vyžaduje index()
+    v Pythonu, který view volá pro každý řádek – proto proxy nad QAbstractListModel.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sort_field: Optional[str] = None
+        self.allowed: Optional[set] = None
+        self._rows: List[int] = []      # řádek proxy -> řádek zdroje
+        self._pos: List[int] = []       # řádek zdroje -> řádek proxy (-1 = odfiltrováno)
+        self._keys: Dict[str, List[str]] = {}
+        self._pending_bids: List[Optional[str]] = []
+        self._source: Optional["BookListModel"] = None
+
+    def sourceModel(self) -> "BookListModel":
+        return self._source
+
+    def setSourceModel(self, model: "BookListModel"):
+        self.beginResetModel()
+        self._source = model
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self._on_source_reset)
+        model.layoutAboutToBeChanged.connect(self._before_reindex)
+        model.layoutChanged.connect(self._on_source_layout)
+        model.dataChanged.connect(self._on_source_data_changed)
+        self._on_source_reset()
+
+    # --- mapování ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def mapToSource(self, index):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return QModelIndex()
+        return self.sourceModel().index(self._rows[index.row()])
+
+    def mapFromSource(self, index):
+        if not index.isValid() or index.row() >= len(self._pos):
+            return QModelIndex()
+        row = self._pos[index.row()]
+        return self.index(row) if row >= 0 else QModelIndex()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        src = self.sourceModel()
+        if role == Qt.BackgroundRole:
+            return src._bg[index.row() % 2]    # zebra podle zobrazeného pořadí
+        return src.data(src.index(self._rows[index.row()]), role)
+
+    # --- přepočet ---
+    def _keys_for(self, field: str) -> List[str]:
+        keys = self._keys.get(field)
+        if keys is None:
+            keys = self._keys[field] = [czech_key(b[field]) for b in self.sourceModel().books]
+        return keys
+
+    def _compute(self):
+        src = self.sourceModel()
+        rows = range(len(src.books))
+        if self.allowed is not None:
+            ids, allowed = src.ids, self.allowed
+            rows = [r for r in rows if ids[r] in allowed]
+        if self.sort_field:
+            rows = sorted(rows, key=self._keys_for(self.sort_field).__getitem__)
+        self._rows = list(rows)
+        self._pos = [-1] * len(src.books)
+        for i, r in enumerate(self._rows):
+            self._pos[r] = i
+
+    def _on_source_reset(self):
+        self._keys.clear()
+        self._compute()
+        self.endResetModel()
+
+    def _before_reindex(self):
+        self.layoutAboutToBeChanged.emit()
+        ids = self.sourceModel().ids
+        self._pending_bids = [ids[self._rows[i.row()]] if i.row() < len(self._rows) else None
+                              for i in self.persistentIndexList()]
+
+    def _after_reindex(self):
+        src_row = self.sourceModel().row_of
+        old = self.persistentIndexList()
+        new = []
+        for i, bid in zip(old, self._pending_bids):
+            row = self._pos[src_row[bid]] if bid in src_row else -1
+            new.append(self.index(row) if row >= 0 else QModelIndex())
+        self.changePersistentIndexList(old, new)
+        self._pending_bids = []
+        self.layoutChanged.emit()
+
+    def _on_source_layout(self):
+        self._keys.clear()
+        self._compute()
+        self._after_reindex()
+
+    def _on_source_data_changed(self, top_left, bottom_right, roles=()):
+        if not self._rows:
+            return
+        if top_left.row() == bottom_right.row():
+            # jeden řádek (přepnutí dokončení) -> jeden řádek i tady, případně nic, když je odfiltrovaný
+            idx = self.mapFromSource(top_left)
+            if idx.isValid():
+                self.dataChanged.emit(idx, idx, roles)
+            return
+        self.dataChanged.emit(self.index(0), self.index(len(self._rows) - 1), roles)
+
+    def set_view(self, sort_field: Optional[str], allowed: Optional[set]):
+        """Nové řazení (pole knihy nebo None = základní pořadí) a filtr (množina id nebo None)."""
+        self._before_reindex()
+        self.sort_field = sort_field
+        self.allowed = allowed
+        self._compute()
+        self._after_reindex()
+
 # ---------------------------
 # MainWindow (hlavní změny: načítání/ukládání custom_selection)
 # ---------------------------
@@ -275,30 +593,58 @@ class MainWindow(QWidget):
         if ico.exists():
             self.setWindowIcon(QIcon(str(ico)))
 
-        entries, custom = load_state()
+        mark_startup("init")
+        self.tracer = tracing_from_env()
+        self.store = None
+        if USE_SQLITE:
+            self.store = SqliteStore(DB_FILE)
+            self.store.migrate_from_json()
+            entries, custom = self.store.load()
+            sync = None
+        else:
+            entries, custom, sync = load_state_synced()
         self.state = entries or {}
         self.custom_selection = custom  # bude buď seznam id nebo None
+        mark_startup("load_state")
 
         # ensure state entries for all BOOKS + ORIGINAL_20
-        for b in BOOKS + ORIGINAL_20:
-            bid = make_id(b)
+        for bid in CATALOG.ids():
             if bid not in self.state:
-                self.state[bid] = {"completed": False, "notes": "", "attachments": []}
+                self.state[bid] = new_entry()
 
         self.current_id = None
-
+        self.notes_dirty = False         # dokument poznámek se liší od state[current_id]["notes"]
+        self._notes_dirty_since = 0.0
+        self._notes_loading = False
+        self.search_ids: Optional[set] = None
+        self.history = NotesHistory()
+        # změny stejných dat z jiného okna hlídá vlákno ukládání, slučují se tady v GUI vlákně
+        self.sync_signals = SyncSignals()
+        self.sync_signals.external.connect(self.apply_external_changes)
+        self.saver = StateSaver(self.state, lambda: self.custom_selection, store=self.store, history=self.history,
+                                sync=sync, on_external=self.sync_signals.external.emit)
+        self.import_tasks: List[AttachmentImportTask] = []
+        self.notes_index = NotesIndex(self.state)
+        # text příloh se indexuje podle hashe obsahu, takže stejný soubor u více děl je v indexu jednou
+        self.attach_index = NotesIndex()
+        self.attach_digest: Dict[str, str] = {}    # cesta -> hash obsahu (známý až po zpracování)
+        self.text_tasks: List[AttachmentTextTask] = []
+        self.dashboard_tasks: List[DashboardTask] = []
+        self.scan_tasks: List[AttachmentScanTask] = []
+        self.backup_tasks: List[BackupTask] = []
+        self.scan_report: Optional[dict] = None
+        self.dashboard_folder: Optional[str] = None
+
+        self._placed = False
+        self.latency_monitor = None
         self.build_ui()
         self.apply_styles()
+        mark_startup("build_ui")
 
         # pokud existuje uložený custom_selection a lze ho sestavit, použij ho; jinak ORIGINAL_20
         if self.custom_selection:
-            selected_books = []
-            for bid in self.custom_selection:
-                # najdeme odpovídající objekt v BOOKS / ORIGINAL_20
-                for b in BOOKS + ORIGINAL_20:
-                    if make_id(b) == bid:
-                        selected_books.append(b)
-                        break
+            # najdeme odpovídající objekty v BOOKS / ORIGINAL_20
+            selected_books = CATALOG.resolve(self.custom_selection)
             if len(selected_books) == RULES['total']:
                 self.populate_list(selected_books)
             else:
@@ -307,6 +653,12 @@ class MainWindow(QWidget):
                 self.populate_list(ORIGINAL_20)
         else:
             self.populate_list(ORIGINAL_20)
+        mark_startup("populate_list")
+
+        self.start_text_extraction([att for e in self.state.values() for att in e.get("attachments", ())])
+        if CATALOG_WARNINGS:
+            self.status.setText(f"Katalog: přeskočeno {len(CATALOG_WARNINGS)} neplatných záznamů")
+            self.status.setToolTip("\n".join(CATALOG_WARNINGS[:50]))
 
     # (zbytek MainWindow je stejný jako předtím, jen všechny volání save_state(...) změněny tak,
     # aby posílaly self.custom_selection jako druhý argument)
@@ -331,14 +683,35 @@ class MainWindow(QWidget):
         self.filter_combo.currentIndexChanged.connect(self.on_filter_changed)
         top.addWidget(self.filter_combo)
         top.addStretch()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Hledat v poznámkách…")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setMinimumWidth(260)
+        self.search_edit.textChanged.connect(self.on_search_changed)
+        self.search_edit.returnPressed.connect(self.open_first_search_result)
+        top.addWidget(self.search_edit)
         tlay.addLayout(top)
 
+        self.search_results = QListWidget()
+        self.search_results.setMaximumHeight(160)
+        self.search_results.itemActivated.connect(self.open_search_result)
+        self.search_results.itemClicked.connect(self.open_search_result)
+        self.search_results.setVisible(False)
+        tlay.addWidget(self.search_results)
+
         splitter = QSplitter(Qt.Horizontal)
-        self.list = QListWidget()
+        self.list_model = BookListModel(self.state, self)
+        self.list_proxy = BookProxyModel(self)
+        self.list_proxy.setSourceModel(self.list_model)
+        self.list = QListView()
+        self.list.setModel(self.list_proxy)
         self.list.setSelectionMode(QAbstractItemView.SingleSelection)
-        self.list.itemClicked.connect(self.on_list_select)
+        self.list.clicked.connect(self.on_list_select)
         self.list.setUniformItemSizes(True)
         self.list.setViewMode(QListView.ListMode)
+        # rozložení dlouhého seznamu po dávkách, ať přeřazení neblokuje jeden snímek
+        self.list.setLayoutMode(QListView.Batched)
+        self.list.setBatchSize(500)
         self.list.setSpacing(2)
         self.list.setItemDelegate(KeepColorDelegate(self.list))
         splitter.addWidget(self.list)
@@ -363,12 +736,24 @@ class MainWindow(QWidget):
         self.btn_attach_add = QPushButton("Přidat soubor")
         self.btn_attach_add.clicked.connect(self.add_attachment_via_dialog)
         btn_row.addWidget(self.btn_attach_add)
+        self.btn_import_cancel = QPushButton("Zrušit import")
+        self.btn_import_cancel.clicked.connect(self.cancel_imports)
+        self.btn_import_cancel.setVisible(False)
+        btn_row.addWidget(self.btn_import_cancel)
         btn_row.addStretch()
+        self.btn_history = QPushButton("Historie poznámek")
+        self.btn_history.clicked.connect(self.show_notes_history)
+        btn_row.addWidget(self.btn_history)
         dlay.addLayout(btn_row)
 
         self.notes = NotesEdit(on_files_dropped=self.handle_files_dropped)
         self.notes.setPlaceholderText("Poznámky k dílu... (sem lze také přetahovat soubory)")
-        self.notes.textChanged.connect(self.on_notes_changed)
+        # contentsChange nese jen (pozice, odebráno, přidáno) – text se nekopíruje při každém úhozu
+        self.notes.document().contentsChange.connect(self.on_notes_contents_change)
+        self.notes_commit_timer = QTimer(self)
+        self.notes_commit_timer.setSingleShot(True)
+        self.notes_commit_timer.setInterval(NOTES_IDLE_MS)
+        self.notes_commit_timer.timeout.connect(self.commit_notes)
         dlay.addWidget(self.notes, 1)
 
         dlay.addWidget(QLabel("Přílohy:"))
@@ -386,8 +771,68 @@ class MainWindow(QWidget):
         tab_main.setLayout(tlay)
         self.tabs.addTab(tab_main, "Seznam")
 
-        # --- DIY tab ---
-        tab_diy = QWidget()
+        # --- DIY tab --- (obsah se postaví až při prvním otevření, viz ensure_diy_tab)
+        self.tab_diy = QWidget()
+        self.diy_built = False
+        self.tabs.addTab(self.tab_diy, "Vytvořit vlastní seznam (DIY)")
+        self.tab_dashboard = QWidget()
+        self.dashboard_built = False
+        self.tabs.addTab(self.tab_dashboard, "Přehled třídy")
+        self.tab_attach_check = QWidget()
+        self.attach_check_built = False
+        self.tabs.addTab(self.tab_attach_check, "Kontrola příloh")
+        self.tab_backups = QWidget()
+        self.backups_built = False
+        self.tabs.addTab(self.tab_backups, "Zálohy")
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+
+        self.backup_timer = QTimer(self)
+        self.backup_timer.setInterval(int(BACKUP_INTERVAL * 1000))
+        self.backup_timer.timeout.connect(self.start_backup)
+        if AUTO_BACKUP:
+            self.backup_timer.start()
+            QTimer.singleShot(BACKUP_FIRST_DELAY_MS, self.backup_if_due)
+
+        if self.tracer is not None:
+            # přehled měření (p50/p99) pod taby, obnovuje se jednou za sekundu
+            self.trace_label = QLabel("")
+            self.trace_label.setStyleSheet("color: #aaaaaa; font-size: 8pt;")
+            root.addWidget(self.trace_label)
+            self.trace_timer = QTimer(self)
+            self.trace_timer.setInterval(1000)
+            self.trace_timer.timeout.connect(self.update_trace_overlay)
+            self.trace_timer.start()
+            self.latency_monitor = LatencyMonitor(self.tracer, self)
+            self.latency_monitor.start()
+
+        self.setLayout(root)
+
+    def update_trace_overlay(self):
+        summary = self.tracer.summary()
+        order = ["event_loop", "populate_list", "update_diy_validation", "handle_files_dropped",
+                 "save_state", "load_state", "saver.write", "store_attachment"]
+        names = [n for n in order if n in summary] + sorted(n for n in summary if n not in order)
+        parts = [f"{n} {summary[n][0]:.1f}/{summary[n][1]:.1f}" for n in names]
+        self.trace_label.setText("p50/p99 ms · " + " · ".join(parts))
+        self.trace_label.setToolTip("\n".join(f"{n}: p50 {p50:.2f} ms, p99 {p99:.2f} ms, vzorků {cnt}"
+                                               for n, (p50, p99, cnt) in ((n, summary[n]) for n in names)))
+
+    def on_tab_changed(self, idx):
+        if self.tabs.widget(idx) is self.tab_diy:
+            self.ensure_diy_tab()
+        elif self.tabs.widget(idx) is self.tab_dashboard:
+            self.ensure_dashboard_tab()
+        elif self.tabs.widget(idx) is self.tab_attach_check:
+            self.ensure_attach_check_tab()
+        elif self.tabs.widget(idx) is self.tab_backups:
+            self.ensure_backups_tab()
+
+    def ensure_diy_tab(self):
+        """Postaví DIY tab (seznam s checkboxy pro celý katalog + kontrola pravidel) při prvním použití."""
+        if self.diy_built:
+            return
+        self.diy_built = True
+        tab_diy = self.tab_diy
         dlay_root = QHBoxLayout(tab_diy)
         left = QWidget()
         left_v = QVBoxLayout(left)
@@ -403,6 +848,10 @@ class MainWindow(QWidget):
         self.btn_clear_all = QPushButton("Zrušit výběr")
         self.btn_clear_all.clicked.connect(self.diy_clear_all)
         btns_left.addWidget(self.btn_clear_all)
+        self.btn_autocomplete = QPushButton("Doplnit automaticky")
+        self.btn_autocomplete.setToolTip("Doplní zaškrtnutý výběr na seznam, který splňuje všechna pravidla")
+        self.btn_autocomplete.clicked.connect(self.diy_autocomplete)
+        btns_left.addWidget(self.btn_autocomplete)
         left_v.addLayout(btns_left)
         dlay_root.addWidget(left, 1)
 
@@ -436,24 +885,354 @@ class MainWindow(QWidget):
 
         dlay_root.addWidget(right, 1)
         tab_diy.setLayout(dlay_root)
-        self.tabs.addTab(tab_diy, "Vytvořit vlastní seznam (DIY)")
 
-        self.setLayout(root)
-        self.list.setItemDelegate(KeepColorDelegate(self.list))
         self.populate_diy_list()
 
+    def ensure_dashboard_tab(self):
+        """Postaví tab s přehledem třídy (statistiky nad složkou žákovských souborů)."""
+        if self.dashboard_built:
+            return
+        self.dashboard_built = True
+        lay = QVBoxLayout(self.tab_dashboard)
+        top = QHBoxLayout()
+        self.btn_dashboard_folder = QPushButton("Vybrat složku třídy…")
+        self.btn_dashboard_folder.clicked.connect(self.choose_dashboard_folder)
+        top.addWidget(self.btn_dashboard_folder)
+        self.btn_dashboard_refresh = QPushButton("Obnovit")
+        self.btn_dashboard_refresh.clicked.connect(self.refresh_dashboard)
+        self.btn_dashboard_refresh.setEnabled(False)
+        top.addWidget(self.btn_dashboard_refresh)
+        self.lbl_dashboard_status = QLabel("Vyberte složku s maturita_data.json jednotlivých žáků.")
+        top.addWidget(self.lbl_dashboard_status, 1)
+        lay.addLayout(top)
+
+        self.lbl_dashboard_summary = QLabel("")
+        self.lbl_dashboard_summary.setWordWrap(True)
+        lay.addWidget(self.lbl_dashboard_summary)
+
+        self.dashboard_table = QTableWidget(0, 4)
+        self.dashboard_table.setHorizontalHeaderLabels(["Dílo", "Dokončilo %", "Vybralo", "Poznámek"])
+        self.dashboard_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.dashboard_table.verticalHeader().setVisible(False)
+        self.dashboard_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.dashboard_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.dashboard_table.horizontalHeader().setSortIndicator(2, Qt.DescendingOrder)
+        lay.addWidget(self.dashboard_table, 1)
+        self.tab_dashboard.setLayout(lay)
+
+    def choose_dashboard_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Složka se soubory žáků", self.dashboard_folder or "")
+        if folder:
+            self.dashboard_folder = folder
+            self.btn_dashboard_refresh.setEnabled(True)
+            self.refresh_dashboard()
+
+    def refresh_dashboard(self):
+        if not self.dashboard_folder:
+            return
+        for task in self.dashboard_tasks:
+            task.cancel()
+        task = DashboardTask(self.dashboard_folder)
+        task.signals.progress.connect(self.on_dashboard_progress)
+        task.signals.finished.connect(self.on_dashboard_finished)
+        self.dashboard_tasks.append(task)
+        self.lbl_dashboard_status.setText("Načítám…")
+        QThreadPool.globalInstance().start(task)
+
+    def on_dashboard_progress(self, i: int, n: int):
+        if self.dashboard_tasks and self.dashboard_tasks[-1].signals is self.sender():
+            self.lbl_dashboard_status.setText(f"Načítám změněné soubory: {i} / {n}")
+
+    def on_dashboard_finished(self, stats):
+        sender = self.sender()
+        latest = bool(self.dashboard_tasks) and self.dashboard_tasks[-1].signals is sender
+        self.dashboard_tasks = [t for t in self.dashboard_tasks if t.signals is not sender]
+        if not latest:
+            return
+        if stats is None:
+            self.lbl_dashboard_status.setText("Přehled se nepodařilo načíst.")
+            return
+        status = f"{self.dashboard_folder}: {stats['students']} žáků " \
+                 f"(znovu načteno {stats['parsed']}, z cache {stats['reused']})"
+        if stats["errors"]:
+            status += f", nečitelných souborů: {len(stats['errors'])}"
+        self.lbl_dashboard_status.setText(status)
+        self.lbl_dashboard_status.setToolTip("\n".join(f"{p}: {e}" for p, e in stats["errors"][:50]))
+
+        parts = [f"Vlastní seznamy: {stats['custom_lists']}, v rozporu s pravidly {stats['invalid_lists']}"]
+        if stats["violations"]:
+            parts.append("Nejčastější chyby: " + ", ".join(
+                f"{VIOLATION_LABELS.get(k, k)} ({n})" for k, n in stats["violations"].most_common(5)))
+        parts.append(f"Poznámky: {sum(stats['notes_count'].values())} u děl, {stats['notes_words']} slov, "
+                     f"{sum(stats['notes_chars'].values())} znaků")
+        self.lbl_dashboard_summary.setText("\n".join(parts))
+
+        rows = ClassDashboard.book_rows(stats)
+        table = self.dashboard_table
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            name = f"{row['author']} – {row['title']}" if row["author"] else row["title"]
+            table.setItem(r, 0, QTableWidgetItem(name))
+            for col, value in ((1, round(row["completion_rate"] * 100)), (2, row["chosen"]), (3, row["notes"])):
+                item = QTableWidgetItem()
+                item.setData(Qt.DisplayRole, value)    # číslo, ať se řadí číselně
+                table.setItem(r, col, item)
+        table.setSortingEnabled(True)
+
+    def ensure_attach_check_tab(self):
+        """Tab s kontrolou příloh: nepoužité soubory, chybějící soubory a poškozené bloby + úklid."""
+        if self.attach_check_built:
+            return
+        self.attach_check_built = True
+        lay = QVBoxLayout(self.tab_attach_check)
+        top = QHBoxLayout()
+        self.btn_scan = QPushButton("Zkontrolovat přílohy")
+        self.btn_scan.clicked.connect(self.start_attachment_scan)
+        top.addWidget(self.btn_scan)
+        self.btn_scan_cancel = QPushButton("Zrušit")
+        self.btn_scan_cancel.clicked.connect(self.cancel_attachment_scan)
+        self.btn_scan_cancel.setVisible(False)
+        top.addWidget(self.btn_scan_cancel)
+        self.lbl_scan_status = QLabel("")
+        top.addWidget(self.lbl_scan_status, 1)
+        lay.addLayout(top)
+
+        lists = QHBoxLayout()
+        self.scan_lists = {}
+        for key, title in (("orphans", "Nepoužité soubory"), ("missing", "Chybějící soubory"),
+                           ("corrupt", "Poškozené soubory")):
+            col = QVBoxLayout()
+            col.addWidget(QLabel(title + ":"))
+            lw = QListWidget()
+            col.addWidget(lw, 1)
+            self.scan_lists[key] = lw
+            lists.addLayout(col, 1)
+        lay.addLayout(lists, 1)
+
+        actions = QHBoxLayout()
+        self.btn_remove_orphans = QPushButton("Smazat nepoužité soubory")
+        self.btn_remove_orphans.clicked.connect(self.remove_orphan_attachments)
+        self.btn_remove_orphans.setEnabled(False)
+        actions.addWidget(self.btn_remove_orphans)
+        self.btn_drop_missing = QPushButton("Odebrat odkazy na chybějící soubory")
+        self.btn_drop_missing.clicked.connect(self.drop_missing_attachments)
+        self.btn_drop_missing.setEnabled(False)
+        actions.addWidget(self.btn_drop_missing)
+        actions.addStretch()
+        lay.addLayout(actions)
+        self.tab_attach_check.setLayout(lay)
+        self.start_attachment_scan()
+
+    def start_attachment_scan(self):
+        if self.scan_tasks:
+            return
+        task = AttachmentScanTask(attachment_refs(self.state))
+        task.signals.progress.connect(self.on_attachment_scan_progress)
+        task.signals.finished.connect(self.on_attachment_scan_finished)
+        self.scan_tasks.append(task)
+        self.btn_scan.setEnabled(False)
+        self.btn_scan_cancel.setVisible(True)
+        self.lbl_scan_status.setText("Procházím přílohy…")
+        QThreadPool.globalInstance().start(task)
+
+    def cancel_attachment_scan(self):
+        for task in self.scan_tasks:
+            task.cancel()
+
+    def on_attachment_scan_progress(self, done, total):
+        self.lbl_scan_status.setText(f"Ověřuji obsah: {done / 1e6:.0f} / {total / 1e6:.0f} MB")
+
+    def on_attachment_scan_finished(self, report):
+        self.scan_tasks = [t for t in self.scan_tasks if t.signals is not self.sender()]
+        self.btn_scan.setEnabled(True)
+        self.btn_scan_cancel.setVisible(False)
+        if report is None:
+            self.lbl_scan_status.setText("Kontrola příloh selhala.")
+            return
+        self.scan_report = report
+        status = (f"{report['files']} souborů, {report['bytes'] / 1e6:.1f} MB; ověřeno {report['hashed']}, "
+                  f"beze změny od minula {report['cached']}")
+        if report["cancelled"]:
+            status += " – přerušeno, ověření není úplné"
+        self.lbl_scan_status.setText(status)
+        orphans = self.scan_lists["orphans"]
+        orphans.clear()
+        for path, size in report["orphans"]:
+            it = QListWidgetItem(f"{os.path.basename(path)} ({size / 1e3:.0f} kB)")
+            it.setToolTip(path)
+            orphans.addItem(it)
+        missing = self.scan_lists["missing"]
+        missing.clear()
+        for bid, att, path in report["missing"]:
+            book = CATALOG.get(bid)
+            where = f"{book['author']} — {book['title']}" if book else bid
+            it = QListWidgetItem(f"{attachment_name(att)} · {where}")
+            it.setToolTip(path)
+            missing.addItem(it)
+        corrupt = self.scan_lists["corrupt"]
+        corrupt.clear()
+        for path in report["corrupt"]:
+            it = QListWidgetItem(os.path.basename(path))
+            it.setToolTip(path)
+            corrupt.addItem(it)
+        self.btn_remove_orphans.setEnabled(bool(report["orphans"]))
+        self.btn_remove_orphans.setText(f"Smazat nepoužité soubory ({len(report['orphans'])})")
+        self.btn_drop_missing.setEnabled(bool(report["missing"]))
+        self.btn_drop_missing.setText(f"Odebrat odkazy na chybějící soubory ({len(report['missing'])})")
+
+    def remove_orphan_attachments(self):
+        report = self.scan_report
+        if not report or not report["orphans"]:
+            return
+        if self.import_tasks:
+            QMessageBox.information(self, "Probíhá import", "Počkejte na dokončení importu příloh.")
+            return
+        size = sum(s for _, s in report["orphans"]) / 1e6
+        answer = QMessageBox.question(self, "Smazat nepoužité soubory",
+                                      f"Smazat {len(report['orphans'])} souborů ({size:.1f} MB), "
+                                      f"na které neodkazuje žádné dílo?")
+        if answer != QMessageBox.Yes:
+            return
+        # odkazy se berou z aktuálního stavu, ne ze snímku z doby kontroly
+        removed, freed, errors = remove_attachment_files([p for p, _ in report["orphans"]], attachment_refs(self.state))
+        self.status.setText(f"Smazáno {removed} souborů ({freed / 1e6:.1f} MB)")
+        if errors:
+            QMessageBox.warning(self, "Chyba mazání", "\n".join(errors[:10]))
+        self.start_attachment_scan()
+
+    def drop_missing_attachments(self):
+        report = self.scan_report
+        if not report or not report["missing"]:
+            return
+        answer = QMessageBox.question(self, "Odebrat odkazy",
+                                      f"Odebrat {len(report['missing'])} příloh, jejichž soubory chybějí?")
+        if answer != QMessageBox.Yes:
+            return
+        changed = set()
+        for bid, att, path in report["missing"]:
+            entry = self.state.get(bid)
+            if entry is None or os.path.exists(path):
+                continue    # soubor se mezitím vrátil
+            kept = [a for a in entry.get("attachments", []) if a is not att and a != att]
+            if len(kept) != len(entry.get("attachments", [])):
+                entry["attachments"] = kept
+                changed.add(bid)
+        for bid in changed:
+            if AUTO_SAVE:
+                self.saver.mark_dirty(bid)
+            if bid == self.current_id:
+                self.reload_attachments(self.state[bid]["attachments"])
+        self.status.setText(f"Odebrány odkazy u {len(changed)} děl")
+        self.start_attachment_scan()
+
+    def ensure_backups_tab(self):
+        """Tab se zálohami: seznam snapshotů, záloha hned a obnova vybrané jedním tlačítkem."""
+        if self.backups_built:
+            return
+        self.backups_built = True
+        lay = QVBoxLayout(self.tab_backups)
+        top = QHBoxLayout()
+        self.btn_backup_now = QPushButton("Zálohovat teď")
+        self.btn_backup_now.clicked.connect(lambda: self.start_backup(manual=True))
+        top.addWidget(self.btn_backup_now)
+        self.btn_backup_restore = QPushButton("Obnovit vybranou zálohu")
+        self.btn_backup_restore.clicked.connect(self.restore_selected_backup)
+        if self.store is not None:
+            self.btn_backup_restore.setEnabled(False)
+            self.btn_backup_restore.setToolTip("Databázi SQLite obnovte se zavřenou aplikací: maturita_cli.py restore")
+        top.addWidget(self.btn_backup_restore)
+        self.lbl_backup_status = QLabel("")
+        top.addWidget(self.lbl_backup_status, 1)
+        lay.addLayout(top)
+        self.backup_list = QListWidget()
+        self.backup_list.itemDoubleClicked.connect(lambda _: self.restore_selected_backup())
+        lay.addWidget(self.backup_list, 1)
+        self.tab_backups.setLayout(lay)
+        self.reload_backup_list()
+
+    def reload_backup_list(self):
+        self.backup_list.clear()
+        for b in list_backups():
+            when = time.strftime("%d.%m.%Y %H:%M:%S", time.localtime(b["time"] or 0))
+            text = f"{when} · {b['files']} souborů · {b['size'] / 1e6:.1f} MB"
+            if b["reason"]:
+                text += f" · {b['reason']}"
+            it = QListWidgetItem(text)
+            it.setData(Qt.UserRole, b["name"])
+            self.backup_list.addItem(it)
+
+    def backup_if_due(self):
+        if backup_due():
+            self.start_backup()
+
+    def start_backup(self, manual: bool = False):
+        if self.backup_tasks:
+            return
+        if manual:
+            # ruční záloha má obsahovat i to, co ještě čeká na zápis
+            self.commit_notes()
+            self.saver.flush()
+        self.run_backup_task(BackupTask())
+
+    def run_backup_task(self, task: BackupTask):
+        task.signals.finished.connect(self.on_backup_finished)
+        self.backup_tasks.append(task)
+        if self.backups_built:
+            self.btn_backup_now.setEnabled(False)
+            self.btn_backup_restore.setEnabled(False)
+            self.lbl_backup_status.setText("Obnovuji…" if task.restore else "Zálohuji…")
+        QThreadPool.globalInstance().start(task)
+
+    def restore_selected_backup(self):
+        it = self.backup_list.currentItem()
+        if it is None or self.store is not None or self.backup_tasks:
+            return
+        answer = QMessageBox.question(self, "Obnovit zálohu",
+                                      f"Vrátit data do stavu zálohy {it.text()}?\n"
+                                      "Současný stav se předtím uloží jako další záloha.")
+        if answer != QMessageBox.Yes:
+            return
+        # vše čekající na disk: záloha před obnovou ho zachytí a okno pak převezme obnovený stav
+        self.commit_notes()
+        self.saver.flush()
+        self.run_backup_task(BackupTask(restore=it.data(Qt.UserRole)))
+
+    def on_backup_finished(self, result):
+        self.backup_tasks = [t for t in self.backup_tasks if t.signals is not self.sender()]
+        if result is None:
+            text = "Záloha selhala."
+        elif result.get("restored"):
+            # obnovený snapshot převezme StateSaver při nejbližší kontrole souborů (apply_external_changes)
+            text = (f"Obnovena záloha {result['name']} ({result['written']} souborů přepsáno, "
+                    f"{result['removed']} smazáno); předchozí stav je v záloze {result['safety']}")
+            self.status.setText(text)
+        elif result["cancelled"]:
+            text = "Záloha přerušena."
+        elif result["unchanged"]:
+            text = f"Beze změny od poslední zálohy ({result['ms']:.0f} ms)"
+        else:
+            text = (f"Záloha {result['name']}: {result['files']} souborů, nově uloženo "
+                    f"{result['new_bytes'] / 1e6:.1f} MB ({result['ms']:.0f} ms)")
+        if self.backups_built:
+            self.btn_backup_now.setEnabled(True)
+            self.btn_backup_restore.setEnabled(self.store is None)
+            self.lbl_backup_status.setText(text)
+            self.reload_backup_list()
+
     def apply_styles(self):
         style = f"""
             QWidget {{ background: {COLOR_BG}; color: {COLOR_TEXT}; }}
-            QListWidget {{ background: {COLOR_BG}; border: none; outline: none; }}
-            QListWidget::item {{ padding: 8px; outline: none; }}
-            QListWidget::item:selected {{ background: {COLOR_LIST_SEL}; }}
+            QListView {{ background: {COLOR_BG}; border: none; outline: none; }}
+            QListView::item {{ padding: 8px; outline: none; }}
+            QListView::item:selected {{ background: {COLOR_LIST_SEL}; }}
             QTextEdit {{ background: {COLOR_RIGHT_BG}; color: {COLOR_TEXT}; border: 1px solid {COLOR_SEPARATOR}; }}
+            QLineEdit {{ background: {COLOR_RIGHT_BG}; color: {COLOR_TEXT}; border: 1px solid {COLOR_SEPARATOR}; padding: 4px; }}
             QPushButton {{ background: #3a3a3a; color: {COLOR_TEXT}; border-radius: 4px; padding: 6px; }}
             QLabel {{ color: {COLOR_TEXT}; }}
             QWidget:focus {{ outline: none; }}
             QPushButton:focus {{ outline: none; }}
-            QListWidget::item:focus {{ outline: none; }}
+            QListView::item:focus {{ outline: none; }}
         """
         self.setStyleSheet(style)
 
@@ -463,7 +1242,7 @@ class MainWindow(QWidget):
         screen_geom = screen.availableGeometry()
         screen_h = screen_geom.height()
         total_items = len(BOOKS)
-        if self.list.count() > 0:
+        if self.list_model.rowCount() > 0:
             item_height = self.list.sizeHintForRow(0) + self.list.spacing()
             if item_height <= 0:
                 fm = QFontMetrics(self.list.font())
@@ -481,6 +1260,11 @@ class MainWindow(QWidget):
 
     def showEvent(self, event):
         super().showEvent(event)
+        # velikost a pozice jen při prvním zobrazení (ne po obnovení z minimalizace)
+        if self._placed:
+            return
+        self._placed = True
+        QTimer.singleShot(0, self.on_first_paint)
 
         # ensure size is computed first
         self.auto_size_to_list()
@@ -505,64 +1289,56 @@ class MainWindow(QWidget):
 
         self.move(x, y)
 
+    def on_first_paint(self):
+        mark_startup("first paint")
+        if os.environ.get("MATURITA_TIMING") == "1":
+            print(startup_report(), file=sys.stderr)
+
+    def closeEvent(self, event):
+        # rozpracované importy se zahodí, pak se dopíše vše, co ještě čeká ve write-behind frontě
+        self.commit_notes()
+        self.backup_timer.stop()
+        for task in self.import_tasks + self.text_tasks + self.dashboard_tasks + self.scan_tasks + self.backup_tasks:
+            task.cancel()
+        QThreadPool.globalInstance().waitForDone(2000)
+        self.saver.close()
+        if self.store is not None:
+            self.store.close()
+        if self.latency_monitor is not None:
+            self.latency_monitor.stop()
+            disable_tracing()
+        super().closeEvent(event)
+
+    @traced("populate_list")
     def populate_list(self, books_order: List[Dict]=None):
-        self.list.clear()
-        self.current_list_books = []
+        """Nastaví základní seznam (ORIGINAL_20 nebo vlastní) a zobrazí ho podle řazení/filtru."""
         if books_order is None:
-            books_iter = ORIGINAL_20
+            self.current_list_books = list(ORIGINAL_20)
         else:
-            books_iter = []
-            for el in books_order:
-                if isinstance(el, dict):
-                    books_iter.append(el)
-                else:
-                    for b in BOOKS + ORIGINAL_20:
-                        if make_id(b) == el:
-                            books_iter.append(b)
-                            break
-        for idx, b in enumerate(books_iter):
-            display = f"{b['author']} — {b['title']}"
-            item = QListWidgetItem(display)
-            item.setToolTip(f"{b['genre']} — {b['section']}")
-            item.setData(Qt.UserRole, make_id(b))
-            completed = self.state.get(make_id(b), {}).get("completed", False)
-            item.setForeground(QColor(COLOR_COMPLETED if completed else COLOR_TEXT))
-            bg = QColor(COLOR_ALTERNATE if (idx % 2 == 0) else COLOR_ALTERNATE2)
-            item.setBackground(bg)
-            f = QFont()
-            f.setPointSize(10)
-            item.setFont(f)
-            self.list.addItem(item)
-            self.current_list_books.append(b)
-        self.list.setItemDelegate(KeepColorDelegate(self.list))
+            self.current_list_books = CATALOG.resolve(books_order)
+        self.list_model.set_books(self.current_list_books)
+        self.on_sort_changed(self.sort_combo.currentIndex())
 
-    def refresh_list_colors(self):
-        for i in range(self.list.count()):
-            item = self.list.item(i)
-            bid = item.data(Qt.UserRole)
-            completed = self.state.get(bid, {}).get("completed", False)
-            item.setForeground(QColor(COLOR_COMPLETED if completed else COLOR_TEXT))
+    def on_list_select(self, index: QModelIndex):
+        # výběr barvy řádků nemění – žádné přebarvování, jen detail díla
+        self.show_book(index.data(Qt.UserRole))
 
-    def on_list_select(self, item: QListWidgetItem):
-        bid = item.data(Qt.UserRole)
-        book = None
-        for b in BOOKS + ORIGINAL_20:
-            if make_id(b) == bid:
-                book = b
-                break
+    def show_book(self, bid: str):
+        book = CATALOG.get(bid)
         if not book:
             return
+        self.commit_notes()
         self.current_id = bid
         self.lbl_title.setText(f"{book['author']} — {book['title']}\n{book['genre']} — {book['section']}")
         completed = self.state.get(bid, {}).get("completed", False)
         self.update_completed_button_text(completed)
         notes_text = self.state.get(bid, {}).get("notes", "")
         attachments = self.state.get(bid, {}).get("attachments", [])
-        self.notes.blockSignals(True)
+        # blockSignals na editoru signály dokumentu neblokuje, proto vlastní příznak
+        self._notes_loading = True
         self.notes.setPlainText(notes_text)
-        self.notes.blockSignals(False)
+        self._notes_loading = False
         self.reload_attachments(attachments)
-        self.refresh_list_colors()
 
     def update_completed_button_text(self, completed):
         if completed:
@@ -573,33 +1349,238 @@ class MainWindow(QWidget):
     def toggle_completed(self):
         if not self.current_id:
             return
-        entry = self.state.setdefault(self.current_id, {"completed": False, "notes": "", "attachments": []})
+        entry = self.state.setdefault(self.current_id, new_entry())
         entry["completed"] = not entry.get("completed", False)
         self.update_completed_button_text(entry["completed"])
-        for i in range(self.list.count()):
-            item = self.list.item(i)
-            if item.data(Qt.UserRole) == self.current_id:
-                item.setForeground(QColor(COLOR_COMPLETED if entry["completed"] else COLOR_TEXT))
-                break
         self.status.setText("Změněno: dokončené" if entry["completed"] else "Změněno: nedokončené")
         if AUTO_SAVE:
-            save_state(self.state, self.custom_selection)
-        self.refresh_list_colors()
+            self.saver.mark_dirty(self.current_id)
+        self.list_model.refresh_row(self.current_id)
 
-    def on_notes_changed(self):
-        if not self.current_id:
+    def on_notes_contents_change(self, position: int, removed: int, added: int):
+        if self._notes_loading or not self.current_id or not (removed or added):
             return
-        self.state.setdefault(self.current_id, {"completed": False, "notes": "", "attachments": []})
-        self.state[self.current_id]["notes"] = self.notes.toPlainText()
-        self.status.setText("Poznámky změněny")
+        if not self.notes_dirty:
+            self.notes_dirty = True
+            self._notes_dirty_since = time.monotonic()
+            self.status.setText("Poznámky změněny")
+        if time.monotonic() - self._notes_dirty_since >= NOTES_MAX_DELAY:
+            self.commit_notes()
+        else:
+            self.notes_commit_timer.start()
+
+    def commit_notes(self):
+        """Převezme text poznámek z dokumentu do stavu, indexu hledání a fronty ukládání – jen když se změnil."""
+        self.notes_commit_timer.stop()
+        if not self.notes_dirty or not self.current_id:
+            return
+        self.notes_dirty = False
+        text = self.notes.toPlainText()
+        entry = self.state.setdefault(self.current_id, new_entry())
+        # dílo bez historie dostane jako první verzi text před touto úpravou
+        self.history.seed(self.current_id, entry.get("notes") or "")
+        entry["notes"] = text
+        self.notes_index.update(self.current_id, text)
         if AUTO_SAVE:
-            save_state(self.state, self.custom_selection)
+            self.saver.mark_dirty(self.current_id)
+
+    def show_notes_history(self):
+        if not self.current_id:
+            return
+        # poslední úpravy nejdřív do historie, ať je v seznamu i aktuální text
+        self.commit_notes()
+        self.saver.flush()
+        self.history.checkpoint(self.current_id)
+        book = CATALOG.get(self.current_id)
+        dlg = NotesHistoryDialog(self.history, self.current_id, f"{book['author']} — {book['title']}", self)
+        if dlg.exec() != QDialog.Accepted or dlg.restored_text is None:
+            return
+        # náhrada přes kurzor (ne setPlainText), takže obnovení jde vrátit Ctrl+Z
+        cursor = self.notes.textCursor()
+        cursor.select(QTextCursor.Document)
+        cursor.insertText(dlg.restored_text)
+        self.commit_notes()
+        self.status.setText("Poznámky obnoveny ze starší verze")
+
+    def apply_external_changes(self, changes: dict):
+        """
+        Převezme položky, které do stejných dat zapsalo jiné okno (nebo synchronizace), po dílech.
+        Dílo bez místní neuložené změny se převezme celé; jinak se sloučí (merge_entry) a při
+        rozdílných poznámkách zůstane místní text a ten druhý se uloží jako verze do historie.
+        """
+        entries = changes.get("entries") or {}
+        if self.current_id in entries:
+            self.commit_notes()     # rozepsaný text v editoru je místní změna
+        conflicts = []
+        new_attachments = []
+        local_changes = changes.get("local") or set()
+        for bid, ext in entries.items():
+            local = self.state.get(bid)
+            if local is not None and (bid in local_changes or self.saver.is_pending(bid)):
+                merged, conflict = merge_entry(local, ext)
+                if conflict:
+                    conflicts.append(bid)
+                    self.history.checkpoint(bid)
+                    self.history.record(bid, ext.get("notes") or "")
+                    self.history.checkpoint(bid)
+                new_attachments += merged["attachments"][len(local.get("attachments") or ()):]
+                self.state[bid] = merged
+                self.saver.mark_dirty(bid)
+            else:
+                new_attachments += ext.get("attachments") or []
+                self.state[bid] = ext
+                self.notes_index.update(bid, ext.get("notes") or "")
+            self.list_model.refresh_row(bid)
+        if self.current_id in entries:
+            self.refresh_current_book()
+        if new_attachments:
+            self.start_text_extraction(new_attachments)
+
+        if "custom_selection" in changes and not self.saver.selection_pending():
+            custom = changes["custom_selection"]
+            selected_books = CATALOG.resolve(custom) if custom else []
+            if custom and len(selected_books) == RULES['total']:
+                self.custom_selection = list(custom)
+                self.populate_list(selected_books)
+            else:
+                self.custom_selection = None
+                self.populate_list(ORIGINAL_20)
+
+        if conflicts:
+            titles = [CATALOG.get(bid)["title"] if CATALOG.get(bid) else bid for bid in conflicts]
+            self.status.setText(f"Poznámky u {len(conflicts)} děl změnilo i jiné okno – ponechány tyto, "
+                                "druhá verze je v Historii poznámek")
+            self.status.setToolTip("\n".join(titles[:50]))
+        elif entries:
+            self.status.setText(f"Převzaty změny uložené mimo toto okno ({len(entries)} děl)")
+
+    def refresh_current_book(self):
+        """Znovu zobrazí aktuální dílo po změně zvenku; kurzor v poznámkách zůstane, kde byl."""
+        entry = self.state.get(self.current_id, {})
+        self.update_completed_button_text(entry.get("completed", False))
+        text = entry.get("notes", "")
+        if text != self.notes.toPlainText():
+            pos = self.notes.textCursor().position()
+            self._notes_loading = True
+            self.notes.setPlainText(text)
+            self._notes_loading = False
+            cursor = self.notes.textCursor()
+            cursor.setPosition(min(pos, self.notes.document().characterCount() - 1))
+            self.notes.setTextCursor(cursor)
+        self.reload_attachments(entry.get("attachments", []))
+
+    def start_text_extraction(self, attachments: List):
+        items = {}
+        for att in attachments:
+            path = str(attachment_path(att))
+            if path not in self.attach_digest:
+                items[path] = attachment_digest(att)
+        if not items:
+            return
+        task = AttachmentTextTask(list(items.items()))
+        task.signals.extracted.connect(self.on_attachment_text)
+        task.signals.finished.connect(self.on_text_task_finished)
+        self.text_tasks.append(task)
+        QThreadPool.globalInstance().start(task)
+
+    def on_attachment_text(self, path: str, digest: str, terms: Counter):
+        self.attach_digest[path] = digest
+        self.attach_index.update_terms(digest, terms)
+
+    def on_text_task_finished(self):
+        self.text_tasks = [t for t in self.text_tasks if t.signals is not self.sender()]
+
+    def attachment_owners(self, digests) -> Dict[str, List[Tuple[str, object]]]:
+        """hash obsahu -> [(id díla, příloha)] pro přílohy s tímto obsahem."""
+        owners: Dict[str, List[Tuple[str, object]]] = {d: [] for d in digests}
+        for bid, e in self.state.items():
+            for att in e.get("attachments", ()):
+                digest = attachment_digest(att) or self.attach_digest.get(str(attachment_path(att)))
+                if digest in owners:
+                    owners[digest].append((bid, att))
+        return owners
+
+    def on_search_changed(self, query: str):
+        self.commit_notes()
+        self.search_results.clear()
+        hits = self.notes_index.search(query) if query.strip() else []
+        for bid, score in hits:
+            book = CATALOG.get(bid)
+            if not book:
+                continue
+            it = QListWidgetItem(f"{book['author']} — {book['title']}")
+            it.setData(Qt.UserRole, bid)
+            self.search_results.addItem(it)
+        attach_hits = self.attach_index.search(query) if query.strip() else []
+        owners = self.attachment_owners(digest for digest, score in attach_hits)
+        found = bool(hits)
+        for digest, score in attach_hits:
+            for bid, att in owners[digest]:
+                book = CATALOG.get(bid)
+                if not book:
+                    continue
+                it = QListWidgetItem(f"{book['author']} — {book['title']} · příloha {attachment_name(att)}")
+                it.setData(Qt.UserRole, bid)
+                it.setData(Qt.UserRole + 1, str(attachment_path(att)))
+                self.search_results.addItem(it)
+                found = True
+        self.search_results.setVisible(bool(query.strip()))
+        # hlavní seznam se zúží na díla s nálezem v poznámkách nebo přílohách
+        if query.strip():
+            self.search_ids = {bid for bid, score in hits}
+            self.search_ids.update(bid for found_in in owners.values() for bid, att in found_in)
+        else:
+            self.search_ids = None
+        self.on_sort_changed(self.sort_combo.currentIndex())
+        if query.strip() and not found:
+            self.search_results.addItem(QListWidgetItem("Nic nenalezeno"))
 
-    def reload_attachments(self, attachments: List[str]):
+    def open_first_search_result(self):
+        if self.search_results.count():
+            self.open_search_result(self.search_results.item(0))
+
+    def open_search_result(self, item: QListWidgetItem):
+        bid = item.data(Qt.UserRole)
+        if not bid:
+            return
+        self.show_book(bid)
+        # dílo nemusí být v aktuálním (filtrovaném) seznamu – pak se jen zruší výběr
+        row = self.list_model.row_of.get(bid)
+        index = self.list_proxy.mapFromSource(self.list_model.index(row)) if row is not None else QModelIndex()
+        if index.isValid():
+            self.list.setCurrentIndex(index)
+        else:
+            self.list.clearSelection()
+        attachment = item.data(Qt.UserRole + 1)
+        if attachment:
+            for i in range(self.attach_list.count()):
+                it = self.attach_list.item(i)
+                if it.data(Qt.UserRole) == attachment:
+                    self.attach_list.setCurrentItem(it)
+                    self.attach_list.setFocus()
+                    self.status.setText(f"Nalezeno v příloze {it.text()}")
+                    break
+            return
+        span = NotesIndex.find_match(self.notes.toPlainText(), self.search_edit.text())
+        if span:
+            cursor = self.notes.textCursor()
+            cursor.setPosition(span[0])
+            cursor.setPosition(span[1], QTextCursor.KeepAnchor)
+            self.notes.setTextCursor(cursor)
+            self.notes.ensureCursorVisible()
+        self.notes.setFocus()
+
+    def reload_attachments(self, attachments: List):
         self.attach_list.clear()
-        for fn in attachments:
-            it = QListWidgetItem(fn)
-            it.setToolTip(str(ATTACH_DIR / fn))
+        for att in attachments:
+            full = attachment_path(att)
+            it = QListWidgetItem(attachment_name(att))
+            it.setData(Qt.UserRole, str(full))
+            it.setToolTip(str(full))
+            # chybějící soubor je vidět hned, ne až po dvojkliku
+            if not full.exists():
+                it.setForeground(QColor(COLOR_BAD))
+                it.setToolTip(f"Soubor chybí: {full}")
             self.attach_list.addItem(it)
 
     def add_attachment_via_dialog(self):
@@ -611,143 +1592,231 @@ class MainWindow(QWidget):
             return
         self.handle_files_dropped(paths)
 
+    @traced("handle_files_dropped")
     def handle_files_dropped(self, paths: List[str]):
         if not self.current_id:
             QMessageBox.warning(self, "Chyba", "Nejprve vyber dílo.")
             return
-        entry = self.state.setdefault(self.current_id, {"completed": False, "notes": "", "attachments": []})
-        added = []
-        for p in paths:
-            try:
-                newname = copy_attachment(p)
-                entry["attachments"].append(newname)
-                added.append(newname)
-            except Exception as e:
-                QMessageBox.warning(self, "Chyba kopírování", f"Nelze zkopírovat {p}:\n{e}")
-        self.reload_attachments(entry["attachments"])
-        self.status.setText(f"Přidáno {len(added)} souborů")
-        if AUTO_SAVE:
-            save_state(self.state, self.custom_selection)
+        task = AttachmentImportTask(self.current_id, list(paths))
+        task.signals.progress.connect(self.on_import_progress)
+        task.signals.finished.connect(self.on_import_finished)
+        self.import_tasks.append(task)
+        self.btn_import_cancel.setVisible(True)
+        self.status.setText("Připravuji import…")
+        QThreadPool.globalInstance().start(task)
+
+    def cancel_imports(self):
+        for task in self.import_tasks:
+            task.cancel()
+        self.status.setText("Ruším import…")
+
+    def on_import_progress(self, i: int, n: int, name: str, phase: str, done: int, size: int, total_done: int, total: int):
+        file_pct = 100 * done // size if size else 100
+        total_pct = 100 * total_done // total if total else 100
+        what = "kopíruji" if phase == "copy" else "čtu"
+        self.status.setText(f"Soubor {i + 1}/{n}: {name} – {what} {file_pct} % (celkem {total_pct} %)")
+
+    def on_import_finished(self, bid: str, atts: list, errors: list, cancelled: bool):
+        self.import_tasks = [t for t in self.import_tasks if t.signals is not self.sender()]
+        self.btn_import_cancel.setVisible(bool(self.import_tasks))
+        if cancelled:
+            self.status.setText("Import zrušen")
+            return
+        # celá dávka se zapíše najednou a uloží jedním zápisem
+        entry = self.state.setdefault(bid, new_entry())
+        have = {att["blob"] for att in entry["attachments"] if isinstance(att, dict)}
+        added = 0
+        for att in atts:
+            if att["blob"] in have:
+                continue    # stejný obsah už u díla je
+            have.add(att["blob"])
+            entry["attachments"].append(att)
+            added += 1
+        if bid == self.current_id:
+            self.reload_attachments(entry["attachments"])
+        self.start_text_extraction(atts)
+        self.status.setText(f"Přidáno {added} souborů")
+        if added and AUTO_SAVE:
+            self.saver.mark_dirty(bid)
+        if errors:
+            msg = "\n".join(f"{p}: {e}" for p, e in errors[:10])
+            if len(errors) > 10:
+                msg += f"\n… a dalších {len(errors) - 10}"
+            QMessageBox.warning(self, "Chyba kopírování", f"Některé soubory nelze zkopírovat:\n{msg}")
 
     def open_attachment(self, item: QListWidgetItem):
-        fn = item.text()
-        full = ATTACH_DIR / fn
+        full = pathlib.Path(item.data(Qt.UserRole))
         if full.exists():
             QDesktopServices.openUrl(QUrl.fromLocalFile(str(full)))
         else:
             QMessageBox.warning(self, "Soubor nenalezen", f"Připojený soubor nenalezen:\n{full}")
 
+    @traced("on_sort_changed")
     def on_sort_changed(self, idx):
-        option = self.sort_combo.currentText()
-        if option == "-- Řadit podle --":
-            ordered = ORIGINAL_20 if self.custom_selection is None else self.current_list_books
-        else:
-            key_map = {"Autor": "author", "Název": "title", "Žánr": "genre", "Oddíl": "section"}
-            key = key_map.get(option, None)
-            if not key:
-                ordered = ORIGINAL_20
-            else:
-                ordered = sorted(self.current_list_books if self.current_list_books else ORIGINAL_20, key=lambda b: b[key].lower())
+        # zdrojový model drží celý základní seznam; řazení, filtr a hledání jen přepočítají proxy
+        key_map = {"Autor": "author", "Název": "title", "Žánr": "genre", "Oddíl": "section"}
+        field = key_map.get(self.sort_combo.currentText())
 
+        allowed = None
         filt = self.filter_combo.currentText()
-        if filt == "Dokončené":
-            ordered = [b for b in ordered if self.state.get(make_id(b), {}).get("completed", False)]
-        elif filt == "Nedokončené":
-            ordered = [b for b in ordered if not self.state.get(make_id(b), {}).get("completed", False)]
+        if filt in ("Dokončené", "Nedokončené"):
+            if self.store is not None:
+                # dotaz jde přes index a na GUI vlákně se nečeká na zápis; co ve frontě write-behind
+                # ještě není na disku, přebije stav v paměti. Fronta se čte před dotazem i po něm –
+                # změna zapsaná mezi tím už v tabulce je, ale pro jistotu se vezme z paměti taky.
+                pending = self.saver.pending_ids()
+                done = self.store.completed_ids()
+                pending |= self.saver.pending_ids()
+                for bid in pending:
+                    if self.state.get(bid, {}).get("completed", False):
+                        done.add(bid)
+                    else:
+                        done.discard(bid)
+            else:
+                done = {bid for bid in self.list_model.ids if self.state.get(bid, {}).get("completed", False)}
+            # položky, které ještě nikdy nebyly uloženy, v tabulce nejsou – proto vždy jen dokončené
+            allowed = done if filt == "Dokončené" else set(self.list_model.ids) - done
+        if self.search_ids is not None:
+            allowed = self.search_ids if allowed is None else allowed & self.search_ids
 
-        self.populate_list(ordered)
+        self.list_proxy.set_view(field, allowed)
 
     def on_filter_changed(self, idx):
         self.on_sort_changed(self.sort_combo.currentIndex())
 
     def populate_diy_list(self):
+        self.diy_books = BOOKS
+        self.diy_solver = RuleSolver(self.diy_books, RULES)
+        self.diy_blocked: Dict[str, str] = {}
+        self.diy_feasibility_gen = 0
+        self.diy_feasibility_task = None
+        # přepočet proveditelnosti se po sérii kliknutí spustí jen jednou
+        self.diy_feasibility_timer = QTimer(self)
+        self.diy_feasibility_timer.setSingleShot(True)
+        self.diy_feasibility_timer.setInterval(50)
+        self.diy_feasibility_timer.timeout.connect(self.start_diy_feasibility)
+        self.diy_row_of = {CATALOG.id_of(b): row for row, b in enumerate(self.diy_books)}
+        self.diy_list.blockSignals(True)
         self.diy_list.clear()
-        for b in BOOKS:
+        # pokud jsme načetli custom_selection, předvyplníme checkboxy
+        ids = set(self.custom_selection or [])
+        for b in self.diy_books:
+            bid = CATALOG.id_of(b)
             it = QListWidgetItem(f"{b['author']} — {b['title']} ({b['genre']})")
             it.setFlags(it.flags() | Qt.ItemIsUserCheckable)
-            it.setCheckState(Qt.Unchecked)
-            it.setData(Qt.UserRole, make_id(b))
+            it.setCheckState(Qt.Checked if bid in ids else Qt.Unchecked)
+            it.setData(Qt.UserRole, bid)
             it.setToolTip(f"{b['section']}")
             self.diy_list.addItem(it)
-        # pokud jsme načetli custom_selection, předvyplníme checkboxy
-        if self.custom_selection:
-            ids = set(self.custom_selection)
-            for i in range(self.diy_list.count()):
-                it = self.diy_list.item(i)
-                if it.data(Qt.UserRole) in ids:
-                    it.setCheckState(Qt.Checked)
+        self.diy_list.blockSignals(False)
+        self.rebuild_diy_selection()
+
+    def rebuild_diy_selection(self):
+        """Přepočítá výběr, čítače i náhled jedním průchodem (start, vybrat vše, zrušit výběr)."""
+        self.diy_tally = RuleTally(RULES)
+        self.diy_selected_rows: List[int] = []   # seřazené řádky zaškrtnutých položek
+        self.preview.clear()
+        for row in range(self.diy_list.count()):
+            if self.diy_list.item(row).checkState() == Qt.Checked:
+                b = self.diy_books[row]
+                self.diy_tally.add(b)
+                self.diy_selected_rows.append(row)
+                self.preview.addItem(QListWidgetItem(f"{b['author']} — {b['title']} ({b['genre']})"))
         self.update_diy_validation()
 
-    def diy_select_all(self):
+    def set_all_diy(self, state):
+        self.diy_list.blockSignals(True)
         for i in range(self.diy_list.count()):
-            it = self.diy_list.item(i)
-            it.setCheckState(Qt.Checked)
+            self.diy_list.item(i).setCheckState(state)
+        self.diy_list.blockSignals(False)
+        self.rebuild_diy_selection()
+
+    def diy_select_all(self):
+        self.set_all_diy(Qt.Checked)
 
     def diy_clear_all(self):
-        for i in range(self.diy_list.count()):
-            it = self.diy_list.item(i)
-            it.setCheckState(Qt.Unchecked)
+        self.set_all_diy(Qt.Unchecked)
+
+    def diy_autocomplete(self):
+        selected = [self.diy_books[row] for row in self.diy_selected_rows]
+        completed = self.diy_solver.complete(selected)
+        if completed is None:
+            QMessageBox.warning(self, "Nelze doplnit", "Zaškrtnutý výběr už nejde doplnit tak, aby splnil pravidla.\nZkuste některé položky odškrtnout.")
+            return
+        rows = {self.diy_row_of[CATALOG.id_of(b)] for b in completed}
+        self.diy_list.blockSignals(True)
+        for row in rows:
+            self.diy_list.item(row).setCheckState(Qt.Checked)
+        self.diy_list.blockSignals(False)
+        self.rebuild_diy_selection()
+        self.status.setText(f"Doplněno {len(completed) - len(selected)} děl")
 
     def on_diy_item_changed(self, item: QListWidgetItem):
+        row = self.diy_row_of.get(item.data(Qt.UserRole))
+        if row is None:
+            return
+        pos = bisect.bisect_left(self.diy_selected_rows, row)
+        selected = pos < len(self.diy_selected_rows) and self.diy_selected_rows[pos] == row
+        checked = item.checkState() == Qt.Checked
+        if checked == selected:
+            # itemChanged chodí i při změně textu apod.
+            return
+        b = self.diy_books[row]
+        if checked:
+            self.diy_tally.add(b)
+            self.diy_selected_rows.insert(pos, row)
+            self.preview.insertItem(pos, QListWidgetItem(f"{b['author']} — {b['title']} ({b['genre']})"))
+        else:
+            self.diy_tally.remove(b)
+            del self.diy_selected_rows[pos]
+            self.preview.takeItem(pos)
         self.update_diy_validation()
 
     def get_selected_ids_from_diy(self) -> List[str]:
-        sel = []
-        for i in range(self.diy_list.count()):
-            it = self.diy_list.item(i)
-            if it.checkState() == Qt.Checked:
-                sel.append(it.data(Qt.UserRole))
-        return sel
+        return [CATALOG.id_of(self.diy_books[row]) for row in self.diy_selected_rows]
 
+    @traced("update_diy_validation")
     def update_diy_validation(self):
-        sel_ids = self.get_selected_ids_from_diy()
-        sel_books = [b for b in BOOKS if make_id(b) in sel_ids]
-
-        total_ok = len(sel_books) == RULES['total']
-        total_text = f"Celkem vybráno: {len(sel_books)} / {RULES['total']}"
-        self.rule_labels['total'].setText(total_text)
-        self.rule_labels['total'].setStyleSheet("color: "+ (COLOR_OK if total_ok else COLOR_BAD))
-
-        for sec, needed in RULES['section_counts'].items():
-            have = sum(1 for b in sel_books if b['section'] == sec)
-            ok = have >= needed
-            self.rule_labels[sec].setText(f"{sec}: {have} (min {needed})")
-            self.rule_labels[sec].setStyleSheet("color: "+ (COLOR_OK if ok else COLOR_BAD))
-
-        genres_required = RULES['genre_min_each']
-        genre_counts = {}
-        for b in sel_books:
-            g = b['genre'].capitalize()
-            genre_counts[g] = genre_counts.get(g, 0) + 1
-        for g in ["Próza", "Poezie", "Drama"]:
-            if g not in genre_counts:
-                genre_counts[g] = 0
-        genre_ok = all(genre_counts[g] >= genres_required for g in ["Próza", "Poezie", "Drama"])
-        self.rule_labels['genre'].setText(f"Žánry: Próza {genre_counts['Próza']}, Poezie {genre_counts['Poezie']}, Drama {genre_counts['Drama']} (min {genres_required} každá)")
-        self.rule_labels['genre'].setStyleSheet("color: "+ (COLOR_OK if genre_ok else COLOR_BAD))
-
-        author_counts = {}
-        for b in sel_books:
-            a = b['author']
-            author_counts[a] = author_counts.get(a, 0) + 1
-        author_ok = all(count <= RULES['max_per_author'] for count in author_counts.values())
-        bad_authors = [f"{a} ({c})" for a,c in author_counts.items() if c > RULES['max_per_author']]
-        if author_ok:
-            self.rule_labels['author'].setText(f"Autoři: max {RULES['max_per_author']} od jednoho autora (OK)")
-            self.rule_labels['author'].setStyleSheet("color: "+COLOR_OK)
-        else:
-            self.rule_labels['author'].setText("Překročení max. děl od autora: " + ", ".join(bad_authors))
-            self.rule_labels['author'].setStyleSheet("color: "+COLOR_BAD)
-
-        sections_ok = all((sum(1 for b in sel_books if b['section']==sec) >= need) for sec, need in RULES['section_counts'].items())
-
-        all_ok = total_ok and genre_ok and author_ok and sections_ok
-        self.btn_save_list.setEnabled(all_ok)
-
-        self.preview.clear()
-        for b in sel_books:
-            it = QListWidgetItem(f"{b['author']} — {b['title']} ({b['genre']})")
-            self.preview.addItem(it)
+        """Vykreslí stav pravidel z průběžných čítačů (diy_tally) – nic se nepřepočítává."""
+        t = self.diy_tally
+        for key, ok, text in t.report():
+            self.rule_labels[key].setText(text)
+            self.rule_labels[key].setStyleSheet("color: " + (COLOR_OK if ok else COLOR_BAD))
+
+        self.btn_save_list.setEnabled(t.is_valid())
+        self.diy_feasibility_timer.start()
+
+    def start_diy_feasibility(self):
+        self.diy_feasibility_gen += 1
+        selected = [self.diy_books[row] for row in self.diy_selected_rows]
+        task = FeasibilityTask(self.diy_feasibility_gen, self.diy_solver, selected)
+        task.signals.done.connect(self.apply_diy_feasibility)
+        self.diy_feasibility_task = task
+        QThreadPool.globalInstance().start(task)
+
+    def apply_diy_feasibility(self, generation: int, blocked: Dict[str, str]):
+        """Zešedne knihy, které by výběr udělaly neřešitelným; sahá jen na řádky, jejichž stav se změnil."""
+        if generation != self.diy_feasibility_gen:
+            return   # mezitím přišlo další kliknutí
+        old = self.diy_blocked
+        changed = [bid for bid in set(old) | set(blocked) if old.get(bid) != blocked.get(bid)]
+        grey = QBrush(QColor(COLOR_BLOCKED))
+        self.diy_list.blockSignals(True)
+        for bid in changed:
+            row = self.diy_row_of.get(bid)
+            if row is None:
+                continue
+            it = self.diy_list.item(row)
+            b = self.diy_books[row]
+            reason = blocked.get(bid)
+            if reason:
+                it.setForeground(grey)
+                it.setToolTip(f"{b['section']}\nNelze přidat: {reason}")
+            else:
+                it.setData(Qt.ForegroundRole, None)
+                it.setToolTip(f"{b['section']}")
+        self.diy_list.blockSignals(False)
+        self.diy_blocked = blocked
 
     def save_custom_list(self):
         sel_ids = self.get_selected_ids_from_diy()
@@ -755,29 +1824,28 @@ class MainWindow(QWidget):
             QMessageBox.warning(self, "Chyba", f"Musíte vybrat přesně {RULES['total']} děl.")
             return
         self.custom_selection = sel_ids.copy()
-        selected_books_in_order = []
-        for i in range(self.diy_list.count()):
-            it = self.diy_list.item(i)
-            if it.checkState() == Qt.Checked:
-                bid = it.data(Qt.UserRole)
-                for b in BOOKS:
-                    if make_id(b) == bid:
-                        selected_books_in_order.append(b)
-                        break
+        # sel_ids jsou v pořadí DIY seznamu
+        selected_books_in_order = CATALOG.resolve(sel_ids)
         # přepíš hlavní a ulož custom_selection trvale
         self.populate_list(selected_books_in_order)
-        save_state(self.state, self.custom_selection)
+        self.saver.mark_selection_dirty()
+        self.saver.flush()
         QMessageBox.information(self, "Hotovo", "Vlastní seznam byl uložen a hlavní seznam byl přepnuto a uloženo.")
         self.tabs.setCurrentIndex(0)
 
     def reset_to_full_list(self):
         self.custom_selection = None
         self.populate_list(ORIGINAL_20)
-        save_state(self.state, None)
+        self.saver.mark_selection_dirty()
+        self.saver.flush()
         QMessageBox.information(self, "Obnovení", "Hlavní seznam byl obnoven na původních 20 děl.")
 
 # ---------------------------
+mark_startup("import")
+
 def main():
+    # přehled třídy spouští pracovní procesy; v zabaleném .exe je musí obsloužit tento vstupní bod
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     w = MainWindow()
     w.show()
@@ -0,0 +1,238 @@
+"""
+Zátěžové měření aplikace Maturita na syntetických datech (Qt běží s QT_QPA_PLATFORM=offscreen).
+
+    python maturita_bench.py [--sizes 1000 10000 100000] [--repeat 5] [-o bench.json]
+    python maturita_bench.py --compare stary.json novy.json [--threshold 20]
+
+Pro každou velikost katalogu se vygeneruje katalog, stav s poznámkami od 1 KB do 1 MB a tisíce
+příloh a v samostatném procesu (katalog se načítá při importu) se změří load_state, save_state,
+vytvoření okna, populate_list, on_sort_changed, DIY tab a update_diy_validation, on_list_select
+a psaní do NotesEdit. Výsledek je JSON, dva běhy (např. dvou commitů) porovná --compare.
+Nic se nezapisuje do skutečných dat aplikace – vše běží v dočasné složce.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = [1000, 10000, 100000]
+NOTE_SIZES = [1 << 10] * 40 + [4 << 10, 16 << 10, 64 << 10, 256 << 10, 1 << 20]
+NOTED_BOOKS = 1000        # kolik děl má poznámky (velikosti cyklicky z NOTE_SIZES)
+ATTACHMENTS = 3000
+SELECT_CLICKS = 200
+TYPING_KEYS = 200
+
+# ---------- generování dat ----------
+def generate_catalog(folder: str, size: int, rules: Dict, seed: int = 1):
+    """books.json se size díly; oddíly a žánry z RULES, autoři po ~3 dílech, české znaky v názvech."""
+    rnd = random.Random(seed)
+    sections = list(rules["section_counts"])
+    genres = list(rules["genres"])
+    words = ["láska", "město", "noc", "řeka", "válka", "světlo", "čas", "země", "dům", "píseň", "život", "ticho"]
+    books = []
+    for i in range(size):
+        books.append({
+            "author": f"Autor {rnd.choice('ABČDEFGHIJKLMNOPŘSŠTUVZŽ')}. {i // 3:06d}",
+            "title": f"{rnd.choice(words).capitalize()} {rnd.choice(words)} {i}",
+            "genre": genres[i % len(genres)],
+            "section": sections[(i // len(genres)) % len(sections)],
+        })
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "books.json"), "w", encoding="utf-8") as f:
+        json.dump(books, f, ensure_ascii=False)
+
+def _note_text(size: int, rnd: random.Random) -> str:
+    words = ["postava", "děj", "motiv", "vypravěč", "kapitola", "téma", "autor", "jazyk", "kompozice", "čtenář"]
+    parts, n = [], 0
+    while n < size:
+        line = " ".join(rnd.choice(words) for _ in range(12)) + ".\n"
+        parts.append(line)
+        n += len(line)
+    return "".join(parts)[:size]
+
+def generate_state(core, seed: int = 2) -> Dict[str, str]:
+    """Stav do výchozího DATA_FILE + obsah příloh do BLOB_DIR. Vrací id díla s 1 KB a s 1 MB poznámkou."""
+    rnd = random.Random(seed)
+    ids = [core.CATALOG.id_of(b) for b in core.BOOKS]
+    entries = {bid: core.new_entry() for bid in ids}
+    marks = {}
+    for i, bid in enumerate(ids[:NOTED_BOOKS]):
+        size = NOTE_SIZES[i % len(NOTE_SIZES)]
+        entries[bid]["notes"] = _note_text(size, rnd)
+        marks.setdefault(size, bid)
+    for bid in ids[::4]:
+        entries[bid]["completed"] = True
+    for i in range(ATTACHMENTS):
+        data = f"příloha {i}\n".encode("utf-8") * 64
+        blob = hashlib.sha256(data).hexdigest() + ".bin"
+        path = core.blob_path(blob)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        entries[ids[i % len(ids)]]["attachments"].append({"name": f"soubor{i}.bin", "blob": blob})
+    core.save_state(entries, None)
+    return {"note_1k": marks[1 << 10], "note_1m": marks[1 << 20]}
+
+# ---------- měření ----------
+def timed(fn, repeat: int, per: int = 1) -> Dict:
+    """min a medián z repeat běhů v ms; per = kolik operací jeden běh obsahuje (výsledek je na operaci)."""
+    runs = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t) * 1000 / per)
+    return {"min_ms": round(min(runs), 4), "median_ms": round(statistics.median(runs), 4),
+            "runs": [round(r, 4) for r in runs], "per": per}
+
+def run_size(size: int, repeat: int) -> Dict:
+    """Běží v dětském procesu s APPDATA a MATURITA_CATALOG nastavenými rodičem."""
+    import maturita_core as core
+    marks = generate_state(core)
+    import maturita as m
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtTest import QTest
+
+    app = QApplication.instance() or QApplication([])
+    res: Dict[str, Dict] = {}
+    res["load_state"] = timed(core.load_state, repeat)
+    entries, custom = core.load_state()
+    res["save_state"] = timed(lambda: core.save_state(entries, custom), repeat)
+
+    windows = []
+    def make_window():
+        w = m.MainWindow()
+        w.show()
+        app.processEvents()
+        windows.append(w)
+    res["main_window"] = timed(make_window, 1)
+    w = windows[0]
+
+    res["populate_list"] = timed(lambda: w.populate_list(m.BOOKS), repeat)
+    def sort_all():
+        for idx in range(w.sort_combo.count()):
+            w.sort_combo.setCurrentIndex(idx)
+            w.on_sort_changed(idx)
+    res["on_sort_changed"] = timed(sort_all, repeat, per=w.sort_combo.count())
+    w.sort_combo.setCurrentIndex(0)
+
+    rows = w.list_proxy.rowCount()
+    step = max(1, rows // SELECT_CLICKS)
+    def select_burst():
+        for r in range(0, step * SELECT_CLICKS, step):
+            w.on_list_select(w.list_proxy.index(r % rows))
+        app.processEvents()
+    res["on_list_select"] = timed(select_burst, repeat, per=SELECT_CLICKS)
+
+    for key, bid in marks.items():
+        def typing(bid=bid):
+            w.show_book(bid)
+            w.notes.moveCursor(m.QTextCursor.End)
+            for _ in range(TYPING_KEYS):
+                QTest.keyClick(w.notes, "a")
+        res[f"typing_{key}"] = timed(typing, repeat, per=TYPING_KEYS)
+        res[f"commit_{key}"] = timed(lambda: (setattr(w, "notes_dirty", True), w.commit_notes()), repeat)
+
+    res["ensure_diy_tab"] = timed(w.ensure_diy_tab, 1)
+    res["update_diy_validation"] = timed(w.update_diy_validation, repeat)
+    item = w.diy_list.item(0)
+    def diy_click():
+        item.setCheckState(m.Qt.Checked if item.checkState() == m.Qt.Unchecked else m.Qt.Unchecked)
+    res["diy_click"] = timed(diy_click, repeat * 4)
+
+    w.diy_feasibility_timer.stop()
+    w.close()
+    app.processEvents()
+    return res
+
+# ---------- řízení a porovnání ----------
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+def run_all(sizes: List[int], repeat: int) -> Dict:
+    out = {"meta": {"commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": repeat, "sizes": sizes},
+           "results": {}}
+    with tempfile.TemporaryDirectory(prefix="maturita_bench_") as tmp:
+        # RULES z katalogu, který by použila aplikace (bez zásahu do jejích dat)
+        os.environ["APPDATA"] = os.path.join(tmp, "rules_probe")
+        os.environ["MATURITA_CATALOG"] = os.path.join(tmp, "empty")
+        sys.path.insert(0, HERE)
+        import maturita_core as core
+        for size in sizes:
+            work = os.path.join(tmp, str(size))
+            generate_catalog(os.path.join(work, "katalog"), size, core.RULES)
+            env = dict(os.environ, APPDATA=os.path.join(work, "appdata"),
+                       MATURITA_CATALOG=os.path.join(work, "katalog"), QT_QPA_PLATFORM="offscreen",
+                       MATURITA_BACKUP="0")
+            print(f"[{size}] měřím…", file=sys.stderr)
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(size), "--repeat", str(repeat)],
+                                  env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                out["results"][str(size)] = {"error": proc.stderr.strip().splitlines()[-1:] or ["?"]}
+                continue
+            # poslední řádek výstupu je JSON (Qt může před ním vypsat hlášky)
+            out["results"][str(size)] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return out
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old['meta'].get('commit') or old_path} -> {new['meta'].get('commit') or new_path} (medián, ms)")
+    worse = 0
+    for size, metrics in new["results"].items():
+        base = old["results"].get(size, {})
+        for name, m in metrics.items():
+            if not isinstance(m, dict) or name not in base or not isinstance(base[name], dict):
+                continue
+            a, b = base[name]["median_ms"], m["median_ms"]
+            change = (b - a) / a * 100 if a else 0.0
+            flag = ""
+            if threshold and change > threshold:
+                flag = "  <-- zhoršení"
+                worse += 1
+            print(f"{size:>7} {name:24} {a:12.3f} {b:12.3f} {change:+8.1f} %{flag}")
+    return 1 if worse else 0
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="maturita_bench", description="Zátěžové měření aplikace Maturita.")
+    p.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="velikosti katalogu")
+    p.add_argument("--repeat", type=int, default=5, help="počet opakování každého měření")
+    p.add_argument("-o", "--output", help="výstupní JSON (výchozí stdout)")
+    p.add_argument("--compare", nargs=2, metavar=("STARY", "NOVY"), help="porovná dva výsledky")
+    p.add_argument("--threshold", type=float, default=0.0, help="zhoršení v %%, nad které skončí kódem 1")
+    p.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+
+    if args.compare:
+        return compare(args.compare[0], args.compare[1], args.threshold)
+    if args.child:
+        sys.path.insert(0, HERE)
+        print(json.dumps(run_size(args.child, args.repeat)))
+        return 0
+    out = run_all(args.sizes, args.repeat)
+    text = json.dumps(out, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
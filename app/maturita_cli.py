@@ -0,0 +1,370 @@
+"""
+Příkazová řádka pro data aplikace Maturita – bez Qt, takže startuje hned a jde spouštět dávkově.
+
+    python maturita_cli.py validate [ID ...] [--ids SOUBOR|-] [--data SOUBOR ...]
+    python maturita_cli.py export --format csv|md|jsonl [--data SOUBOR ...] [-o VÝSTUP]
+    python maturita_cli.py import-notes SLOŽKA [--data SOUBOR] [--append] [--dry-run]
+    python maturita_cli.py dashboard SLOŽKA [--workers N] [--top N] [--json]
+    python maturita_cli.py backup [--list] [--no-prune]
+    python maturita_cli.py restore ZÁLOHA
+
+--data bere maturita_data.json (i se žurnálem a ve starém formátu) nebo maturita_data.sqlite3;
+bez něj se použije uložený stav aplikace. Poškozený soubor skončí chybou (kód 2) a nic se do něj nezapíše.
+"""
+import argparse
+import csv
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from maturita_core import (
+    BACKUP_DIR, CATALOG, ClassDashboard, DATA_FILE, DB_FILE, ORIGINAL_20, RULES, RuleTally, SqliteStore, USE_SQLITE,
+    VIOLATION_LABELS, attachment_name, create_backup, fold_text, list_backups, new_entry, read_state,
+    restore_backup, save_state
+)
+
+SQLITE_SUFFIXES = {".sqlite3", ".sqlite", ".db"}
+IMPORT_BATCH = 500    # po kolika poznámkách se zapisuje do SQLite
+
+def default_data_file() -> pathlib.Path:
+    return DB_FILE if USE_SQLITE else DATA_FILE
+
+def is_sqlite(path: pathlib.Path) -> bool:
+    return path.suffix.lower() in SQLITE_SUFFIXES
+
+def open_store(path: pathlib.Path) -> SqliteStore:
+    # SqliteStore by neexistující soubor založil – pro čtení cizích dat to nechceme
+    if not path.exists():
+        raise FileNotFoundError(path)
+    return SqliteStore(path)
+
+def iter_entries(path: pathlib.Path) -> Iterator[Tuple[str, dict]]:
+    """(id, entry) ze souboru se stavem; SQLite se čte kurzorem, JSON je jeden dokument."""
+    if is_sqlite(path):
+        store = open_store(path)
+        try:
+            yield from store.iter_entries()
+        finally:
+            store.close()
+    else:
+        if not path.exists():
+            raise FileNotFoundError(path)
+        entries, _ = read_state(path)
+        for bid in sorted(entries):
+            if isinstance(entries[bid], dict):
+                yield bid, entries[bid]
+
+def read_custom_selection(path: pathlib.Path) -> Optional[List[str]]:
+    if is_sqlite(path):
+        store = open_store(path)
+        try:
+            return store.custom_selection()
+        finally:
+            store.close()
+    if not path.exists():
+        raise FileNotFoundError(path)
+    return read_state(path)[1]
+
+def iter_id_lines(source: str) -> Iterator[str]:
+    f = sys.stdin if source == "-" else open(source, "r", encoding="utf-8-sig")
+    try:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+# ---------- validate ----------
+def validate_ids(ids, label: str, out) -> bool:
+    tally = RuleTally(RULES)
+    unknown = []
+    seen = set()
+    for bid in ids:
+        book = CATALOG.get(bid)
+        if book is None:
+            unknown.append(bid)
+        elif bid not in seen:
+            seen.add(bid)
+            tally.add(book)
+    ok = tally.is_valid() and not unknown
+    out.write(f"{label}: {'OK' if ok else 'CHYBA'}\n")
+    for key, line_ok, text in tally.report():
+        out.write(f"  [{'x' if line_ok else ' '}] {text}\n")
+    for bid in unknown:
+        out.write(f"  [ ] Neznámé id: {bid}\n")
+    return ok
+
+def cmd_validate(args) -> int:
+    out = sys.stdout
+    ok = True
+    if args.ids or args.id_file:
+        ids = list(args.ids)
+        if args.id_file:
+            ids.extend(iter_id_lines(args.id_file))
+        ok = validate_ids(ids, "Zadaný seznam", out)
+    else:
+        # bez seznamu: uložený vlastní výběr každého souboru (např. dávka přes celou třídu)
+        for path in args.data or [default_data_file()]:
+            try:
+                custom = read_custom_selection(path)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                out.write(f"{path}: nelze načíst ({e})\n")
+                ok = False
+                continue
+            if custom is None:
+                out.write(f"{path}: bez vlastního seznamu (platí výchozích {len(ORIGINAL_20)} děl)\n")
+                continue
+            ok = validate_ids(custom, str(path), out) and ok
+    return 0 if ok else 1
+
+# ---------- export ----------
+EXPORT_FIELDS = ["source", "id", "author", "title", "genre", "section", "completed", "notes", "attachments"]
+
+def iter_rows(paths: List[pathlib.Path]) -> Iterator[Dict]:
+    for path in paths:
+        for bid, entry in iter_entries(path):
+            book = CATALOG.get(bid) or {}
+            yield {
+                "source": str(path),
+                "id": bid,
+                "author": book.get("author", ""),
+                "title": book.get("title", ""),
+                "genre": book.get("genre", ""),
+                "section": book.get("section", ""),
+                "completed": bool(entry.get("completed")),
+                "notes": entry.get("notes") or "",
+                "attachments": [attachment_name(att) for att in entry.get("attachments") or ()],
+            }
+
+def export_csv(rows, out):
+    w = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+    w.writeheader()
+    for row in rows:
+        row["completed"] = int(row["completed"])
+        row["attachments"] = "; ".join(row["attachments"])
+        w.writerow(row)
+
+def export_jsonl(rows, out):
+    for row in rows:
+        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+def export_md(rows, out):
+    source = None
+    for row in rows:
+        if row["source"] != source:
+            source = row["source"]
+            out.write(f"# {source}\n\n")
+        heading = f"{row['author']} — {row['title']}" if row["title"] else row["id"]
+        out.write(f"## {heading}\n\n")
+        out.write(f"- [{'x' if row['completed'] else ' '}] dokončeno\n")
+        if row["section"]:
+            out.write(f"- {row['genre']} — {row['section']}\n")
+        for name in row["attachments"]:
+            out.write(f"- příloha: {name}\n")
+        if row["notes"].strip():
+            out.write("\n" + row["notes"].rstrip() + "\n")
+        out.write("\n")
+
+EXPORTERS = {"csv": export_csv, "jsonl": export_jsonl, "md": export_md}
+
+def cmd_export(args) -> int:
+    rows = iter_rows(args.data or [default_data_file()])
+    if args.output and args.output != "-":
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            EXPORTERS[args.format](rows, out)
+    else:
+        EXPORTERS[args.format](rows, sys.stdout)
+    return 0
+
+# ---------- import-notes ----------
+def _match_keys(text: str) -> List[str]:
+    folded = fold_text(text).strip()
+    keys = [folded]
+    for sep in (" — ", " – ", " - ", "_-_"):
+        if sep in folded:
+            author, title = folded.split(sep, 1)
+            keys.append(f"{author.strip()}|{title.strip()}")
+    return keys
+
+def build_note_lookup() -> Dict[str, Optional[str]]:
+    """Složené klíče -> id: id, "autor|název" a samotný název (jen pokud je jednoznačný)."""
+    lookup: Dict[str, Optional[str]] = {}
+    for bid, b in CATALOG.by_id.items():
+        lookup[bid.lower()] = bid
+        lookup[fold_text(f"{b['author']}|{b['title']}")] = bid
+        title = fold_text(b["title"])
+        lookup[title] = None if title in lookup and lookup[title] != bid else bid
+    return lookup
+
+def iter_note_files(folder: pathlib.Path) -> Iterator[os.DirEntry]:
+    stack = [folder]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for de in it:
+                if de.is_dir(follow_symlinks=False):
+                    stack.append(de.path)
+                elif de.name.lower().endswith((".md", ".markdown", ".txt")):
+                    yield de
+
+def cmd_import_notes(args) -> int:
+    data = args.data[0] if args.data else default_data_file()
+    lookup = build_note_lookup()
+    sqlite = is_sqlite(data)
+    store = open_store(data) if sqlite else None
+    if store is not None:
+        entries, custom = store.load()
+    elif data.exists():
+        # read_state chybu propustí: poškozený soubor se nesmí přepsat jen importovanými poznámkami
+        entries, custom = read_state(data)
+    else:
+        entries, custom = {}, None
+    batch: Dict[str, dict] = {}
+    imported, unmatched = 0, []
+    try:
+        for de in iter_note_files(args.folder):
+            stem = os.path.splitext(de.name)[0]
+            bid = None
+            for key in _match_keys(stem):
+                bid = lookup.get(key)
+                if bid:
+                    break
+            if not bid:
+                unmatched.append(de.path)
+                continue
+            with open(de.path, "r", encoding="utf-8-sig") as f:
+                text = f.read()
+            entry = entries.setdefault(bid, new_entry())
+            if args.append and entry.get("notes"):
+                entry["notes"] = entry["notes"].rstrip("\n") + "\n\n" + text
+            else:
+                entry["notes"] = text
+            imported += 1
+            batch[bid] = entry
+            if store is not None and len(batch) >= IMPORT_BATCH and not args.dry_run:
+                store.write(batch)
+                batch = {}
+        if not args.dry_run:
+            if store is not None:
+                store.write(batch)
+            elif imported:
+                save_state(entries, custom, data_file=data)
+    finally:
+        if store is not None:
+            store.close()
+    print(f"Importováno {imported} poznámek{' (nanečisto)' if args.dry_run else ''} do {data}")
+    for path in unmatched:
+        print(f"Nepřiřazeno: {path}", file=sys.stderr)
+    return 0 if not unmatched else 2
+
+# ---------- dashboard ----------
+def cmd_dashboard(args) -> int:
+    if not args.folder.is_dir():
+        raise FileNotFoundError(args.folder)
+    dash = ClassDashboard(args.folder)
+    stats = dash.refresh(workers=args.workers)
+    rows = ClassDashboard.book_rows(stats)
+    if args.json:
+        out = {k: v for k, v in stats.items() if k not in ("completed", "chosen", "notes_count", "notes_chars")}
+        out["books"] = rows
+        json.dump(out, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return 0
+    print(f"Žáků: {stats['students']} (načteno znovu {stats['parsed']}, z cache {stats['reused']})")
+    print(f"Vlastní seznamy: {stats['custom_lists']}, z toho v rozporu s pravidly {stats['invalid_lists']}")
+    for key, n in stats["violations"].most_common():
+        print(f"  {VIOLATION_LABELS.get(key, key)}: {n}")
+    print(f"Poznámky: {sum(stats['notes_count'].values())} u děl, "
+          f"{sum(stats['notes_chars'].values())} znaků, {stats['notes_words']} slov")
+    print()
+    print(f"{'Dílo':60} {'dokončilo':>10} {'vybralo':>8} {'poznámek':>9}")
+    for r in rows[:args.top] if args.top else rows:
+        name = f"{r['author']} – {r['title']}" if r["author"] else r["title"]
+        print(f"{name[:60]:60} {r['completion_rate']:>9.0%} {r['chosen']:>8} {r['notes']:>9}")
+    for path, err in stats["errors"]:
+        print(f"Nelze načíst {path}: {err}", file=sys.stderr)
+    return 0 if not stats["errors"] else 2
+
+# ---------- zálohy ----------
+def cmd_backup(args) -> int:
+    if args.list:
+        for b in list_backups():
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(b["time"] or 0))
+            print(f"{b['name']:20} {when}  {b['files']:>6} souborů {b['size'] / 1e6:>10.1f} MB  {b['reason']}")
+        return 0
+    r = create_backup(prune=not args.no_prune)
+    if r["unchanged"]:
+        print(f"Beze změny od zálohy {r['name']} ({r['ms']:.0f} ms)")
+    else:
+        print(f"Záloha {r['name']} v {BACKUP_DIR}: {r['files']} souborů, přečteno {r['read']}, "
+              f"nově uloženo {r['new_bytes'] / 1e6:.1f} MB, smazáno starých záloh {r['pruned']} ({r['ms']:.0f} ms)")
+    return 0
+
+def cmd_restore(args) -> int:
+    if args.name not in {b["name"] for b in list_backups()}:
+        raise FileNotFoundError(BACKUP_DIR / "snapshots" / f"{args.name}.json")
+    r = restore_backup(args.name)
+    print(f"Obnovena záloha {r['name']}: přepsáno {r['written']} souborů, smazáno {r['removed']}; "
+          f"předchozí stav je v záloze {r['safety']}")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="maturita_cli", description="Data aplikace Maturita bez GUI.")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    v = sub.add_parser("validate", help="ověří seznam id (nebo uložené vlastní seznamy) podle RULES")
+    v.add_argument("ids", nargs="*", help="id děl (jako v maturita_data.json)")
+    v.add_argument("--ids", dest="id_file", metavar="SOUBOR", help="soubor s id po řádcích, - = stdin")
+    v.add_argument("--data", type=pathlib.Path, action="append", help="soubor se stavem (lze opakovat)")
+    v.set_defaults(func=cmd_validate)
+
+    e = sub.add_parser("export", help="export poznámek, dokončení a příloh")
+    e.add_argument("--format", choices=sorted(EXPORTERS), default="csv")
+    e.add_argument("--data", type=pathlib.Path, action="append", help="soubor se stavem (lze opakovat)")
+    e.add_argument("-o", "--output", help="výstupní soubor (výchozí stdout)")
+    e.set_defaults(func=cmd_export)
+
+    i = sub.add_parser("import-notes", help="načte poznámky z Markdown souborů ve složce")
+    i.add_argument("folder", type=pathlib.Path)
+    i.add_argument("--data", type=pathlib.Path, action="append", help="soubor se stavem")
+    i.add_argument("--append", action="store_true", help="připojit za existující poznámky místo přepsání")
+    i.add_argument("--dry-run", action="store_true", help="jen ukázat, co by se importovalo")
+    i.set_defaults(func=cmd_import_notes)
+
+    d = sub.add_parser("dashboard", help="přehled třídy nad složkou žákovských souborů")
+    d.add_argument("folder", type=pathlib.Path)
+    d.add_argument("--workers", type=int, help="počet procesů (výchozí počet jader)")
+    d.add_argument("--top", type=int, default=30, help="kolik děl vypsat (0 = všechna)")
+    d.add_argument("--json", action="store_true", help="výstup jako JSON")
+    d.set_defaults(func=cmd_dashboard)
+
+    b = sub.add_parser("backup", help="záloha dat aplikace (jen změněné soubory) s postupnou retencí")
+    b.add_argument("--list", action="store_true", help="jen vypsat zálohy")
+    b.add_argument("--no-prune", action="store_true", help="nemazat staré zálohy podle retence")
+    b.set_defaults(func=cmd_backup)
+
+    r = sub.add_parser("restore", help="vrátí data do stavu zálohy (současný stav se předtím zazálohuje)")
+    r.add_argument("name", help="jméno zálohy (viz backup --list)")
+    r.set_defaults(func=cmd_restore)
+    return p
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except FileNotFoundError as e:
+        print(f"Soubor nenalezen: {e}", file=sys.stderr)
+        return 2
+    except BrokenPipeError:
+        return 0
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Nelze načíst data: {e}", file=sys.stderr)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3154 @@
+"""
+Logika aplikace Maturita bez Qt: katalog a pravidla, ukládání stavu, přílohy a hledání.
+Používá ji okno (maturita.py) i příkazová řádka (maturita_cli.py), která tak PySide6 vůbec nenačítá.
+"""
+import sys
+import base64
+import bisect
+import csv
+import datetime
+import functools
+import hashlib
+import json
+import shutil
+import sqlite3
+import os
+import pathlib
+import re
+import threading
+import time
+import traceback
+import unicodedata
+import uuid
+import zipfile
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+from xml.etree import ElementTree
+from itertools import combinations, product
+from math import comb, log
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+try:
+    from pypdf import PdfReader
+except Exception:
+    PdfReader = None
+
+try:
+    import fcntl
+    FICLONE = 0x40049409    # ioctl pro reflink příloh (btrfs, XFS, …)
+except ImportError:     # Windows: zámky přes msvcrt, přílohy se kopírují
+    fcntl = None
+    import msvcrt
+
+RESOURCE_DIR = pathlib.Path(getattr(sys, "_MEIPASS", pathlib.Path(__file__).parent))
+
+def _get_appdata_dir():
+    # prefer Windows APPDATA, then XDG_CONFIG_HOME / LOCALAPPDATA, fall back to home
+    appdata = os.environ.get("APPDATA") or os.environ.get("XDG_CONFIG_HOME") or os.environ.get("LOCALAPPDATA")
+    if appdata:
+        return pathlib.Path(appdata)
+    return pathlib.Path.home()
+
+# Always use AppData (or fallback) as the persistent storage location
+BASE_DIR = _get_appdata_dir() / "MaturitaApp"
+
+# Ensure directory exists; if creation fails, fall back to user home
+try:
+    BASE_DIR.mkdir(parents=True, exist_ok=True)
+except Exception:
+    BASE_DIR = pathlib.Path.home() / "MaturitaApp"
+    BASE_DIR.mkdir(parents=True, exist_ok=True)
+
+DATA_FILE = BASE_DIR / "maturita_data.json"
+# append-only žurnál změněných položek; snapshot v DATA_FILE se přepisuje jen při kompakci
+def journal_file_for(data_file: pathlib.Path) -> pathlib.Path:
+    return data_file.with_suffix(".journal")
+
+JOURNAL_FILE = journal_file_for(DATA_FILE)
+# volitelné úložiště v SQLite (po řádcích); jakmile databáze existuje, používá se místo JSON
+DB_FILE = BASE_DIR / "maturita_data.sqlite3"
+USE_SQLITE = os.environ.get("MATURITA_SQLITE") == "1" or DB_FILE.exists()
+ATTACH_DIR = BASE_DIR / "attachments"
+ATTACH_DIR.mkdir(parents=True, exist_ok=True)
+# obsahově adresované přílohy: blobs/<2 znaky hashe>/<sha256><přípona>, každý obsah jen jednou
+BLOB_DIR = ATTACH_DIR / "blobs"
+HASH_CHUNK = 1 << 20
+# vytažený text příloh: <sha256>.txt, každý obsah se zpracuje jen jednou (i napříč spuštěními)
+TEXT_CACHE_DIR = BASE_DIR / "attachment_text"
+TEXT_LIMIT = 2_000_000  # znaků na přílohu, víc do indexu nemá smysl tahat
+# historie verzí poznámek: <sha1 id>.jsonl na dílo
+HISTORY_DIR = BASE_DIR / "notes_history"
+HISTORY_INTERVAL = 120.0     # s – při souvislé práci nejvýš jedna verze za tuto dobu
+HISTORY_KEYFRAME_EVERY = 50  # nejpozději po tolika rozdílech se ukládá plný text
+HISTORY_MAX_VERSIONS = 300   # nad tento počet se nejstarší verze zahodí
+HISTORY_BIG_DROP = 200       # znaků – takové smazání dostane verzi hned, i s textem před ním
+HISTORY_COMPRESS_OVER = 4096 # znaků – delší plný text se ukládá zkomprimovaný (zlib + base64)
+
+# keep any existing flag you use
+AUTO_SAVE = True
+SAVE_DELAY = 0.5        # s – jak dlouho slučovat změny, než se zapíšou do žurnálu
+COMPACT_EVERY = 200     # po kolika záznamech v žurnálu se zapíše čerstvý snapshot
+COMPACT_RATIO = 2       # ... nebo když je žurnál tolikrát větší než snapshot (každý záznam nese celé poznámky)
+COMPACT_MIN_BYTES = 1 << 20     # pod tuto velikost žurnálu se kvůli poměru nekompaktuje
+COMPACT_MAX_BYTES = 32 << 20    # nad tuto velikost se kompaktuje vždy, i u velkého snapshotu
+WATCH_INTERVAL = 1.0    # s – jak často se bez vlastních změn kontroluje, jestli data nezměnilo jiné okno
+
+# ---------- volitelné měření (MATURITA_TRACE) ----------
+# MATURITA_TRACE=1 -> trace do BASE_DIR/trace.jsonl, MATURITA_TRACE=cesta -> do zadaného souboru
+TRACE_FILE = BASE_DIR / "trace.jsonl"
+TRACE_WINDOW = 2000     # z kolika posledních vzorků se počítají p50/p99
+
+class Tracer:
+    """
+    Doby operací (ms) po názvech: posledních TRACE_WINDOW vzorků pro p50/p99 a řádky do JSONL.
+    Volá se z GUI i z vláken na pozadí, proto zámek.
+    """
+    def __init__(self, path: Optional[pathlib.Path] = None, window: int = TRACE_WINDOW):
+        self.window = window
+        self.samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8", buffering=1)
+            self._file.write(json.dumps({"trace": "maturita", "pid": os.getpid(), "started": time.time()}) + "\n")
+
+    def record(self, name: str, ms: float, log: bool = True, **extra):
+        """Přidá vzorek; log=False jen do statistiky (např. každý tep smyčky událostí)."""
+        with self._lock:
+            d = self.samples.get(name)
+            if d is None:
+                d = self.samples[name] = deque(maxlen=self.window)
+            d.append(ms)
+            if log and self._file is not None:
+                rec = {"ts": round(time.time(), 4), "name": name, "ms": round(ms, 3),
+                       "thread": threading.current_thread().name}
+                rec.update(extra)
+                self._file.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    def summary(self) -> Dict[str, Tuple[float, float, int]]:
+        """název -> (p50, p99, počet vzorků v okně)."""
+        with self._lock:
+            snap = {name: sorted(d) for name, d in self.samples.items() if d}
+        out = {}
+        for name, vals in snap.items():
+            n = len(vals)
+            out[name] = (vals[(n - 1) // 2], vals[min(n - 1, int(n * 0.99))], n)
+        return out
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+TRACER: Optional[Tracer] = None
+
+def enable_tracing(path: Optional[pathlib.Path] = None) -> Tracer:
+    global TRACER
+    if TRACER is None:
+        TRACER = Tracer(path)
+    return TRACER
+
+def disable_tracing():
+    global TRACER
+    if TRACER is not None:
+        TRACER.close()
+        TRACER = None
+
+def tracing_from_env() -> Optional[Tracer]:
+    value = os.environ.get("MATURITA_TRACE")
+    if not value or value == "0":
+        return TRACER
+    return enable_tracing(TRACE_FILE if value == "1" else pathlib.Path(value))
+
+def traced(name: str):
+    """Dekorátor: změří dobu volání, když je měření zapnuté; jinak jen jedno čtení globální proměnné."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            tracer = TRACER
+            if tracer is None:
+                return fn(*args, **kwargs)
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                tracer.record(name, (time.perf_counter() - t) * 1000)
+        return inner
+    return wrap
+
+# (BOOKS + ORIGINAL_20 + RULES remain the same as v předchozím souboru)
+# Kopíruju sem pro úplnost — uprav si podle potřeby.
+
+BOOKS = [
+    {"author": "Dante Alighieri", "title": "Božská komedie", "genre": "Poezie", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "Giovanni Boccaccio", "title": "Dekameron", "genre": "Próza", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "Jan Amos Komenský", "title": "Labyrint světa a ráj srdce", "genre": "Próza", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "William Shakespeare", "title": "Hamlet", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "Molière", "title": "Lakomec", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "William Shakespeare", "title": "Othello", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "Daniel Defoe", "title": "Robinson Crusoe", "genre": "Próza", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "William Shakespeare", "title": "Romeo a Julie", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "Carlo Goldoni", "title": "Sluha dvou pánů", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "Johann Wolfgang Goethe", "title": "Utrpení mladého Werthera", "genre": "Próza", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "Molière", "title": "Zdravý nemocný", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "William Shakespeare", "title": "Zkrocení zlé ženy", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
+
+    {"author": "Božena Němcová", "title": "Babička", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Božena Němcová", "title": "Divá Bára", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Viktor Hugo", "title": "Chrám Matky Boží v Paříži", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Karel Havlíček Borovský", "title": "Král Lávra", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Karel Jaromír Erben", "title": "Kytice", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Karel Hynek Mácha", "title": "Máj", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Jaroslav Vrchlický", "title": "Noc na Karlštejně", "genre": "Drama", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Svatopluk Čech", "title": "Pán Brouček - výlet", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Gustave Flaubert", "title": "Paní Bovaryová", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Jan Neruda", "title": "Povídky malostranské", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Nikolaj Vasiljevič Gogol", "title": "Revizor", "genre": "Drama", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Josef Kajetán Tyl", "title": "Strakonický dudák", "genre": "Drama", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Karel Havlíček Borovský", "title": "Tyrolské elegie", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Edgar Allan Poe", "title": "Vraždy v ulici Morgue", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Božena Němcová", "title": "V zámku a v podzámčí", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Fjodor Michajlovič Dostojevskij", "title": "Zločin a trest", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+
+    {"author": "Erich Maria Remarque", "title": "Cesta zpátky", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Mika Waltari", "title": "Egypťan Sinuhet", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "George Orwell", "title": "Farma zvířat", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Joseph Heller", "title": "Hlava XXII", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Alberto Moravia", "title": "Horalka", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Umberto Eco", "title": "Jméno růže", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Gabriel García Márquez", "title": "Kronika ohlášené smrti", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Vladimir Nabokov", "title": "Lolita", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Ray Bradbury", "title": "Marťanská kronika", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Jack Kerouac", "title": "Na cestě", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Erich Maria Remarque", "title": "Na západní frontě klid", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Romain Rolland", "title": "Petr a Lucie", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Ernest Hemingway", "title": "Sbohem, armádo", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Ernest Hemingway", "title": "Stařec a moře", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "William Styron", "title": "Sophiina volba", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Erich Maria Remarque", "title": "Tři kamarádi", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Francis Scott Fitzgerald", "title": "Veliký Gatsby", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+
+    {"author": "Michal Viewegh", "title": "Báječná léta pod psa", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Karel Čapek", "title": "Bílá nemoc", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Karel Poláček", "title": "Bylo nás pět", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Zdeněk Svěrák a Ladislav Smoljak", "title": "České nebe", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Ota Pavel", "title": "Jak jsem potkal ryby", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Květa Legátová", "title": "Jozova Hanule", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Pavel Kohout", "title": "Katyně", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Viktor Dyk", "title": "Krysař", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Vítězslav Nezval", "title": "Manon Lescaut", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Vladislav Vančura", "title": "Markéta Lazarová", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Radek John", "title": "Memento", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Arnošt Lustig", "title": "Modlitba pro Kateřinu Horovitzovou", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Rudolf Křesťan", "title": "Myš v 11. patře", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Ivan Olbracht", "title": "Nikola Šuhaj loupežník", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Bohumil Hrabal", "title": "Obsluhoval jsem anglického krále", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Bohumil Hrabal", "title": "Ostře sledované vlaky", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Jaroslav Hašek", "title": "Osudy dobrého vojáka Švejka za světové války", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Karel Čapek", "title": "Povídky z jedné a druhé kapsy", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Franz Kafka", "title": "Proměna", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Jan Otčenášek", "title": "Romeo, Julie a tma", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Karel Čapek", "title": "R.U.R.", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Petr Bezruč", "title": "Slezské písně", "genre": "Poezie", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Ota Pavel", "title": "Smrt krásných srnců", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Ladislav Fuks", "title": "Spalovač mrtvol", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Michal Viewegh", "title": "Švédské stoly aneb Jací jsme", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Karel Čapek", "title": "Trapné povídky", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Michal Viewegh", "title": "Účastníci zájezdu", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Karel Čapek", "title": "Válka s Mloky", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Karel Čapek", "title": "Výlet do Španěl", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Josef Škvorecký", "title": "Zbabělci", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Viktor Dyk", "title": "Zmoudření Dona Quijota", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Milan Kundera", "title": "Žert", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+]
+
+ORIGINAL_20 = [
+    {"author": "Molière", "title": "Lakomec", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "Carlo Goldoni", "title": "Sluha dvou pánů", "genre": "Drama", "section": "Světová a česká literatura do konce 18. stol."},
+    {"author": "Božena Němcová", "title": "Babička", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Karel Havlíček Borovský", "title": "Král Lávra", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Karel Jaromír Erben", "title": "Kytice", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Nikolaj Vasiljevič Gogol", "title": "Revizor", "genre": "Drama", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Karel Havlíček Borovský", "title": "Tyrolské elegie", "genre": "Poezie", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Edgar Allan Poe", "title": "Vraždy v ulici Morgue", "genre": "Próza", "section": "Světová a česká literatura do konce 19. stol."},
+    {"author": "Erich Maria Remarque", "title": "Cesta zpátky", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Erich Maria Remarque", "title": "Na západní frontě klid", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Romain Rolland", "title": "Petr a Lucie", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Francis Scott Fitzgerald", "title": "Veliký Gatsby", "genre": "Próza", "section": "Světová literatura 20. a 21. stol."},
+    {"author": "Zdeněk Svěrák a Ladislav Smoljak", "title": "České nebe", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Ota Pavel", "title": "Jak jsem potkal ryby", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Bohumil Hrabal", "title": "Obsluhoval jsem anglického krále", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Bohumil Hrabal", "title": "Ostře sledované vlaky", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Jaroslav Hašek", "title": "Osudy dobrého vojáka Švejka za světové války", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Franz Kafka", "title": "Proměna", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Karel Čapek", "title": "R.U.R.", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."},
+    {"author": "Ota Pavel", "title": "Smrt krásných srnců", "genre": "Próza", "section": "Česká literatura 20. a 21. stol."},
+]
+
+RULES = {
+    "total": 20,
+    "section_counts": {
+        "Světová a česká literatura do konce 18. stol.": 2,
+        "Světová a česká literatura do konce 19. stol.": 3,
+        "Světová literatura 20. a 21. stol.": 4,
+        "Česká literatura 20. a 21. stol.": 5,
+    },
+    "genres": ["Próza", "Poezie", "Drama"],
+    "genre_min_each": 2,
+    "max_per_author": 2,
+}
+
+# ---------- katalog z datových souborů ----------
+# Katalog (books.*), výchozí seznam (original.*) a pravidla (rules.json) lze dodat jako soubory
+# ve složce "katalog" – v AppData (má přednost), nebo vedle aplikace. Co chybí, bere se z literálů výše.
+CATALOG_DIRS = [pathlib.Path(p) for p in filter(None, [os.environ.get("MATURITA_CATALOG")])]
+CATALOG_DIRS += [BASE_DIR / "katalog", RESOURCE_DIR / "katalog"]
+CATALOG_SUFFIXES = (".csv", ".jsonl", ".json")
+BOOK_FIELDS = ("author", "title", "genre", "section")
+CATALOG_WARNINGS: List[str] = []
+
+class CatalogError(ValueError):
+    pass
+
+class Book:
+    """
+    Záznam katalogu: sloty místo dict a oddíl/žánr jako malé číslo do tabulek Book.SECTIONS /
+    Book.GENRES, takže dlouhý název oddílu je v paměti jednou pro celý katalog. Slot bid nese id
+    (make_id), aby ho nebylo nutné dohledávat. Pro stávající kód se chová jako dict jen pro čtení:
+    book['section'], get(), keys(), items(), in a == porovnává obsah jako u dict.
+    """
+    __slots__ = ("author", "title", "genre_code", "section_code", "bid")
+    GENRES: List[str] = []
+    SECTIONS: List[str] = []
+    _genre_codes: Dict[str, int] = {}
+    _section_codes: Dict[str, int] = {}
+
+    def __init__(self, author: str, title: str, genre: str, section: str):
+        self.author = sys.intern(author)     # autor má obvykle víc děl
+        self.title = title
+        self.genre_code = self._code(Book.GENRES, Book._genre_codes, genre)
+        self.section_code = self._code(Book.SECTIONS, Book._section_codes, section)
+        self.bid = None
+
+    @staticmethod
+    def _code(names: List[str], codes: Dict[str, int], name: str) -> int:
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(sys.intern(name))
+        return code
+
+    @classmethod
+    def of(cls, item) -> "Book":
+        return item if isinstance(item, Book) else cls(*(str(item[k]) for k in BOOK_FIELDS))
+
+    @property
+    def genre(self) -> str:
+        return Book.GENRES[self.genre_code]
+
+    @property
+    def section(self) -> str:
+        return Book.SECTIONS[self.section_code]
+
+    def __getitem__(self, key: str) -> str:
+        if key in BOOK_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in BOOK_FIELDS else default
+
+    def keys(self):
+        return BOOK_FIELDS
+
+    def values(self):
+        return [getattr(self, k) for k in BOOK_FIELDS]
+
+    def items(self):
+        return [(k, getattr(self, k)) for k in BOOK_FIELDS]
+
+    def __iter__(self):
+        return iter(BOOK_FIELDS)
+
+    def __len__(self):
+        return len(BOOK_FIELDS)
+
+    def __contains__(self, key) -> bool:
+        return key in BOOK_FIELDS
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Book):
+            return (self.author == other.author and self.title == other.title
+                    and self.genre_code == other.genre_code and self.section_code == other.section_code)
+        if isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+
+    __hash__ = None     # jako dict
+
+    def __repr__(self):
+        return f"Book({dict(self.items())!r})"
+
+def make_id(item: Dict):
+    key = f"{item['author']}|{item['title']}"
+    return quote(key, safe='')
+
+def _iter_json_array(f, chunk: int = 1 << 16):
+    """Postupně vrací prvky JSON pole (nebo pole "books" v objektu) bez načtení celého dokumentu."""
+    dec = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = f.read(chunk)
+        eof = not data
+        buf, pos = buf[pos:] + data, 0
+
+    def skip(chars=" \t\r\n"):
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    def value():
+        # celá hodnota od pos; může pokračovat v dalším bloku (např. číslo nebo dlouhý řetězec)
+        nonlocal pos
+        while True:
+            try:
+                obj, end = dec.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise CatalogError(f"neplatný JSON u znaku {pos}")
+                fill()
+                continue
+            if end == len(buf) and not eof:
+                fill()
+                continue
+            pos = end
+            return obj
+
+    def expect(ch: str, error: str):
+        nonlocal pos
+        skip()
+        if buf[pos:pos + 1] != ch:
+            raise CatalogError(error)
+        pos += 1
+
+    fill()
+    skip(" \t\r\n\ufeff")
+    if buf[pos:pos + 1] == "{":
+        # {"books": [...]} – klíče nejvyšší úrovně po jednom; hodnoty ostatních se přečtou celé
+        # a zahodí, takže klíče před "books" musí být malé
+        pos += 1
+        while True:
+            skip()
+            if buf[pos:pos + 1] != '"':
+                raise CatalogError('chybí pole "books"')
+            key = value()
+            expect(":", f"očekávána dvojtečka u znaku {pos}")
+            skip()
+            if key == "books":
+                break
+            value()
+            expect(",", 'chybí pole "books"')
+    if buf[pos:pos + 1] != "[":
+        raise CatalogError("očekáváno JSON pole")
+    pos += 1
+    skip()
+    if buf[pos:pos + 1] == "]":
+        return
+    while True:
+        yield value()
+        skip()
+        if pos >= len(buf):
+            raise CatalogError("neukončené JSON pole")
+        if buf[pos] == "]":
+            return
+        expect(",", f"očekávána čárka u znaku {pos}")
+        skip()
+
+def _iter_records(path: pathlib.Path):
+    """(číslo záznamu, dict) ze CSV, JSON Lines nebo JSON pole – vždy proudově."""
+    suffix = path.suffix.lower()
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if suffix == ".csv":
+            sample = f.read(4096)
+            f.seek(0)
+            delim = ";" if sample.count(";") > sample.count(",") else ","
+            yield from enumerate(csv.DictReader(f, delimiter=delim), start=2)
+        elif suffix == ".jsonl":
+            for n, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield n, json.loads(line)
+                    except ValueError:
+                        yield n, None
+        else:
+            yield from enumerate(_iter_json_array(f), start=1)
+
+def validate_rules(rules) -> Dict:
+    if not isinstance(rules, dict):
+        raise CatalogError("pravidla musí být JSON objekt")
+    try:
+        out = {
+            "total": int(rules["total"]),
+            "section_counts": {str(k): int(v) for k, v in rules["section_counts"].items()},
+            "genres": [str(g).capitalize() for g in rules["genres"]],
+            "genre_min_each": int(rules["genre_min_each"]),
+            "max_per_author": int(rules["max_per_author"]),
+        }
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise CatalogError(f"neplatná pravidla: {e!r}")
+    if out["total"] <= 0 or out["max_per_author"] <= 0 or min(out["section_counts"].values(), default=0) < 0:
+        raise CatalogError("počty v pravidlech musí být kladné")
+    if sum(out["section_counts"].values()) > out["total"] or out["genre_min_each"] * len(out["genres"]) > out["total"]:
+        raise CatalogError("požadavky na oddíly/žánry přesahují celkový počet")
+    return out
+
+def load_books(path: pathlib.Path, rules: Dict) -> List[Book]:
+    """
+    Načte knihy ze souboru; duplicity podle make_id přeskočí (platí první výskyt),
+    neplatné záznamy přeskočí a zapíše do CATALOG_WARNINGS.
+    """
+    books: List[Dict] = []
+    seen = set()
+    sections = rules["section_counts"]
+    genres = {g: g for g in rules["genres"]}
+    for n, rec in _iter_records(path):
+        if not isinstance(rec, dict):
+            CATALOG_WARNINGS.append(f"{path.name}:{n}: záznam není objekt")
+            continue
+        book = {k: str(rec.get(k) or "").strip() for k in BOOK_FIELDS}
+        missing = [k for k in BOOK_FIELDS if not book[k]]
+        if missing:
+            CATALOG_WARNINGS.append(f"{path.name}:{n}: chybí {', '.join(missing)}")
+            continue
+        genre = genres.get(book["genre"].capitalize())
+        if genre is None:
+            CATALOG_WARNINGS.append(f"{path.name}:{n}: neznámý žánr {book['genre']!r}")
+            continue
+        if book["section"] not in sections:
+            CATALOG_WARNINGS.append(f"{path.name}:{n}: neznámý oddíl {book['section']!r}")
+            continue
+        bid = make_id(book)
+        if bid in seen:
+            continue
+        seen.add(bid)
+        books.append(Book(book["author"], book["title"], genre, book["section"]))
+    return books
+
+def _find_catalog_file(stem: str) -> Optional[pathlib.Path]:
+    for d in CATALOG_DIRS:
+        for suffix in CATALOG_SUFFIXES:
+            p = d / f"{stem}{suffix}"
+            if p.is_file():
+                return p
+    return None
+
+def load_catalog(books: List[Dict], original: List[Dict], rules: Dict) -> Tuple[List[Book], List[Book], Dict]:
+    """Nahradí vestavěné BOOKS / ORIGINAL_20 / RULES tím, co je v katalogových souborech (první nalezený soubor)."""
+    p = _find_catalog_file("rules")
+    if p is not None:
+        try:
+            with open(p, "r", encoding="utf-8-sig") as f:
+                rules = validate_rules(json.load(f))
+        except (OSError, ValueError) as e:
+            CATALOG_WARNINGS.append(f"{p.name}: {e}")
+    for stem in ("books", "original"):
+        p = _find_catalog_file(stem)
+        if p is None:
+            continue
+        try:
+            loaded = load_books(p, rules)
+        except (OSError, ValueError, csv.Error) as e:
+            CATALOG_WARNINGS.append(f"{p.name}: {e}")
+            continue
+        if not loaded:
+            CATALOG_WARNINGS.append(f"{p.name}: žádné platné záznamy")
+        elif stem == "books":
+            books = loaded
+        else:
+            original = loaded
+    # vestavěné literály (dict) na Book, ať má celý katalog stejný tvar
+    return [Book.of(b) for b in books], [Book.of(b) for b in original], rules
+
+BOOKS, ORIGINAL_20, RULES = load_catalog(BOOKS, ORIGINAL_20, RULES)
+
+class RuleTally:
+    """
+    Průběžné počty výběru podle oddílu, žánru a autora pro kontrolu RULES.
+    add/remove mění čítače o ±1, takže kontrola po jednom zaškrtnutí nezávisí na velikosti katalogu.
+    """
+    def __init__(self, rules: Dict = RULES):
+        self.rules = rules
+        self.total = 0
+        self.sections: Dict[str, int] = {sec: 0 for sec in rules['section_counts']}
+        self.genres: Dict[str, int] = {g: 0 for g in rules['genres']}
+        self.authors: Dict[str, int] = {}
+        self.over_authors: Dict[str, int] = {}   # jen autoři nad max_per_author
+        self.sections_short = sum(1 for need in rules['section_counts'].values() if need > 0)
+        self.genres_short = len(self.genres) if rules['genre_min_each'] > 0 else 0
+
+    def _bump(self, book: Dict, d: int):
+        self.total += d
+        if type(book) is Book:
+            # přímo sloty a tabulka oddílů, bez dict rozhraní Book
+            sec, g, a = Book.SECTIONS[book.section_code], Book.GENRES[book.genre_code].capitalize(), book.author
+        else:
+            sec, g, a = book['section'], book['genre'].capitalize(), book['author']
+        need = self.rules['section_counts'].get(sec)
+        have = self.sections.get(sec, 0)
+        self.sections[sec] = have + d
+        if need is not None and (have < need) != (have + d < need):
+            self.sections_short += -1 if d > 0 else 1
+        have = self.genres.get(g, 0)
+        self.genres[g] = have + d
+        need = self.rules['genre_min_each']
+        if g in self.rules['genres'] and (have < need) != (have + d < need):
+            self.genres_short += -1 if d > 0 else 1
+        n = self.authors.get(a, 0) + d
+        if n:
+            self.authors[a] = n
+        else:
+            self.authors.pop(a, None)
+        if n > self.rules['max_per_author']:
+            self.over_authors[a] = n
+        else:
+            self.over_authors.pop(a, None)
+
+    def add(self, book: Dict):
+        self._bump(book, 1)
+
+    def remove(self, book: Dict):
+        self._bump(book, -1)
+
+    def total_ok(self) -> bool:
+        return self.total == self.rules['total']
+
+    def sections_ok(self) -> bool:
+        return self.sections_short == 0
+
+    def genres_ok(self) -> bool:
+        return self.genres_short == 0
+
+    def authors_ok(self) -> bool:
+        return not self.over_authors
+
+    def is_valid(self) -> bool:
+        return self.total_ok() and self.sections_ok() and self.genres_ok() and self.authors_ok()
+
+    def report(self) -> List[Tuple[str, bool, str]]:
+        """Řádky kontroly pravidel (klíč, splněno, text) – stejné pro DIY tab i příkazovou řádku."""
+        rules = self.rules
+        lines = [("total", self.total_ok(), f"Celkem vybráno: {self.total} / {rules['total']}")]
+        for sec, needed in rules['section_counts'].items():
+            have = self.sections.get(sec, 0)
+            lines.append((sec, have >= needed, f"{sec}: {have} (min {needed})"))
+        counts = ", ".join(f"{g} {self.genres.get(g, 0)}" for g in rules['genres'])
+        lines.append(("genre", self.genres_ok(), f"Žánry: {counts} (min {rules['genre_min_each']} každá)"))
+        if self.authors_ok():
+            lines.append(("author", True, f"Autoři: max {rules['max_per_author']} od jednoho autora (OK)"))
+        else:
+            bad_authors = [f"{a} ({c})" for a, c in self.over_authors.items()]
+            lines.append(("author", False, "Překročení max. děl od autora: " + ", ".join(bad_authors)))
+        return lines
+
+# ---------- persistence helpers (upraveno) ----------
+class BookRegistry:
+    """
+    Index katalogu postavený jednou při startu: id -> kniha; id knihy nese její slot bid.
+    make_id (quote) se tak volá jen jednou na knihu a id jsou internovaná.
+    """
+    def __init__(self, books: List[Book]):
+        self.books = [Book.of(b) for b in books]
+        self.by_id: Dict[str, Book] = {}
+        for b in self.books:
+            if b.bid is None:
+                b.bid = sys.intern(make_id(b))
+            # stejné dílo v BOOKS i ORIGINAL_20 -> platí první výskyt (BOOKS)
+            self.by_id.setdefault(b.bid, b)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, bid: str) -> bool:
+        return bid in self.by_id
+
+    def ids(self):
+        return self.by_id.keys()
+
+    def get(self, bid: str) -> Optional[Book]:
+        return self.by_id.get(bid)
+
+    def id_of(self, book) -> str:
+        bid = getattr(book, "bid", None)
+        # kniha mimo katalog (např. ručně sestavený dict) -> spočítej id postaru
+        return bid if bid is not None else make_id(book)
+
+    def resolve(self, items) -> List[Book]:
+        """Převede seznam knih nebo id na knihy; neznámá id přeskočí."""
+        out = []
+        for el in items:
+            if isinstance(el, (Book, dict)):
+                out.append(el)
+            else:
+                b = self.by_id.get(el)
+                if b is not None:
+                    out.append(b)
+        return out
+
+CATALOG = BookRegistry(BOOKS + ORIGINAL_20)
+
+# ---------- doplňování výběru podle RULES ----------
+class _SolverProblem:
+    """Zbývající úloha: kolik míst, jaké deficity oddílů/žánrů a z čeho se dá vybírat."""
+    def __init__(self, slots: int, deficits: Tuple[int, ...], steps: list):
+        self.slots = slots
+        self.deficits = deficits
+        # kroky = skupiny knih, ze kterých se bere nezávisle; viz RuleSolver._setup
+        self.steps = steps
+        self.capacity = sum(step.cap for step in steps)
+
+class _SolverStep:
+    """
+    Skupina knih, ze které se bere nezávisle na ostatních krocích: bazén volných knih jedné
+    třídy (oddíl, žánr), nebo autoři nad limitem se stejným složením knih podle tříd –
+    ti se slučují do jednoho kroku, takže kroků je tolik, kolik je různých složení, ne autorů.
+    """
+    def __init__(self, member_cap: int, members: List[Dict[Tuple[int, int], List[Dict]]], ns: int):
+        self.member_cap = member_cap
+        self.members = members
+        self.keys = sorted({cls for m in members for cls in m})
+        self.cap = sum(min(member_cap, sum(len(bs) for bs in m.values())) for m in members)
+        self._ns = ns
+
+    def _member_vectors(self, member, limit: int, bounds: List[int]) -> list:
+        """Odběry z jednoho člena: (vektor k po třídách self.keys, počet způsobů)."""
+        sizes = [min(len(member.get(cls, ())), b) for cls, b in zip(self.keys, bounds)]
+        out = []
+
+        def rec(i, left, acc, ways):
+            if i == len(self.keys):
+                out.append((tuple(acc), ways))
+                return
+            n = len(member.get(self.keys[i], ()))
+            for k in range(min(sizes[i], left) + 1):
+                acc.append(k)
+                rec(i + 1, left - k, acc, ways * comb(n, k))
+                acc.pop()
+        rec(0, min(self.member_cap, limit), [], 1)
+        return out
+
+    def options(self, limit: int, useful: Optional[Tuple[int, ...]] = None) -> list:
+        """
+        Možné odběry z kroku: (velikost, počet způsobů, efekty na deficity, vektor k po třídách).
+        useful omezí k u každé třídy na to, co ještě může snížit nějaký deficit (pro min. pokrytí).
+        """
+        ns = self._ns
+        if useful is None:
+            bounds = [limit] * len(self.keys)
+        else:
+            bounds = [max(useful[si] if si >= 0 else 0, useful[ns + gi] if gi >= 0 else 0) for si, gi in self.keys]
+        vectors_of = {}
+        dist = {(0,) * len(self.keys): 1}
+        for member in self.members:
+            sig = id(member) if len(self.members) == 1 else tuple(len(member.get(c, ())) for c in self.keys)
+            mv = vectors_of.get(sig)
+            if mv is None:
+                mv = vectors_of[sig] = self._member_vectors(member, limit, bounds)
+            nxt: Dict[Tuple[int, ...], int] = {}
+            for vec, w in dist.items():
+                used = sum(vec)
+                for mvec, mw in mv:
+                    if used + sum(mvec) > limit:
+                        continue
+                    v = tuple(a + b for a, b in zip(vec, mvec))
+                    if any(k > b for k, b in zip(v, bounds)):
+                        continue
+                    nxt[v] = nxt.get(v, 0) + w * mw
+            dist = nxt
+        out = []
+        for v, ways in dist.items():
+            size = sum(v)
+            if size:
+                effects = [(si, ns + gi if gi >= 0 else -1, k) for (si, gi), k in zip(self.keys, v) if k]
+                out.append((size, ways, effects, v))
+        return out
+
+    def split(self, vector):
+        """Všechna rozložení vektoru počtů mezi členy kroku -> seznamy (člen, vektor člena)."""
+        n = len(self.members)
+        # suffix[i][j] = kolik knih třídy j mají členové i.. (ořezání slepých větví)
+        suffix = [[0] * len(self.keys) for _ in range(n + 1)]
+        for i in range(n - 1, -1, -1):
+            for j, cls in enumerate(self.keys):
+                suffix[i][j] = suffix[i + 1][j] + min(self.member_cap, len(self.members[i].get(cls, ())))
+        full = [self.member_cap] * len(self.keys)
+
+        def rec(i, rest):
+            if not any(rest):
+                yield []
+                return
+            if i == n or sum(rest) > (n - i) * self.member_cap or any(r > s for r, s in zip(rest, suffix[i])):
+                return
+            for mvec, _ in self._member_vectors(self.members[i], sum(rest), full):
+                if any(a > b for a, b in zip(mvec, rest)):
+                    continue
+                for tail in rec(i + 1, tuple(b - a for a, b in zip(mvec, rest))):
+                    yield ([(self.members[i], mvec)] if any(mvec) else []) + tail
+        yield from rec(0, tuple(vector))
+
+    def books_for(self, vector) -> List[Dict]:
+        """Jedna konkrétní volba knih pro vektor počtů."""
+        out = []
+        for member, mvec in next(self.split(vector)):
+            for cls, k in zip(self.keys, mvec):
+                out.extend(member.get(cls, [])[:k])
+        return out
+
+    def iter_books(self, vector):
+        """Všechny konkrétní volby knih pro vektor počtů."""
+        for parts in self.split(vector):
+            choices = [list(combinations(member[cls], k)) for member, mvec in parts
+                       for cls, k in zip(self.keys, mvec) if k]
+            for combo in product(*choices):
+                yield tuple(b for part in combo for b in part)
+
+def _apply(state: Tuple[int, ...], effects, offset: int = 0) -> Tuple[int, ...]:
+    s = list(state)
+    for si, gi, k in effects:
+        if si >= 0:
+            s[offset + si] = max(0, s[offset + si] - k)
+        if gi >= 0:
+            s[offset + gi] = max(0, s[offset + gi] - k)
+    return tuple(s)
+
+class RuleSolver:
+    """
+    Doplní rozpracovaný výběr na seznam splňující RULES (total, section_counts,
+    genre_min_each, max_per_author), umí ověřit proveditelnost a spočítat/vyjmenovat doplnění.
+
+    Knihy autorů, kteří se do limitu vejdou celí, se slučují do bazénů podle třídy
+    (oddíl, žánr); samostatný krok dostanou jen autoři s více knihami než zbývá limitu.
+    Nad kroky běží omezené DP, jehož stav jsou jen (volná místa, deficity pravidel) –
+    jeho velikost tedy závisí na RULES, ne na velikosti katalogu. Proveditelnost
+    nejdřív zkusí hladové pokrytí a DP pouští jen v těsných případech.
+    """
+    def __init__(self, books: List[Dict], rules: Dict = RULES):
+        self.books = list(books)
+        self.rules = rules
+        self._sec_index = {sec: i for i, sec in enumerate(rules['section_counts'])}
+        self._genre_index = {g: i for i, g in enumerate(rules['genres'])}
+        self._ns = len(self._sec_index)
+        self._author_ids: Dict[str, List[str]] = {}
+        for b in self.books:
+            self._author_ids.setdefault(b['author'], []).append(CATALOG.id_of(b))
+
+    def _class_of(self, b: Dict) -> Tuple[int, int]:
+        return (self._sec_index.get(b['section'], -1), self._genre_index.get(b['genre'].capitalize(), -1))
+
+    @staticmethod
+    def _ids(items) -> set:
+        return {el if isinstance(el, str) else CATALOG.id_of(el) for el in items or ()}
+
+    def _setup(self, selected: List[Dict], excluded=()) -> Optional[_SolverProblem]:
+        rules = self.rules
+        tally = RuleTally(rules)
+        for b in selected:
+            tally.add(b)
+        if tally.total > rules['total'] or not tally.authors_ok():
+            return None
+        slots = rules['total'] - tally.total
+        deficits = tuple(max(0, need - tally.sections.get(sec, 0)) for sec, need in rules['section_counts'].items())
+        deficits += tuple(max(0, rules['genre_min_each'] - tally.genres.get(g, 0)) for g in rules['genres'])
+        skip = self._ids(selected) | self._ids(excluded)
+        by_author: Dict[str, List[Dict]] = {}
+        for b in self.books:
+            bid = CATALOG.id_of(b)
+            if bid in skip:
+                continue
+            skip.add(bid)      # duplicitní záznam téhož díla
+            by_author.setdefault(b['author'], []).append(b)
+        pools: Dict[Tuple[int, int], List[Dict]] = {}
+        groups: Dict[tuple, List[Dict[Tuple[int, int], List[Dict]]]] = {}
+        for author, bs in by_author.items():
+            cap = rules['max_per_author'] - tally.authors.get(author, 0)
+            if cap <= 0:
+                continue
+            if len(bs) <= cap:
+                for b in bs:
+                    pools.setdefault(self._class_of(b), []).append(b)
+            else:
+                classes: Dict[Tuple[int, int], List[Dict]] = {}
+                for b in bs:
+                    classes.setdefault(self._class_of(b), []).append(b)
+                sig = (cap, tuple(sorted((cls, len(v)) for cls, v in classes.items())))
+                groups.setdefault(sig, []).append(classes)
+        steps = [_SolverStep(sig[0], members, self._ns) for sig, members in groups.items()]
+        steps += [_SolverStep(len(bs), [{cls: bs}], self._ns) for cls, bs in pools.items()]
+        return _SolverProblem(slots, deficits, steps)
+
+    def _lower_bound(self, deficits: Tuple[int, ...]) -> int:
+        # každá kniha sníží nejvýš jeden deficit oddílu a jeden deficit žánru
+        return max(sum(deficits[:self._ns]), sum(deficits[self._ns:]))
+
+    def _greedy_cover(self, p: _SolverProblem) -> Optional[List[Dict]]:
+        """
+        Rychlé pokrytí deficitů hladovým výběrem (přednost mají knihy, které sníží deficit
+        oddílu i žánru zároveň, a z nich ty vzácnější). Nemusí být nejmenší – slouží
+        jako postačující podmínka; když se nevejde do p.slots, rozhodne _min_cover.
+        """
+        ns = self._ns
+        d = list(p.deficits)
+        # zdroje: (krok, člen, třída) -> zbývající knihy; used hlídá limit člena (autora)
+        left: Dict[Tuple[int, int, Tuple[int, int]], int] = {}
+        scarcity: Dict[Tuple[int, int], int] = {}
+        for i, step in enumerate(p.steps):
+            for j, member in enumerate(step.members):
+                for cls, bs in member.items():
+                    left[(i, j, cls)] = len(bs)
+                    scarcity[cls] = scarcity.get(cls, 0) + len(bs)
+        used: Dict[Tuple[int, int], int] = {}
+        picked = []
+        while any(d):
+            if len(picked) >= p.slots:
+                return None
+            best, best_score = None, None
+            for key, n in left.items():
+                i, j, cls = key
+                if not n or used.get((i, j), 0) >= p.steps[i].member_cap:
+                    continue
+                si, gi = cls
+                gain = (si >= 0 and d[si] > 0) + (gi >= 0 and d[ns + gi] > 0)
+                if not gain:
+                    continue
+                score = (gain, -scarcity[cls])
+                if best_score is None or score > best_score:
+                    best, best_score = key, score
+            if best is None:
+                return None
+            i, j, (si, gi) = best
+            if si >= 0 and d[si] > 0:
+                d[si] -= 1
+            if gi >= 0 and d[ns + gi] > 0:
+                d[ns + gi] -= 1
+            bs = p.steps[i].members[j][(si, gi)]
+            picked.append(bs[len(bs) - left[best]])
+            left[best] -= 1
+            used[(i, j)] = used.get((i, j), 0) + 1
+        return picked
+
+    def _min_cover(self, p: _SolverProblem, stop_early: bool = True):
+        """
+        Nejmenší množina knih pokrývající všechny deficity (DP přes kroky, stav = deficity).
+        Vrací seznam vrstev se zpětnými ukazateli, nebo None, když se pokrytí do p.slots nevejde.
+        """
+        zero = (0,) * len(p.deficits)
+        layers = [{p.deficits: (0, None, None)}]
+        if p.deficits == zero:
+            return layers
+        if self._lower_bound(p.deficits) > p.slots:
+            return None
+        for step in p.steps:
+            cur = layers[-1]
+            nxt = {s: (v[0], s, None) for s, v in cur.items()}
+            options = step.options(p.slots, p.deficits)
+            for s, (cost, _, _) in cur.items():
+                for size, _, effects, vector in options:
+                    t = _apply(s, effects)
+                    if t == s:
+                        continue
+                    c = cost + size
+                    if c + self._lower_bound(t) > p.slots:
+                        continue
+                    old = nxt.get(t)
+                    if old is None or c < old[0]:
+                        nxt[t] = (c, s, (step, vector))
+            layers.append(nxt)
+            if stop_early and zero in nxt:
+                return layers
+        return layers if zero in layers[-1] else None
+
+    def _feasible(self, p: Optional[_SolverProblem]) -> bool:
+        if p is None or p.capacity < p.slots:
+            return False
+        if self._lower_bound(p.deficits) > p.slots:
+            return False
+        if self._greedy_cover(p) is not None:
+            return True
+        return self._min_cover(p) is not None
+
+    def _cover_books(self, p: _SolverProblem) -> Optional[List[Dict]]:
+        """Konkrétní knihy pokrývající deficity: hladově, a když to nestačí, nejmenší pokrytí z DP."""
+        cover = self._greedy_cover(p)
+        if cover is not None:
+            return cover
+        layers = self._min_cover(p)
+        if layers is None:
+            return None
+        # zpětně po ukazatelích poskládej nejmenší pokrytí deficitů
+        cover = []
+        state = (0,) * len(p.deficits)
+        for layer in reversed(layers[1:]):
+            _, prev, move = layer[state]
+            if move is not None:
+                step, vector = move
+                cover.extend(step.books_for(vector))
+            state = prev
+        return cover
+
+    def blocked_additions(self, selected: List[Dict], excluded=()) -> Dict[str, str]:
+        """
+        Pro každou nevybranou knihu, jejímž přidáním by výběr přestal jít doplnit, vrátí důvod.
+        Většinu kandidátů rozhodne jedno pokrytí deficitů: kniha, která v něm je, nebo
+        vedle něj ještě zbývá místo (a limit autora), je v pořádku. Plné ověření se dělá
+        jen pro zbytek a jednou na každou třídu (oddíl, žánr), resp. autora nad limitem.
+        """
+        rules = self.rules
+        sel_ids = self._ids(selected)
+        candidates = [b for b in self.books if CATALOG.id_of(b) not in sel_ids]
+        p = self._setup(selected, excluded)
+        if p is None:
+            return {CATALOG.id_of(b): "výběr už pravidla porušuje" for b in candidates}
+        if p.slots <= 0:
+            return {CATALOG.id_of(b): "seznam je už plný" for b in candidates}
+        cover = self._cover_books(p) if self._feasible(p) else None
+        if cover is None:
+            # přidáním knihy se z neřešitelného výběru řešitelný stát nemůže
+            return {CATALOG.id_of(b): "výběr už nejde doplnit" for b in candidates}
+        tally = RuleTally(rules)
+        for b in selected:
+            tally.add(b)
+        cover_ids = self._ids(cover)
+        usage: Dict[str, int] = {}
+        for b in cover:
+            usage[b['author']] = usage.get(b['author'], 0) + 1
+        excluded_ids = self._ids(excluded)
+        ns = self._ns
+        memo: Dict[tuple, bool] = {}
+        blocked = {}
+        for b in candidates:
+            bid = CATALOG.id_of(b)
+            author = b['author']
+            cap = rules['max_per_author'] - tally.authors.get(author, 0)
+            if cap <= 0:
+                blocked[bid] = "autor už má nejvyšší povolený počet děl"
+                continue
+            if bid in excluded_ids or bid in cover_ids:
+                continue
+            if len(cover) <= p.slots - 1 and usage.get(author, 0) <= cap - 1:
+                continue
+            si, gi = self._class_of(b)
+            d = list(p.deficits)
+            if si >= 0:
+                d[si] = max(0, d[si] - 1)
+            if gi >= 0:
+                d[ns + gi] = max(0, d[ns + gi] - 1)
+            if self._lower_bound(tuple(d)) > p.slots - 1:
+                blocked[bid] = "nezbylo by místo pro povinné oddíly a žánry"
+                continue
+            # volní autoři téže třídy jsou zaměnitelní, autor z pokrytí nebo nad limitem ne
+            key = ((si, gi), author if usage.get(author) or cap < self._author_books(author, sel_ids) else None)
+            if key not in memo:
+                memo[key] = self.is_feasible(list(selected) + [b], excluded)
+            if not memo[key]:
+                blocked[bid] = "nezbylo by místo pro povinné oddíly a žánry"
+        return blocked
+
+    def _author_books(self, author: str, skip_ids: set) -> int:
+        return sum(1 for bid in self._author_ids.get(author, ()) if bid not in skip_ids)
+
+    def is_feasible(self, selected: List[Dict], excluded=()) -> bool:
+        """Dá se výběr ještě doplnit na platný seznam?"""
+        return self._feasible(self._setup(selected, excluded))
+
+    def complete(self, selected: List[Dict], preferred=(), excluded=()) -> Optional[List[Dict]]:
+        """
+        Vrátí selected doplněný na platný seznam (nebo None, pokud to nejde).
+        Preferované knihy se berou přednostně, pokud nezpůsobí neřešitelnost.
+        """
+        chosen = list(selected)
+        if not self.is_feasible(chosen, excluded):
+            return None
+        taken = self._ids(chosen)
+        excluded_ids = self._ids(excluded)
+        for b in CATALOG.resolve(preferred):
+            bid = CATALOG.id_of(b)
+            if bid in taken or bid in excluded_ids or len(chosen) >= self.rules['total']:
+                continue
+            if self.is_feasible(chosen + [b], excluded):
+                chosen.append(b)
+                taken.add(bid)
+        chosen.extend(self._cover_books(self._setup(chosen, excluded)))
+        # zbytek míst doplň čímkoli, co nepřekročí limit autora
+        tally = RuleTally(self.rules)
+        for b in chosen:
+            tally.add(b)
+        taken = self._ids(chosen)
+        for b in self.books:
+            if tally.total >= self.rules['total']:
+                break
+            bid = CATALOG.id_of(b)
+            if bid in taken or bid in excluded_ids:
+                continue
+            if tally.authors.get(b['author'], 0) >= self.rules['max_per_author']:
+                continue
+            chosen.append(b)
+            taken.add(bid)
+            tally.add(b)
+        return chosen if tally.is_valid() else None
+
+    def _walk(self, options: list, layer: Dict[tuple, int], after_cap: int) -> Dict[tuple, int]:
+        """Jeden krok dopředného DP nad stavy (volná místa, deficity) s ořezáním nedosažitelného."""
+        nxt: Dict[tuple, int] = {}
+        for s, w in layer.items():
+            if s[0] <= after_cap:
+                nxt[s] = nxt.get(s, 0) + w
+            for size, mult, effects, _ in options:
+                if size > s[0]:
+                    continue
+                t = _apply(s, effects, 1)
+                t = (s[0] - size,) + t[1:]
+                if t[0] > after_cap or t[0] < self._lower_bound(t[1:]):
+                    continue
+                nxt[t] = nxt.get(t, 0) + w * mult
+        return nxt
+
+    @staticmethod
+    def _prepare_counting(p: _SolverProblem):
+        """Možnosti všech kroků a kapacita zbývajících kroků (kolik knih ještě lze přidat)."""
+        suffix_cap = [0] * (len(p.steps) + 1)
+        for i in range(len(p.steps) - 1, -1, -1):
+            suffix_cap[i] = suffix_cap[i + 1] + p.steps[i].cap
+        return [step.options(p.slots) for step in p.steps], suffix_cap
+
+    @staticmethod
+    def _expand(parts):
+        if not parts:
+            yield []
+            return
+        step, vector = parts[0]
+        for books in step.iter_books(vector):
+            for rest in RuleSolver._expand(parts[1:]):
+                yield list(books) + rest
+
+    def count(self, selected: List[Dict], excluded=()) -> int:
+        """Počet různých platných doplnění výběru."""
+        p = self._setup(selected, excluded)
+        if p is None or p.capacity < p.slots:
+            return 0
+        options, suffix_cap = self._prepare_counting(p)
+        start = (p.slots,) + p.deficits
+        layer = {start: 1}
+        for i in range(len(p.steps)):
+            layer = self._walk(options[i], layer, suffix_cap[i + 1])
+        return layer.get((0,) * len(start), 0)
+
+    def iter_completions(self, selected: List[Dict], excluded=(), limit: Optional[int] = None):
+        """Postupně vrací seznamy knih, které výběr doplní na platný seznam."""
+        p = self._setup(selected, excluded)
+        if p is None or p.capacity < p.slots:
+            return
+        options, suffix_cap = self._prepare_counting(p)
+        start = (p.slots,) + p.deficits
+        # dopředu dosažitelné stavy, zpětně jen ty, ze kterých vede cesta k cíli
+        layers = [{start: 1}]
+        for i in range(len(p.steps)):
+            layers.append(self._walk(options[i], layers[-1], suffix_cap[i + 1]))
+        goal = (0,) * len(start)
+        alive = [set() for _ in layers]
+        if goal in layers[-1]:
+            alive[-1].add(goal)
+        for i in range(len(p.steps) - 1, -1, -1):
+            for s in layers[i]:
+                if s in alive[i + 1] or any(
+                        size <= s[0] and (s[0] - size,) + _apply(s, effects, 1)[1:] in alive[i + 1]
+                        for size, _, effects, _ in options[i]):
+                    alive[i].add(s)
+        if start not in alive[0]:
+            return
+        produced = 0
+        stack = [(0, start, [])]
+        while stack:
+            i, s, picked = stack.pop()
+            if i == len(p.steps):
+                for books in self._expand(picked):
+                    yield books
+                    produced += 1
+                    if limit is not None and produced >= limit:
+                        return
+                continue
+            step = p.steps[i]
+            moves = []
+            if s in alive[i + 1]:
+                moves.append((s, None))
+            for size, _, effects, vector in options[i]:
+                if size > s[0]:
+                    continue
+                t = (s[0] - size,) + _apply(s, effects, 1)[1:]
+                if t in alive[i + 1]:
+                    moves.append((t, vector))
+            for t, vector in reversed(moves):
+                if vector is None:
+                    stack.append((i + 1, t, picked))
+                else:
+                    stack.append((i + 1, t, picked + [(step, vector)]))
+
+# ---------- hledání v poznámkách ----------
+# znak -> znak bez diakritiky (á -> a, ř -> r, ů -> u …); délka textu se nemění, takže pozice
+# nalezené ve složeném textu platí i v původním
+_FOLD = {}
+for _cp in range(0xC0, 0x250):
+    _base = unicodedata.normalize("NFKD", chr(_cp))[0]
+    if _base != chr(_cp) and _base.isalpha():
+        _FOLD[_cp] = _base
+del _cp, _base
+_WORD_RE = re.compile(r"\w+")
+
+def fold_text(text: str) -> str:
+    folded = text.translate(_FOLD).lower()
+    # lower() výjimečně mění délku (např. "İ") – pak se vrátí po znacích, aby pozice seděly
+    if len(folded) != len(text):
+        folded = "".join(ch.translate(_FOLD).lower()[:1] or ch for ch in text)
+    return folded
+
+_folded_words: Dict[str, str] = {}
+
+# české řazení: č, ř, š, ž jsou samostatná písmena, "ch" je za "h"; čárky/kroužky/ě rozlišují
+# až při shodě základních písmen (á za a, ale před b)
+_CZ_PRIMARY = ["a", "b", "c", "č", "d", "e", "f", "g", "h", "ch", "i", "j", "k", "l", "m", "n", "o",
+               "p", "q", "r", "ř", "s", "š", "t", "u", "v", "w", "x", "y", "z", "ž"]
+_CZ_RANK = {ch: chr(0x100 + i) for i, ch in enumerate(_CZ_PRIMARY)}
+_CZ_SECONDARY = {"á": "1", "ď": "1", "é": "1", "ě": "2", "í": "1", "ň": "1", "ó": "1",
+                 "ť": "1", "ú": "1", "ů": "2", "ý": "1"}
+_collation_keys: Dict[str, str] = {}
+
+def czech_key(text: str) -> str:
+    """Klíč pro české řazení jako řetězec (porovnává se v C); výsledky se pamatují podle textu."""
+    key = _collation_keys.get(text)
+    if key is not None:
+        return key
+    low = text.lower()
+    primary, secondary = [], []
+    i, n = 0, len(low)
+    while i < n:
+        ch = low[i]
+        if ch == "c" and i + 1 < n and low[i + 1] == "h":
+            primary.append(_CZ_RANK["ch"])
+            secondary.append("0")
+            i += 2
+            continue
+        i += 1
+        rank = _CZ_RANK.get(ch)
+        if rank is not None:
+            primary.append(rank)
+            secondary.append("0")
+        elif ch in _CZ_SECONDARY:
+            primary.append(_CZ_RANK[ch.translate(_FOLD)])
+            secondary.append(_CZ_SECONDARY[ch])
+        elif ch.isdigit():
+            primary.append(chr(0x30 + int(ch)) if ch.isascii() else ch)
+            secondary.append("0")
+        elif ch.isspace():
+            primary.append("\x01")
+            secondary.append("0")
+        elif ch.isalpha():
+            base = ch.translate(_FOLD)
+            if base in _CZ_RANK:
+                primary.append(_CZ_RANK[base])
+                secondary.append("3")
+            else:
+                primary.append(chr(0x1000 + ord(ch)))
+                secondary.append("0")
+        # interpunkce se při řazení ignoruje ("R.U.R." ~ "RUR")
+    key = "".join(primary) + "\x00" + "".join(secondary) + "\x00" + text
+    if len(_collation_keys) > 200_000:
+        _collation_keys.clear()
+    _collation_keys[text] = key
+    return key
+
+def note_terms(text: str) -> Counter:
+    # skládá se až každé různé slovo zvlášť (s cache) – většina slov se v poznámkách opakuje
+    terms = Counter()
+    for word, n in Counter(_WORD_RE.findall(text.lower())).items():
+        folded = _folded_words.get(word)
+        if folded is None:
+            if len(_folded_words) > 200_000:
+                _folded_words.clear()
+            folded = _folded_words[word] = word.translate(_FOLD)
+        terms[folded] += n
+    return terms
+
+class NotesIndex:
+    """
+    Invertovaný index poznámek: složený tvar slova -> {id dokumentu: počet výskytů}.
+    Dokumentem je poznámka (klíč = id díla) nebo text přílohy (klíč = hash obsahu).
+    Slovník je seřazený, takže prefixové hledání je bisect + průchod souvislým úsekem.
+    update() přepočítá jen jednu poznámku a do indexu promítne rozdíl proti jejímu minulému stavu.
+    """
+    MIN_PREFIX = 2    # kratší slova dotazu se hledají jen přesně, jinak by prošla půlku slovníku
+
+    def __init__(self, entries: Optional[Dict[str, dict]] = None):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.vocab: List[str] = []
+        self._terms_of: Dict[str, Counter] = {}
+        for bid, e in (entries or {}).items():
+            terms = note_terms(e.get("notes") or "")
+            if terms:
+                self._terms_of[bid] = terms
+                for term, n in terms.items():
+                    self.postings.setdefault(term, {})[bid] = n
+        self.vocab = sorted(self.postings)
+
+    def __len__(self):
+        return len(self._terms_of)
+
+    def update(self, bid: str, text: str):
+        self.update_terms(bid, note_terms(text))
+
+    def update_terms(self, bid: str, new: Counter):
+        """Jako update, ale se slovy spočítanými předem (note_terms třeba ve vlákně na pozadí)."""
+        old = self._terms_of.get(bid, Counter())
+        if new == old:
+            return
+        for term in old.keys() - new.keys():
+            posting = self.postings[term]
+            del posting[bid]
+            if not posting:
+                del self.postings[term]
+                i = bisect.bisect_left(self.vocab, term)
+                if i < len(self.vocab) and self.vocab[i] == term:
+                    del self.vocab[i]
+        for term, n in new.items():
+            if old.get(term) == n:
+                continue
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                bisect.insort(self.vocab, term)
+            posting[bid] = n
+        if new:
+            self._terms_of[bid] = new
+        else:
+            self._terms_of.pop(bid, None)
+
+    def _matching_terms(self, q: str) -> List[str]:
+        if len(q) < self.MIN_PREFIX:
+            return [q] if q in self.postings else []
+        lo = bisect.bisect_left(self.vocab, q)
+        hi = bisect.bisect_left(self.vocab, q + "\uffff", lo)
+        return self.vocab[lo:hi]
+
+    def search(self, query: str, limit: int = 50) -> List[Tuple[str, float]]:
+        """Díla obsahující všechna slova dotazu (jako prefix), seřazená podle tf-idf; přesná shoda váží víc."""
+        words = _WORD_RE.findall(fold_text(query))
+        if not words:
+            return []
+        n_docs = len(self._terms_of) or 1
+        # nejdřív nejvýběrovější slovo; další slova už jen procházejí zbylé kandidáty
+        plan = []
+        for q in dict.fromkeys(words):
+            terms = self._matching_terms(q)
+            if not terms:
+                return []
+            plan.append((sum(len(self.postings[t]) for t in terms), q, terms))
+        plan.sort()
+        scores: Optional[Dict[str, float]] = None
+        for _, q, terms in plan:
+            found: Dict[str, float] = {}
+            for term in terms:
+                posting = self.postings[term]
+                weight = log(1 + n_docs / len(posting)) * (2.0 if term == q else 1.0)
+                if scores is None or len(posting) <= len(scores):
+                    for bid, n in posting.items():
+                        if scores is None or bid in scores:
+                            found[bid] = found.get(bid, 0.0) + weight * (1 + log(n))
+                else:
+                    for bid in scores:
+                        n = posting.get(bid)
+                        if n:
+                            found[bid] = found.get(bid, 0.0) + weight * (1 + log(n))
+            if scores is None:
+                scores = found
+            else:
+                scores = {bid: s + found[bid] for bid, s in scores.items() if bid in found}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        return ranked[:limit]
+
+    @staticmethod
+    def find_match(text: str, query: str) -> Optional[Tuple[int, int]]:
+        """(začátek, konec) prvního místa v textu, kde začíná slovo odpovídající prvnímu slovu dotazu."""
+        words = _WORD_RE.findall(fold_text(query))
+        if not words:
+            return None
+        folded = fold_text(text)
+        for q in words:
+            pattern = re.escape(q) if len(q) >= NotesIndex.MIN_PREFIX else re.escape(q) + r"\b"
+            m = re.search(r"\b" + pattern, folded)
+            if m:
+                return m.start(), m.end()
+        return None
+
+# ---------- ukládání stavu ----------
+def new_entry() -> dict:
+    return {"completed": False, "notes": "", "attachments": []}
+
+def copy_entry(entry: dict) -> dict:
+    # mělká kopie stačí: notes je neměnný str, jen seznam příloh se kopíruje
+    e = dict(entry)
+    e["attachments"] = list(e.get("attachments") or [])
+    return e
+
+class FileLock:
+    """
+    Poradní výhradní zámek mezi procesy přes zamykací soubor (flock, na Windows msvcrt.locking).
+    Uvnitř procesu je reentrantní a vlákna se řadí přes RLock, takže save_state může běžet
+    i uvnitř zápisu StateSaveru. Instance pro danou cestu vrací file_lock().
+    """
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def _acquire(self) -> int:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)   # sám zkouší 10 s, pak OSError
+                        break
+                    except OSError:
+                        continue
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = self._acquire()
+            except BaseException:
+                self._rlock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+        self._rlock.release()
+
+_FILE_LOCKS: Dict[str, FileLock] = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+
+def file_lock(path) -> FileLock:
+    """Jeden FileLock na cestu v celém procesu (jinak by se dvě vlákna zamkla navzájem přes dva popisovače)."""
+    key = os.path.abspath(path)
+    with _FILE_LOCKS_GUARD:
+        lock = _FILE_LOCKS.get(key)
+        if lock is None:
+            lock = _FILE_LOCKS[key] = FileLock(pathlib.Path(key))
+        return lock
+
+def data_lock(data_file: pathlib.Path = DATA_FILE) -> FileLock:
+    """Zámek snapshotu a žurnálu: drží se při každém zápisu, aby se zápisy dvou oken neproložily."""
+    return file_lock(data_file.with_suffix(".lock"))
+
+def _file_stamp(path) -> Optional[Tuple[int, int, int]]:
+    # i inode: os.replace při kompakci může zachovat mtime i velikost
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+def _file_size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _read_journal(journal_file: pathlib.Path, journal_id: Optional[str], offset: int = 0,
+                  inode: Optional[int] = None) -> Tuple[Optional[List[dict]], int, Optional[int]]:
+    """
+    Záznamy žurnálu od bajtu offset, offset za posledním celým řádkem a inode přečteného souboru;
+    čte se jen to, co přibylo. Hlavička se ověří vždy, i při čtení od offsetu: kompakce přepíše
+    žurnál na místě (jiné journal_id) a obnova zálohy ho nahradí (jiný inode) – starý offset pak
+    ukazuje doprostřed jiného souboru. V těch případech, a když se zkrátil, je výsledek (None, ...).
+    Nedopsaný konec (jiné okno právě zapisuje, nebo pád) se nepočítá – přečte se příště celý.
+    """
+    if not journal_id:
+        return None, offset, inode
+    try:
+        with open(journal_file, "rb") as f:
+            st = os.fstat(f.fileno())
+            if inode is not None and st.st_ino != inode:
+                return None, offset, st.st_ino
+            line = f.readline()
+            try:
+                header = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or header.get("journal_id") != journal_id:
+                return None, offset, st.st_ino
+            if offset == 0:
+                offset = f.tell()
+            elif st.st_size < offset:
+                return None, offset, st.st_ino
+            else:
+                f.seek(offset)
+            data = f.read()
+    except OSError:
+        return None, offset, inode
+    end = data.rfind(b"\n") + 1
+    records = []
+    for line in data[:end].splitlines():
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue    # useknutý řádek po pádu; další okno za něj mohlo připsat platné záznamy
+        if isinstance(rec, dict):
+            records.append(rec)
+    return records, offset + end, st.st_ino
+
+def _apply_journal(records: List[dict], entries: Dict[str, dict], custom: Optional[List[str]]) -> Optional[List[str]]:
+    for rec in records:
+        if "id" in rec:
+            entries[rec["id"]] = rec.get("entry") or new_entry()
+        elif "custom_selection" in rec:
+            custom = rec["custom_selection"]
+    return custom
+
+def load_state(data_file: pathlib.Path = DATA_FILE) -> Tuple[Dict[str, dict], Optional[List[str]]]:
+    """
+    Vrací (entries, custom_selection).
+    - entries: mapping id -> {completed, notes, attachments}
+    - custom_selection: seznam id nebo None
+    Tento formát je tolerantní i k dřívějšímu souboru (pokud byl uložen pouze dict entries).
+    Na snapshot v data_file se přehrají změny zapsané od poslední kompakce do žurnálu vedle něj.
+    """
+    entries, custom, _ = load_state_synced(data_file)
+    return entries, custom
+
+@traced("load_state")
+def load_state_synced(data_file: pathlib.Path = DATA_FILE) -> Tuple[Dict[str, dict], Optional[List[str]], dict]:
+    """
+    Jako load_state, navíc bod synchronizace pro StateSaver: journal_id, offset za přečteným
+    žurnálem, jeho inode, počet záznamů a razítko snapshotu. Od něj pak sleduje změny jiných oken.
+    Čte se pod data_lock, takže snapshot a žurnál patří ke stejné kompakci.
+    """
+    with data_lock(data_file):
+        if data_file.exists():
+            try:
+                return read_state_synced(data_file)
+            except Exception:
+                pass
+        return {}, None, {"journal_id": None, "offset": 0, "inode": None, "records": 0,
+                          "stamp": _file_stamp(data_file)}
+
+def read_state(data_file: pathlib.Path) -> Tuple[Dict[str, dict], Optional[List[str]]]:
+    """Jako load_state, ale chyby čtení a neplatný JSON propouští (hlásí je příkazová řádka i přehled třídy)."""
+    entries, custom, _ = read_state_synced(data_file)
+    return entries, custom
+
+def read_state_synced(data_file: pathlib.Path) -> Tuple[Dict[str, dict], Optional[List[str]], dict]:
+    with open(data_file, "r", encoding="utf-8") as f:
+        # razítko právě otevřeného souboru – náhrada snapshotu po něm se pozná jako změna
+        st = os.fstat(f.fileno())
+        raw = json.load(f)
+    sync = {"journal_id": None, "offset": 0, "inode": None, "records": 0,
+            "stamp": (st.st_mtime_ns, st.st_size, st.st_ino)}
+    if isinstance(raw, dict) and "entries" in raw:
+        entries = raw.get("entries", {})
+        custom = raw.get("custom_selection")
+        records, offset, inode = _read_journal(journal_file_for(data_file), raw.get("journal_id"))
+        if records is None:
+            # žurnál chybí nebo je cizí (pád mezi zápisem snapshotu a žurnálu): bez journal_id
+            # StateSaver nic nepřipíše do žurnálu, který by load zahodil – první zápis je kompakce
+            return entries, custom, sync
+        custom = _apply_journal(records, entries, custom)
+        sync.update(journal_id=raw.get("journal_id"), offset=offset, inode=inode, records=len(records))
+        return entries, custom, sync
+    if not isinstance(raw, dict):
+        raise ValueError("soubor neobsahuje objekt se stavem")
+    # starý formát: celý file je entries dict
+    return raw, None, sync
+
+@traced("save_state")
+def save_state(entries: Dict[str, dict], custom_selection: Optional[List[str]] = None,
+               journal_id: Optional[str] = None, data_file: pathlib.Path = DATA_FILE) -> str:
+    """
+    Uloží do data_file objekt { entries: {...}, custom_selection: [...], journal_id: ... }
+    Zápis je atomický (dočasný soubor + os.replace) a žurnál se poté založí znovu
+    s hlavičkou nového journal_id. Vrací použité journal_id.
+    Běží pod data_lock, takže nepřepíše rozepsaný zápis jiného okna.
+    """
+    journal_id = journal_id or uuid.uuid4().hex
+    data = {"entries": entries, "journal_id": journal_id}
+    if custom_selection is not None:
+        data["custom_selection"] = custom_selection
+    with data_lock(data_file):
+        tmp = data_file.with_name(data_file.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, data_file)
+        # pád mezi replace a tímto zápisem nevadí: starý žurnál má jiné journal_id a ignoruje se
+        with open(journal_file_for(data_file), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"journal_id": journal_id}) + "\n")
+    return journal_id
+
+def same_entry(a: Optional[dict], b: Optional[dict]) -> bool:
+    if a is None or b is None:
+        return a is b
+    return (bool(a.get("completed")) == bool(b.get("completed")) and (a.get("notes") or "") == (b.get("notes") or "")
+            and list(a.get("attachments") or ()) == list(b.get("attachments") or ()))
+
+def _attachment_key(att) -> str:
+    return json.dumps(att, sort_keys=True, ensure_ascii=False) if isinstance(att, dict) else str(att)
+
+def merge_entry(local: dict, external: dict) -> Tuple[dict, bool]:
+    """
+    Sloučí položku změněnou zároveň tady i v jiném okně: dokončení platí místní (poslední klik),
+    přílohy se sjednotí, poznámky zůstávají místní. Vrací (sloučená položka, konflikt poznámek).
+    """
+    merged = copy_entry(local)
+    seen = {_attachment_key(att) for att in merged["attachments"]}
+    for att in external.get("attachments") or ():
+        key = _attachment_key(att)
+        if key not in seen:
+            seen.add(key)
+            merged["attachments"].append(att)
+    conflict = (external.get("notes") or "") != (local.get("notes") or "")
+    return merged, conflict
+
+# ---------- historie poznámek ----------
+def text_delta(old: str, new: str) -> Tuple[int, int, str]:
+    """
+    Rozdíl dvou verzí jako jedna náhrada (pozice, počet odebraných znaků, vložený text).
+    Společný začátek a konec se hledají půlením s porovnáním řezů, takže i u 1 MB textu
+    proběhne jen pár porovnání v C místo smyčky přes znaky.
+    """
+    limit = min(len(old), len(new))
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[lo:mid] == new[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    prefix = lo
+    lo, hi = 0, limit - prefix
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[len(old) - mid:len(old) - lo] == new[len(new) - mid:len(new) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    suffix = lo
+    return prefix, len(old) - prefix - suffix, new[prefix:len(new) - suffix]
+
+def apply_delta(text: str, pos: int, removed: int, inserted: str) -> str:
+    return text[:pos] + inserted + text[pos + removed:]
+
+class NotesHistory:
+    """
+    Historie verzí poznámek po dílech v HISTORY_DIR/<sha1 id>.jsonl, řádek na verzi.
+    Verze je buď plný text ("k", delší zkomprimovaně v "z"), nebo náhrada jednoho úseku
+    proti předchozí verzi ("p", "r", "s").
+    Plný text se zapíše nejpozději po HISTORY_KEYFRAME_EVERY rozdílech (nebo dřív, když rozdíly
+    od posledního plného textu zabírají víc než text sám), takže složení libovolné verze aplikuje
+    omezený počet rozdílů. record() volá StateSaver ve svém vlákně, mimo psaní.
+    Zápisy drží zámek složky historie; když soubor mezitím změnilo jiné okno, poslední verze
+    se před dalším rozdílem načte znovu.
+    """
+    def __init__(self, folder: pathlib.Path = HISTORY_DIR, interval: float = HISTORY_INTERVAL,
+                 keyframe_every: int = HISTORY_KEYFRAME_EVERY, max_versions: int = HISTORY_MAX_VERSIONS):
+        self.folder = folder
+        self.interval = interval
+        self.keyframe_every = keyframe_every
+        self.max_versions = max_versions
+        self._lock = threading.RLock()
+        self._file_lock = file_lock(folder / "history.lock")
+        # id -> poslední zapsaná verze: text, čas, počet verzí, rozdíly od posledního plného textu (počet, znaky)
+        # a velikost souboru po posledním zápisu (jiná velikost = psalo jiné okno)
+        self._tail: Dict[str, dict] = {}
+        self._pending: Dict[str, Tuple[str, float]] = {}   # změna, která zatím nemá vlastní verzi
+        self._seed: Dict[str, str] = {}     # text před první změnou, pokud dílo historii ještě nemá
+
+    def path_for(self, bid: str) -> pathlib.Path:
+        return self.folder / (hashlib.sha1(bid.encode("utf-8")).hexdigest() + ".jsonl")
+
+    def seed(self, bid: str, text: str):
+        """Předá text před první úpravou v této relaci (bez I/O); použije se, jen když soubor historie chybí."""
+        if text and bid not in self._tail and bid not in self._seed:
+            self._seed[bid] = text
+
+    def _read(self, bid: str) -> List[dict]:
+        out = []
+        try:
+            with open(self.path_for(bid), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        break    # useknutý poslední řádek
+                    if "t" in rec:
+                        out.append(rec)
+        except FileNotFoundError:
+            pass
+        return out
+
+    @staticmethod
+    def _keyframe(t: float, text: str) -> dict:
+        if len(text) > HISTORY_COMPRESS_OVER:
+            packed = base64.b64encode(zlib.compress(text.encode("utf-8"), 6)).decode("ascii")
+            return {"t": t, "n": len(text), "k": True, "z": packed}
+        return {"t": t, "n": len(text), "k": text}
+
+    @staticmethod
+    def _keyframe_text(rec: dict) -> str:
+        if "z" in rec:
+            return zlib.decompress(base64.b64decode(rec["z"])).decode("utf-8")
+        return rec.get("k") or ""
+
+    def _rebuild(self, records: List[dict], index: int) -> str:
+        start = index
+        while start > 0 and "k" not in records[start]:
+            start -= 1
+        text = self._keyframe_text(records[start])
+        for rec in records[start + 1:index + 1]:
+            text = apply_delta(text, rec["p"], rec["r"], rec["s"])
+        return text
+
+    def _tail_from(self, bid: str) -> dict:
+        records = self._read(bid)
+        size = _file_size(self.path_for(bid))
+        if not records:
+            return {"text": "", "t": None, "count": 0, "since_key": 0, "delta_chars": 0, "size": size}
+        last = len(records) - 1
+        key = max(i for i, rec in enumerate(records) if "k" in rec or i == 0)
+        return {"text": self._rebuild(records, last), "t": records[last]["t"], "count": len(records),
+                "since_key": last - key, "delta_chars": sum(len(rec.get("s", "")) for rec in records[key + 1:]),
+                "size": size}
+
+    def _load_tail(self, bid: str, now: float) -> dict:
+        tail = self._tail.get(bid)
+        if tail is not None:
+            return tail
+        tail = self._tail[bid] = self._tail_from(bid)
+        seed = self._seed.pop(bid, None)
+        if seed and not tail["count"]:
+            self._append(bid, seed, now)
+        return self._tail[bid]
+
+    def _append(self, bid: str, text: str, t: float):
+        path = self.path_for(bid)
+        tail = self._tail[bid]
+        if _file_size(path) != tail["size"]:
+            # jiné okno mezitím připsalo vlastní verzi – rozdíl se musí počítat od ní
+            tail = self._tail[bid] = self._tail_from(bid)
+        rec = None
+        if tail["count"] and tail["since_key"] + 1 < self.keyframe_every:
+            pos, removed, inserted = text_delta(tail["text"], text)
+            # když rozdíly od plného textu přerostou text sám, je plný text levnější i na obnovu
+            if tail["delta_chars"] + len(inserted) <= len(text):
+                rec = {"t": t, "n": len(text), "p": pos, "r": removed, "s": inserted}
+        if rec is None:
+            rec = self._keyframe(t, text)
+        if not tail["count"]:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            if not tail["count"]:
+                f.write(json.dumps({"id": bid}, ensure_ascii=False) + "\n")
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        if "k" in rec:
+            tail.update(since_key=0, delta_chars=0)
+        else:
+            tail.update(since_key=tail["since_key"] + 1, delta_chars=tail["delta_chars"] + len(rec["s"]))
+        tail.update(text=text, t=t, count=tail["count"] + 1, size=_file_size(path))
+        if tail["count"] > self.max_versions:
+            self._prune(bid)
+
+    def _prune(self, bid: str):
+        # ponechá novější polovinu; první ponechaná verze se přepíše na plný text
+        records = self._read(bid)
+        cut = len(records) - self.max_versions // 2
+        if cut <= 0:
+            return
+        kept = [self._keyframe(records[cut]["t"], self._rebuild(records, cut))] + records[cut + 1:]
+        path = self.path_for(bid)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"id": bid}, ensure_ascii=False) + "\n")
+            for rec in kept:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+        key = max(i for i, rec in enumerate(kept) if "k" in rec)
+        self._tail[bid].update(count=len(kept), since_key=len(kept) - 1 - key,
+                               delta_chars=sum(len(rec.get("s", "")) for rec in kept[key + 1:]), size=_file_size(path))
+
+    @staticmethod
+    def _big_drop(old: str, new: str) -> bool:
+        if old.strip() and not new.strip():
+            return True     # smazané celé poznámky – přesně ten případ, kvůli kterému historie je
+        return len(old) - len(new) >= HISTORY_BIG_DROP or (len(old) >= 40 and len(new) * 2 < len(old))
+
+    def record(self, bid: str, text: str, now: Optional[float] = None):
+        """
+        Zaznamená aktuální text. Verze vznikne, když od poslední uplynul interval nebo když se
+        hodně smazalo (pak se uloží i text před smazáním); jinak změna počká jako nezapsaná.
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._file_lock:
+            tail = self._load_tail(bid, now)
+            pending = self._pending.pop(bid, None)
+            if text == tail["text"]:
+                return    # návrat k zapsané verzi – nezapsaná změna odpadá
+            last = pending[0] if pending else tail["text"]
+            drop = self._big_drop(last, text)
+            if pending and drop:
+                self._append(bid, pending[0], pending[1])
+                tail = self._tail[bid]
+            if tail["t"] is None or now - tail["t"] >= self.interval or drop:
+                self._append(bid, text, now)
+            else:
+                self._pending[bid] = (text, now)
+
+    def checkpoint(self, bid: Optional[str] = None):
+        """Zapíše nezapsané změny (jednoho díla, nebo všech) jako verze."""
+        with self._lock, self._file_lock:
+            for b in [bid] if bid is not None else list(self._pending):
+                pending = self._pending.pop(b, None)
+                if pending:
+                    self._append(b, pending[0], pending[1])
+
+    def versions(self, bid: str) -> List[Tuple[float, int]]:
+        """(čas, délka textu) všech uložených verzí, od nejstarší."""
+        with self._lock:
+            return [(rec["t"], rec.get("n", 0)) for rec in self._read(bid)]
+
+    def text_at(self, bid: str, index: int) -> str:
+        with self._lock:
+            return self._rebuild(self._read(bid), index)
+
+class StateSaver:
+    """
+    Write-behind ukládání stavu.
+    GUI jen označí změněné položky (mark_dirty) – to je O(1) a neblokuje psaní.
+    Vlákno na pozadí změny po SAVE_DELAY sloučí a připíše do žurnálu jen změněné položky;
+    po COMPACT_EVERY záznamech, nebo když žurnál přeroste snapshot (COMPACT_RATIO, COMPACT_MAX_BYTES),
+    zapíše atomicky celý snapshot přes save_state – jinak by psaní do 1 MB poznámky nafouklo žurnál
+    na stovky MB a load_state by ho celý přehrával.
+    Se SqliteStore se místo žurnálu zapíše jedna transakce s UPSERTem změněných řádků.
+    S NotesHistory se po zápisu předají poznámky změněných položek do historie verzí.
+
+    Víc oken nad stejnými daty: zápisy i dočítání běží pod data_lock a každý zápis nejdřív dočte,
+    co od bodu synchronizace (sync z load_state_synced) připsala jiná okna – jen nový konec žurnálu,
+    celý snapshot až po cizí kompakci nebo náhradě žurnálu. Bez vlastních změn se to kontroluje
+    každých watch_interval.
+    Cizí změny dostane on_external ({"entries": {id: položka}, "local": díla změněná i tady,
+    případně "custom_selection"})
+    z vlákna ukládání; GUI je po dílech sloučí. Kompakce do snapshotu převezme cizí změny,
+    které ještě nejsou sloučené, takže zastaralá kopie v paměti nic nepřepíše.
+    """
+    def __init__(self, entries: Dict[str, dict], get_custom_selection, delay: float = SAVE_DELAY,
+                 compact_every: int = COMPACT_EVERY, store: Optional["SqliteStore"] = None,
+                 history: Optional[NotesHistory] = None, sync: Optional[dict] = None,
+                 on_external=None, watch_interval: float = WATCH_INTERVAL, data_file: pathlib.Path = DATA_FILE):
+        self.entries = entries
+        self.data_file = data_file
+        self.journal_file = journal_file_for(data_file)
+        self.get_custom_selection = get_custom_selection
+        self.store = store
+        self.history = history
+        self.delay = delay
+        self.compact_every = compact_every
+        self.on_external = on_external
+        self.watch_interval = watch_interval
+        self._cond = threading.Condition()
+        self._dirty = set()
+        self._writing = set()
+        self._selection_dirty = False
+        self._flush_requested = False
+        self._busy = False
+        self._closing = False
+        # bez sync se žurnál naváže až při prvním zápisu (ten udělá kompakci)
+        sync = sync or {}
+        self._journal_id = sync.get("journal_id")
+        self._journal_offset = sync.get("offset", 0)
+        self._journal_inode = sync.get("inode")
+        self._journal_records = sync.get("records", 0)
+        self._stamp = sync.get("stamp")
+        self._source = uuid.uuid4().hex[:12]    # vlastní záznamy v žurnálu se při dočítání přeskočí
+        self._external: Dict[str, dict] = {}    # cizí změny od poslední kompakce, které jsme nepřepsali
+        self._external_selection = None         # (custom_selection,) z jiného okna
+        self._written: Dict[str, dict] = {}     # co jsme naposledy zapsali (pozná vlastní změny v cizím snapshotu)
+        self._thread = threading.Thread(target=self._run, name="StateSaver", daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, bid: str):
+        with self._cond:
+            self._dirty.add(bid)
+            self._cond.notify_all()
+
+    def mark_selection_dirty(self):
+        with self._cond:
+            self._selection_dirty = True
+            self._cond.notify_all()
+
+    def is_pending(self, bid: str) -> bool:
+        """Má položka místní změnu, která ještě není na disku (čeká nebo se právě zapisuje)?"""
+        with self._cond:
+            return bid in self._dirty or bid in self._writing
+
+    def pending_ids(self) -> set:
+        """Položky s místní změnou, která ještě není na disku (kopie, volající ji smí měnit)."""
+        with self._cond:
+            return self._dirty | self._writing
+
+    def selection_pending(self) -> bool:
+        with self._cond:
+            return self._selection_dirty
+
+    def _pending(self) -> bool:
+        return bool(self._dirty) or self._selection_dirty
+
+    def flush(self):
+        """Zapíše vše čekající hned a počká na dokončení zápisu."""
+        with self._cond:
+            if not self._thread.is_alive() or not (self._pending() or self._busy):
+                return
+            self._flush_requested = True
+            self._cond.notify_all()
+            while (self._pending() or self._busy) and self._thread.is_alive():
+                self._cond.wait(0.1)
+
+    def close(self):
+        """Dopíše čekající změny a ukončí vlákno."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        if self.history is not None:
+            try:
+                self.history.checkpoint()
+            except Exception:
+                traceback.print_exc()
+
+    def _record_history(self, dirty):
+        for bid in dirty:
+            entry = self.entries.get(bid)
+            if entry is not None:
+                self.history.record(bid, entry.get("notes") or "")
+
+    def _wait_for_changes(self) -> bool:
+        """Pod self._cond: False, když místo změny uplynul watch_interval (čas podívat se po cizích zápisech)."""
+        while not (self._pending() or self._closing):
+            if self.on_external is None or self.store is not None:
+                self._cond.wait()
+            elif not self._cond.wait(self.watch_interval):
+                return False
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                changed = self._wait_for_changes()
+            if not changed:
+                try:
+                    self._deliver(*self._catch_up())
+                except Exception:
+                    traceback.print_exc()
+                continue
+            with self._cond:
+                # sloučení: další úhozy během SAVE_DELAY skončí ve stejném zápisu
+                deadline = time.monotonic() + self.delay
+                while not (self._closing or self._flush_requested):
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                dirty, self._dirty = self._dirty, set()
+                selection_dirty, self._selection_dirty = self._selection_dirty, False
+                self._writing = dirty
+                self._flush_requested = False
+                closing = self._closing
+                self._busy = bool(dirty) or selection_dirty
+            try:
+                if self._busy:
+                    self._write(dirty, selection_dirty)
+                    if self.history is not None:
+                        try:
+                            self._record_history(dirty)
+                        except Exception:
+                            # historie je doplněk – její chyba nesmí vrátit změny do fronty
+                            traceback.print_exc()
+            except Exception:
+                traceback.print_exc()
+                if not closing:
+                    # vrať změny do fronty, zkusí se to znovu při dalším průchodu
+                    with self._cond:
+                        self._dirty |= dirty
+                        self._selection_dirty = self._selection_dirty or selection_dirty
+                    time.sleep(self.delay)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._writing = set()
+                    self._cond.notify_all()
+            if closing:
+                return
+
+    # ----- změny z jiných oken -----
+    def _catch_up(self) -> Tuple[Dict[str, dict], Optional[tuple]]:
+        """
+        Co od posledního čtení zapsala jiná okna: (změněné položky, (custom_selection,) nebo None).
+        Běžně se čte jen přírůstek žurnálu za známým offsetem; celý snapshot jen po jeho náhradě.
+        Pod data_lock: jiné okno nesmí žurnál mezi kontrolou hlavičky a čtením přepsat.
+        """
+        if not self._changed_on_disk():
+            return {}, None     # běžný případ při hlídání: bez zámku, jen dva stat()
+        with data_lock(self.data_file):
+            stamp = _file_stamp(self.data_file)
+            if stamp != self._stamp:
+                return self._reload(stamp)
+            if not self._changed_on_disk():
+                return {}, None
+            records, offset, inode = _read_journal(self.journal_file, self._journal_id, self._journal_offset,
+                                                   self._journal_inode)
+            if records is None:
+                # žurnál patří k jiné kompakci, byl nahrazen nebo zkrácen (obnova zálohy) – znovu načíst vše
+                return self._reload(stamp)
+        self._journal_offset, self._journal_inode = offset, inode
+        self._journal_records += len(records)
+        changes, selection = {}, None
+        for rec in records:
+            if rec.get("src") == self._source:
+                continue
+            if "id" in rec:
+                changes[rec["id"]] = rec.get("entry") or new_entry()
+            elif "custom_selection" in rec:
+                selection = (rec["custom_selection"],)
+        return changes, selection
+
+    def _changed_on_disk(self) -> bool:
+        if _file_stamp(self.data_file) != self._stamp:
+            return True
+        if self._journal_id is None:
+            return False
+        journal = _file_stamp(self.journal_file)
+        return journal is None or journal[1:] != (self._journal_offset, self._journal_inode)
+
+    def _reload(self, stamp) -> Tuple[Dict[str, dict], Optional[tuple]]:
+        # snapshot nahradilo jiné okno (kompakce) nebo nástroj zvenku: porovná se celý, ale jen zřídka
+        if stamp is None:
+            self._stamp = None
+            return {}, None
+        try:
+            entries, custom, sync = read_state_synced(self.data_file)
+        except (OSError, ValueError):
+            return {}, None     # rozepsaný soubor zvenku – zkusí se znovu příště
+        changes = {}
+        for bid, entry in entries.items():
+            if same_entry(entry, self._written.get(bid)) or same_entry(entry, self.entries.get(bid)):
+                continue
+            changes[bid] = entry
+        current = self.get_custom_selection()
+        selection = (custom,) if custom != (list(current) if current is not None else None) else None
+        self._journal_id = sync["journal_id"]
+        self._journal_offset = sync["offset"]
+        self._journal_inode = sync["inode"]
+        self._journal_records = sync["records"]
+        self._stamp = sync["stamp"]
+        return changes, selection
+
+    def _deliver(self, changes: Dict[str, dict], selection: Optional[tuple]):
+        if not changes and selection is None:
+            return
+        self._external.update(changes)
+        # díla, která máme změněná i tady; GUI je dostane až po našem zápisu, kdy už nečekají
+        out = {"entries": changes, "local": {bid for bid in changes if self.is_pending(bid)}}
+        if selection is not None:
+            self._external_selection = selection
+            out["custom_selection"] = selection[0]
+        if self.on_external is not None:
+            self.on_external(out)
+        else:
+            # bez GUI se cizí změny převezmou rovnou; místní neuložená změna má přednost
+            for bid, entry in changes.items():
+                if bid not in out["local"]:
+                    self.entries[bid] = entry
+
+    @traced("saver.write")
+    def _write(self, dirty, selection_dirty: bool):
+        if self.store is not None:
+            changed = {}
+            for bid in dirty:
+                entry = self.entries.get(bid)
+                if entry is not None:
+                    changed[bid] = copy_entry(entry)
+            custom = self.get_custom_selection() if selection_dirty else None
+            self.store.write(changed, selection_dirty, list(custom) if custom is not None else None)
+            return
+        with data_lock(self.data_file):
+            # nejdřív dočíst cizí zápisy, ať vlastní záznam přijde za ně a offset zůstane přesný
+            self._deliver(*self._catch_up())
+            if self._journal_id is None or self._compact_due():
+                self._compact(dirty, selection_dirty)
+                return
+            written = {}
+            lines = []
+            for bid in dirty:
+                entry = self.entries.get(bid)
+                if entry is not None:
+                    written[bid] = copy_entry(entry)
+                    lines.append(json.dumps({"id": bid, "entry": written[bid], "src": self._source}, ensure_ascii=False))
+            if selection_dirty:
+                custom = self.get_custom_selection()
+                lines.append(json.dumps({"custom_selection": list(custom) if custom is not None else None,
+                                         "src": self._source}, ensure_ascii=False))
+            if not lines:
+                return
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            if _file_size(self.journal_file) > self._journal_offset:
+                data = b"\n" + data     # useknutý řádek po pádu jiného okna se nesmí slepit s naším
+            with open(self.journal_file, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                self._journal_offset = f.tell()
+            self._journal_records += len(lines)
+            self._wrote(written, selection_dirty)
+
+    def _compact_due(self) -> bool:
+        # offset je po _catch_up pod zámkem velikost žurnálu, razítko snapshotu nese jeho velikost
+        if self._journal_records >= self.compact_every or self._journal_offset >= COMPACT_MAX_BYTES:
+            return True
+        snapshot = self._stamp[1] if self._stamp else 0
+        return self._journal_offset >= max(COMPACT_MIN_BYTES, COMPACT_RATIO * snapshot)
+
+    def _wrote(self, written: Dict[str, dict], selection_dirty: bool):
+        # místní zápis je novější než dříve přečtená cizí změna téže položky
+        for bid in written:
+            self._external.pop(bid, None)
+        self._written.update(written)
+        if selection_dirty:
+            self._external_selection = None
+
+    def _compact(self, dirty=(), selection_dirty: bool = False):
+        # kopie se dělá tady ve vlákně: list(items()) je atomický, hodnoty se kopírují mělce
+        snapshot = {bid: copy_entry(e) for bid, e in list(self.entries.items())}
+        # cizí změny, které GUI ještě nesloučilo, mají přednost před zastaralou kopií v paměti
+        for bid, entry in self._external.items():
+            if bid not in dirty and not self.is_pending(bid):
+                snapshot[bid] = copy_entry(entry)
+        custom = self.get_custom_selection()
+        if self._external_selection is not None and not selection_dirty and not self.selection_pending():
+            custom = self._external_selection[0]
+        with data_lock(self.data_file):
+            self._journal_id = save_state(snapshot, list(custom) if custom is not None else None,
+                                          data_file=self.data_file)
+            _, self._journal_offset, self._journal_inode = _file_stamp(self.journal_file)
+            self._stamp = _file_stamp(self.data_file)
+        self._journal_records = 0
+        self._wrote({bid: snapshot[bid] for bid in dirty if bid in snapshot}, selection_dirty)
+        self._external.clear()
+        self._external_selection = None
+
+class SqliteStore:
+    """
+    Stav v SQLite (WAL): tabulka entries (index podle completed), attachments a custom_selection.
+    Zapisuje jen vlákno StateSaveru, čte GUI – každé vlákno má vlastní spojení.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            id TEXT PRIMARY KEY,
+            completed INTEGER NOT NULL DEFAULT 0,
+            notes TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS entries_completed ON entries(completed);
+        CREATE TABLE IF NOT EXISTS attachments (
+            entry_id TEXT NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+            pos INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            blob TEXT,
+            PRIMARY KEY (entry_id, pos)
+        );
+        CREATE TABLE IF NOT EXISTS custom_selection (
+            pos INTEGER PRIMARY KEY,
+            entry_id TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+    UPSERT_ENTRY = ("INSERT INTO entries (id, completed, notes) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET completed = excluded.completed, notes = excluded.notes")
+
+    def __init__(self, path: pathlib.Path = DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        # co je v tabulce attachments, ať se přepisuje jen při skutečné změně seznamu příloh
+        self._written_attachments: Dict[str, tuple] = {}
+        db = self._db()
+        db.executescript(self.SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(str(self.path), timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        return db
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _attachment_rows(bid: str, attachments) -> List[tuple]:
+        return [(bid, pos, attachment_name(att), att.get("blob") if isinstance(att, dict) else None)
+                for pos, att in enumerate(attachments)]
+
+    def iter_entries(self):
+        """(id, entry) seřazené podle id; položky i přílohy se čtou kurzorem, ne najednou."""
+        db = self._db()
+        attachments = db.execute("SELECT entry_id, name, blob FROM attachments ORDER BY entry_id, pos")
+        pending = next(attachments, None)
+        for bid, completed, notes in db.execute("SELECT id, completed, notes FROM entries ORDER BY id"):
+            entry = {"completed": bool(completed), "notes": notes, "attachments": []}
+            # oba dotazy jdou podle id, takže stačí slévat
+            while pending is not None and pending[0] <= bid:
+                if pending[0] == bid:
+                    name, blob = pending[1], pending[2]
+                    entry["attachments"].append({"name": name, "blob": blob} if blob else name)
+                pending = next(attachments, None)
+            yield bid, entry
+
+    def custom_selection(self) -> Optional[List[str]]:
+        if self._meta("has_custom_selection") != "1":
+            return None
+        return [bid for (bid,) in self._db().execute("SELECT entry_id FROM custom_selection ORDER BY pos")]
+
+    def load(self) -> Tuple[Dict[str, dict], Optional[List[str]]]:
+        entries = dict(self.iter_entries())
+        self._written_attachments = {bid: tuple(self._attachment_rows(bid, e["attachments"]))
+                                     for bid, e in entries.items()}
+        return entries, self.custom_selection()
+
+    def write(self, changed: Dict[str, dict], selection_dirty: bool = False, custom: Optional[List[str]] = None):
+        """Jedna transakce: UPSERT změněných položek, přílohy jen pokud se změnily, případně custom_selection."""
+        db = self._db()
+        with db:
+            for bid, e in changed.items():
+                db.execute(self.UPSERT_ENTRY, (bid, int(bool(e.get("completed"))), e.get("notes") or ""))
+                rows = tuple(self._attachment_rows(bid, e.get("attachments") or ()))
+                if rows != self._written_attachments.get(bid, ()):
+                    db.execute("DELETE FROM attachments WHERE entry_id = ?", (bid,))
+                    db.executemany("INSERT INTO attachments (entry_id, pos, name, blob) VALUES (?, ?, ?, ?)", rows)
+                    self._written_attachments[bid] = rows
+            if selection_dirty:
+                db.execute("DELETE FROM custom_selection")
+                if custom is not None:
+                    db.executemany("INSERT INTO custom_selection (pos, entry_id) VALUES (?, ?)", enumerate(custom))
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('has_custom_selection', ?)",
+                           ("1" if custom is not None else "0",))
+
+    def completed_ids(self) -> set:
+        """Id dokončených položek – dotaz jde přes index entries_completed."""
+        rows = self._db().execute("SELECT id FROM entries WHERE completed = 1")
+        return {bid for (bid,) in rows}
+
+    def migrate_from_json(self, data_file: pathlib.Path = DATA_FILE) -> bool:
+        """
+        Jednorázově převezme data_file (+ žurnál, i starý formát "celý soubor = entries").
+        JSON soubory zůstanou na disku beze změny jako záloha. Vrací True, pokud se migrovalo.
+        """
+        if self._meta("migrated") is not None:
+            return False
+        entries, custom = load_state(data_file) if data_file.exists() else ({}, None)
+        self.write({bid: e for bid, e in entries.items() if isinstance(e, dict)}, True, custom)
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', ?)",
+                       (data_file.name if data_file.exists() else "",))
+        return bool(entries) or custom is not None
+
+# ---------- přílohy ----------
+# Položka v entry["attachments"] je {"name": zobrazované jméno, "blob": "<sha256><přípona>"}.
+# Starší data obsahují jen jméno souboru přímo v ATTACH_DIR – obě podoby se čtou stejně.
+def file_digest(path, on_chunk=None) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+            if on_chunk:
+                on_chunk("hash", len(chunk))
+    return h.hexdigest()
+
+def blob_path(blob: str) -> pathlib.Path:
+    return BLOB_DIR / blob[:2] / blob
+
+def attachment_name(att) -> str:
+    return att["name"] if isinstance(att, dict) else att
+
+def attachment_path(att) -> pathlib.Path:
+    return blob_path(att["blob"]) if isinstance(att, dict) else ATTACH_DIR / att
+
+def _reflink(src: pathlib.Path, dest: pathlib.Path) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as s, open(dest, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        try:
+            dest.unlink()
+        except OSError:
+            pass
+        return False
+
+def _copy_chunked(src: pathlib.Path, dest: pathlib.Path, on_chunk=None):
+    with open(src, "rb") as s, open(dest, "wb") as d:
+        for chunk in iter(lambda: s.read(HASH_CHUNK), b""):
+            d.write(chunk)
+            if on_chunk:
+                on_chunk("copy", len(chunk))
+    shutil.copystat(src, dest)
+
+def _materialize_blob(src: pathlib.Path, dest: pathlib.Path, on_chunk=None):
+    """Uloží src jako dest: reflink, jinak hardlink, jinak obyčejná kopie. Vždy přes tmp + os.replace."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + f".{uuid.uuid4().hex}.tmp")
+    try:
+        if not _reflink(src, tmp):
+            try:
+                # hardlink sdílí inode s originálem – přepis originálu na místě by změnil i blob
+                # (odhalí ho kontrola integrity), typické editory ale ukládají nový soubor
+                os.link(src, tmp)
+            except OSError:
+                _copy_chunked(src, tmp, on_chunk)
+        os.replace(tmp, dest)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+@traced("store_attachment")
+def store_attachment(src_path: str, on_chunk=None) -> dict:
+    """
+    Zahashuje soubor po blocích a uloží ho do BLOB_DIR, pokud tam stejný obsah ještě není.
+    on_chunk(fáze, bajty) se volá po každém bloku ("hash" / "copy"); výjimkou z něj lze operaci přerušit.
+    """
+    src = pathlib.Path(src_path)
+    if not src.is_file():
+        raise FileNotFoundError(src_path)
+    blob = file_digest(src, on_chunk) + src.suffix.lower()
+    dest = blob_path(blob)
+    if not dest.exists():
+        _materialize_blob(src, dest, on_chunk)
+    return {"name": src.name, "blob": blob}
+
+TEXT_SUFFIXES = {".txt", ".md", ".csv", ".json", ".xml", ".html", ".htm", ".rtf", ".tex"}
+
+def attachment_digest(att) -> Optional[str]:
+    """Hash obsahu přílohy; u starých příloh bez blobu není znám bez přečtení souboru."""
+    if isinstance(att, dict):
+        return att["blob"][:64]
+    return None
+
+def _decode_text(data: bytes) -> str:
+    for enc in ("utf-8-sig", "cp1250"):
+        try:
+            return data.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("latin-1")
+
+def _docx_text(path: pathlib.Path) -> str:
+    ns = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+    with zipfile.ZipFile(path) as z:
+        root = ElementTree.fromstring(z.read("word/document.xml"))
+    paras = []
+    for p in root.iter(ns + "p"):
+        paras.append("".join(t.text or "" for t in p.iter(ns + "t")))
+    return "\n".join(paras)
+
+def extract_text(path: pathlib.Path) -> Optional[str]:
+    """
+    Text přílohy podle přípony. None = teď to nejde (chybí pypdf), zkusí se znovu po dalším spuštění;
+    prázdný řetězec = typ bez textu nebo poškozený soubor, výsledek se uloží a už se nezkouší.
+    """
+    suffix = path.suffix.lower()
+    try:
+        if suffix in TEXT_SUFFIXES:
+            with open(path, "rb") as f:
+                return _decode_text(f.read(TEXT_LIMIT * 4))[:TEXT_LIMIT]
+        if suffix == ".docx":
+            return _docx_text(path)[:TEXT_LIMIT]
+        if suffix == ".pdf":
+            if PdfReader is None:
+                return None
+            parts, size = [], 0
+            for page in PdfReader(str(path)).pages:
+                text = page.extract_text() or ""
+                parts.append(text)
+                size += len(text)
+                if size >= TEXT_LIMIT:
+                    break
+            return "\n".join(parts)[:TEXT_LIMIT]
+    except Exception:
+        traceback.print_exc()
+    return ""
+
+def cached_attachment_text(path: pathlib.Path, digest: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """(hash obsahu, text); text se bere z TEXT_CACHE_DIR, a když tam není, vytáhne se a uloží."""
+    if digest is None:
+        digest = file_digest(path)
+    cache = TEXT_CACHE_DIR / f"{digest}.txt"
+    try:
+        with open(cache, "r", encoding="utf-8") as f:
+            return digest, f.read()
+    except FileNotFoundError:
+        pass
+    text = extract_text(path)
+    if text is not None:
+        TEXT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = cache.with_name(cache.name + f".{uuid.uuid4().hex}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, cache)
+    return digest, text
+
+def expand_paths(paths: List[str]) -> List[str]:
+    """Přetažené složky rozbalí na soubory (rekurzivně, seřazeně); soubory nechá, jak jsou."""
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, dirs, files in os.walk(p):
+                dirs.sort()
+                out.extend(os.path.join(root, fn) for fn in sorted(files))
+        else:
+            out.append(p)
+    return out
+
+class ImportCancelled(Exception):
+    pass
+
+# ---------- kontrola a úklid příloh ----------
+ATTACH_SCAN_CACHE = BASE_DIR / "attachment_scan.json"
+ATTACH_SCAN_GRACE = 600    # s – čerstvé soubory se za nepoužité nepovažují (může je právě ukládat import)
+ATTACH_SCAN_WORKERS = 4
+
+def attachment_refs(entries: Dict[str, dict]) -> List[Tuple[str, object, str]]:
+    """(id díla, příloha, úplná cesta) pro všechny přílohy ve stavu – snímek pro kontrolu na pozadí."""
+    return [(bid, att, str(attachment_path(att)))
+            for bid, e in entries.items() for att in (e.get("attachments") or ())]
+
+def iter_attachment_files(folder: pathlib.Path = ATTACH_DIR):
+    stack = [str(folder)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with it:
+            for de in it:
+                if de.is_dir(follow_symlinks=False):
+                    stack.append(de.path)
+                elif de.is_file(follow_symlinks=False):
+                    yield de
+
+def _blob_expected(path: str) -> Optional[str]:
+    # soubor v BLOB_DIR se jmenuje <sha256><přípona>, jméno je tedy zároveň kontrolní součet
+    name = os.path.basename(path)
+    if path.startswith(str(BLOB_DIR) + os.sep) and re.fullmatch(r"[0-9a-f]{64}(\.[^.]*)?", name):
+        return name[:64]
+    return None
+
+def scan_attachments(refs: List[Tuple[str, object, str]], progress=None, cancelled=None,
+                     workers: int = ATTACH_SCAN_WORKERS, cache_file: pathlib.Path = ATTACH_SCAN_CACHE) -> dict:
+    """
+    Projde ATTACH_DIR přes os.scandir a porovná ho s odkazy ze stavu:
+    - orphans: soubory, na které nic neodkazuje (kromě čerstvých, viz ATTACH_SCAN_GRACE)
+    - missing: odkazy na neexistující soubory
+    - corrupt: bloby, jejichž obsah neodpovídá hashi ve jméně
+    Hashe se počítají paralelně ve vláknech (hashlib u velkých bloků uvolňuje GIL) a jen u souborů,
+    jejichž mtime nebo velikost se od minulé kontroly změnily. progress(hotovo, celkem) je v bajtech.
+    """
+    started = time.time()
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if not isinstance(cache, dict):
+            cache = {}
+    except (OSError, ValueError):
+        cache = {}
+
+    referenced = {os.path.normcase(path) for _, _, path in refs}
+    files, orphans, to_hash = {}, [], []
+    total_bytes = blobs = 0
+    for de in iter_attachment_files():
+        st = de.stat(follow_symlinks=False)
+        files[os.path.normcase(de.path)] = de.path
+        total_bytes += st.st_size
+        if os.path.normcase(de.path) not in referenced and st.st_mtime < started - ATTACH_SCAN_GRACE:
+            orphans.append((de.path, st.st_size))
+        expected = _blob_expected(de.path)
+        if expected is None:
+            continue
+        blobs += 1
+        stamp = [st.st_mtime_ns, st.st_size]
+        hit = cache.get(de.path)
+        if not (hit and hit[:2] == stamp):
+            to_hash.append((de.path, expected, stamp))
+    missing = [(bid, att, path) for bid, att, path in refs if os.path.normcase(path) not in files]
+
+    fresh = {}
+    hash_total = sum(stamp[1] for _, _, stamp in to_hash)
+    done = [0]
+    lock = threading.Lock()
+    def on_chunk(phase, n):
+        if cancelled is not None and cancelled():
+            raise ImportCancelled()
+        with lock:
+            done[0] += n
+            now = done[0]
+        if progress:
+            progress(now, hash_total)
+
+    def check(item):
+        path, expected, stamp = item
+        try:
+            return path, stamp, file_digest(path, on_chunk) == expected
+        except OSError:
+            return path, None, False
+
+    was_cancelled = False
+    if to_hash:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            try:
+                for path, stamp, ok in pool.map(check, to_hash):
+                    if stamp is not None:
+                        fresh[path] = stamp + [ok]
+            except ImportCancelled:
+                was_cancelled = True
+    # cache jen pro soubory, které ještě existují; nové výsledky přepíšou staré
+    new_cache = {p: v for p, v in cache.items() if os.path.normcase(p) in files}
+    new_cache.update(fresh)
+    tmp = cache_file.with_name(cache_file.name + ".tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(new_cache, f)
+        os.replace(tmp, cache_file)
+    except OSError:
+        traceback.print_exc()
+    corrupt = sorted(p for p, v in new_cache.items() if not v[2])
+    return {
+        "files": len(files), "bytes": total_bytes, "orphans": sorted(orphans), "missing": missing,
+        "corrupt": corrupt, "hashed": len(fresh), "cached": blobs - len(to_hash),
+        "cancelled": was_cancelled, "started": started,
+    }
+
+def remove_attachment_files(paths: List[str], refs: List[Tuple[str, object, str]]) -> Tuple[int, int, List[str]]:
+    """
+    Smaže nepoužité soubory z ATTACH_DIR. Odkazy se předávají znovu (aktuální stav v okamžiku mazání),
+    takže soubor, ke kterému se mezitím přílohu přidalo, zůstane. Vrací (smazáno, bajtů, chyby).
+    """
+    referenced = {os.path.normcase(path) for _, _, path in refs}
+    root = os.path.normcase(str(ATTACH_DIR)) + os.sep
+    removed = freed = 0
+    errors = []
+    for path in paths:
+        key = os.path.normcase(os.path.abspath(path))
+        if key in referenced or not key.startswith(root):
+            continue
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            errors.append(f"{path}: {e}")
+            continue
+        removed += 1
+        freed += size
+        parent = os.path.dirname(path)
+        if os.path.dirname(parent) == str(BLOB_DIR):
+            try:
+                os.rmdir(parent)    # prázdná podsložka blobs/xx
+            except OSError:
+                pass
+    return removed, freed, errors
+
+# ---------- přehled třídy ----------
+DASHBOARD_CACHE = BASE_DIR / "dashboard_cache.json"
+DASHBOARD_CACHE_VERSION = 1
+DASHBOARD_INLINE = 4    # do tolika změněných souborů se čte bez spouštění procesů
+
+VIOLATION_LABELS = {"total": "počet děl", "genre": "žánry", "author": "max. děl od autora",
+                    "unknown": "díla mimo katalog"}
+
+def rules_fingerprint() -> str:
+    # porušení pravidel v cache platí jen pro stejná pravidla a katalog
+    data = json.dumps([RULES, len(CATALOG)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+def _stat_stamp(path) -> Optional[List[int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def student_file_stamp(path: pathlib.Path) -> list:
+    """mtime a velikost snapshotu i žurnálu vedle něj – změna kteréhokoli znamená nové načtení."""
+    return [_stat_stamp(path), _stat_stamp(journal_file_for(path))]
+
+def iter_student_files(folder: pathlib.Path):
+    """Všechny *.json ve složce a podsložkách (složka na žáka i soubory vedle sebe)."""
+    stack = [str(folder)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for de in it:
+                if de.is_dir(follow_symlinks=False):
+                    stack.append(de.path)
+                elif de.name.lower().endswith(".json") and de.is_file():
+                    yield pathlib.Path(de.path)
+
+def summarize_student(path: str) -> dict:
+    """
+    Souhrn jednoho žákovského souboru. Běží v pracovním procesu, proto vrací jen malý dict
+    (dokončená id, vlastní seznam, porušená pravidla, délky poznámek) a ne celé poznámky.
+    """
+    try:
+        entries, custom = read_state(pathlib.Path(path))
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    completed, notes = [], {}
+    words = 0
+    for bid, entry in entries.items():
+        if not isinstance(entry, dict):
+            continue
+        if entry.get("completed"):
+            completed.append(bid)
+        text = entry.get("notes") or ""
+        if text.strip():
+            notes[bid] = len(text)
+            words += len(_WORD_RE.findall(text))
+    violations = []
+    if custom is not None:
+        custom = list(dict.fromkeys(custom))
+        books = CATALOG.resolve(custom)
+        tally = RuleTally(RULES)
+        for b in books:
+            tally.add(b)
+        violations = [key for key, ok, _ in tally.report() if not ok]
+        if len(books) < len(custom):
+            violations.append("unknown")
+    return {"completed": completed, "custom": custom, "violations": violations,
+            "notes": notes, "notes_words": words}
+
+class ClassDashboard:
+    """
+    Přehled třídy nad složkou žákovských maturita_data.json.
+    Změněné soubory se čtou paralelně v procesech, souhrny se ukládají do DASHBOARD_CACHE
+    podle mtime a velikosti, takže opětovné otevření načte znovu jen to, co se změnilo.
+    """
+    def __init__(self, folder, cache_file: pathlib.Path = DASHBOARD_CACHE):
+        self.folder = pathlib.Path(folder).resolve()
+        self.cache_file = cache_file
+        self.summaries: Dict[str, dict] = {}
+        self.parsed = 0
+        self.reused = 0
+
+    def _load_cache(self) -> dict:
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache.get("version") == DASHBOARD_CACHE_VERSION and cache.get("rules") == rules_fingerprint():
+                return cache.get("files", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+
+    def _save_cache(self, cached: dict, current: dict):
+        # záznamy jiných složek zůstávají, záznamy této složky nahradí aktuální stav (smazané soubory zmizí)
+        prefix = str(self.folder) + os.sep
+        files = {k: v for k, v in cached.items() if not k.startswith(prefix)}
+        files.update(current)
+        data = {"version": DASHBOARD_CACHE_VERSION, "rules": rules_fingerprint(), "files": files}
+        tmp = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            traceback.print_exc()
+
+    @staticmethod
+    def _summarize(paths: List[str], workers: Optional[int] = None):
+        if len(paths) <= DASHBOARD_INLINE:
+            for p in paths:
+                yield p, summarize_student(p)
+            return
+        workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+        # spawn: fork vedle běžících vláken Qt není bezpečný a na Windows jiná možnost není
+        ctx = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+        try:
+            chunk = max(1, len(paths) // (workers * 4))
+            yield from zip(paths, pool.map(summarize_student, paths, chunksize=chunk))
+        finally:
+            # při přerušení nečekat na zbytek fronty
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def refresh(self, workers: Optional[int] = None, progress=None, cancelled=None) -> dict:
+        """
+        Načte změněné soubory (progress(i, n) po každém) a vrátí stats().
+        Při cancelled() se skončí dřív; už načtené souhrny se do cache uloží i tak.
+        """
+        cached = self._load_cache()
+        current: Dict[str, dict] = {}
+        stale: List[str] = []
+        for path in iter_student_files(self.folder):
+            key = str(path)
+            stamp = student_file_stamp(path)
+            hit = cached.get(key)
+            if hit and hit.get("stamp") == stamp and hit.get("summary") is not None:
+                current[key] = hit
+            else:
+                # razítko se bere před čtením: změna během čtení se projeví příště jako nové razítko
+                current[key] = {"stamp": stamp, "summary": None}
+                stale.append(key)
+        self.parsed, self.reused = len(stale), len(current) - len(stale)
+        if progress:
+            progress(0, len(stale))
+        results = self._summarize(stale, workers)
+        try:
+            for i, (key, summary) in enumerate(results, 1):
+                current[key]["summary"] = summary
+                if progress:
+                    progress(i, len(stale))
+                if cancelled is not None and cancelled():
+                    break
+        finally:
+            results.close()
+        current = {k: v for k, v in current.items() if v["summary"] is not None}
+        self._save_cache(cached, current)
+        self.summaries = {k: v["summary"] for k, v in sorted(current.items())}
+        return self.stats()
+
+    def stats(self) -> dict:
+        completed, chosen, violations = Counter(), Counter(), Counter()
+        notes_count, notes_chars = Counter(), Counter()
+        errors: List[Tuple[str, str]] = []
+        students = custom_lists = invalid_lists = words = 0
+        for path, s in self.summaries.items():
+            if s.get("error"):
+                errors.append((path, s["error"]))
+                continue
+            students += 1
+            completed.update(s["completed"])
+            if s["custom"] is not None:
+                custom_lists += 1
+                chosen.update(s["custom"])
+                if s["violations"]:
+                    invalid_lists += 1
+                    violations.update(s["violations"])
+            for bid, chars in s["notes"].items():
+                notes_count[bid] += 1
+                notes_chars[bid] += chars
+            words += s["notes_words"]
+        return {
+            "students": students, "errors": errors, "parsed": self.parsed, "reused": self.reused,
+            "custom_lists": custom_lists, "invalid_lists": invalid_lists,
+            "completed": completed, "chosen": chosen, "violations": violations,
+            "notes_count": notes_count, "notes_chars": notes_chars, "notes_words": words,
+        }
+
+    @staticmethod
+    def book_rows(stats: dict) -> List[dict]:
+        """Řádky po dílech (jen díla, se kterými někdo něco dělal), seřazené podle počtu výběrů a dokončení."""
+        n = stats["students"] or 1
+        ids = set(stats["completed"]) | set(stats["chosen"]) | set(stats["notes_count"])
+        rows = []
+        for bid in ids:
+            b = CATALOG.get(bid) or {}
+            rows.append({
+                "id": bid, "author": b.get("author", ""), "title": b.get("title", bid),
+                "completed": stats["completed"][bid], "completion_rate": stats["completed"][bid] / n,
+                "chosen": stats["chosen"][bid], "notes": stats["notes_count"][bid],
+                "notes_chars": stats["notes_chars"][bid],
+            })
+        rows.sort(key=lambda r: (-r["chosen"], -r["completed"], czech_key(r["title"])))
+        return rows
+
+
+# ---------- zálohy ----------
+# BACKUP_DIR/snapshots/<čas>.json je manifest jedné zálohy; obsah souborů leží jen jednou v BACKUP_DIR/objects
+# (celé soubory) a BACKUP_DIR/chunks (kousky JSON a databáze, zlib) a sdílí ho všechny zálohy
+BACKUP_DIR = pathlib.Path(os.environ.get("MATURITA_BACKUP_DIR") or BASE_DIR / "backups")
+BACKUP_INTERVAL = 3600.0     # s – jak často zálohuje běžící okno
+AUTO_BACKUP = os.environ.get("MATURITA_BACKUP") != "0"   # MATURITA_BACKUP=0 vypne zálohování z okna
+BACKUP_KEEP_HOURLY = 24      # z posledních tolika hodin zůstane nejnovější záloha každé hodiny
+BACKUP_KEEP_DAILY = 14       # ... z posledních tolika dní každého dne
+BACKUP_KEEP_WEEKLY = 8       # ... z posledních tolika týdnů každého týdne
+BACKUP_CHUNK_MIN = 16 << 10
+BACKUP_CHUNK_MAX = 1 << 20
+BACKUP_CHUNK_MASK = 0x1FF    # kousek JSON končí za řádkem s crc32 & maska == 0 (v průměru každý 512. řádek)
+BACKUP_PAGE_CHUNK = 64 << 10 # databáze se dělí po pevných kouscích (násobek stránky SQLite)
+BACKUP_CHUNKED = (".json", ".journal", ".jsonl")
+# mezipaměti, které se dají kdykoli spočítat znovu, a pomocné soubory se nezálohují
+BACKUP_SKIP_DIRS = {"backups", "attachment_text"}
+BACKUP_SKIP_FILES = {"attachment_scan.json", "dashboard_cache.json", "trace.jsonl"}
+BACKUP_SKIP_SUFFIXES = (".lock", ".tmp", "-wal", "-shm", "-journal")
+BACKUP_SQLITE = (".sqlite3", ".sqlite", ".db")
+
+def _backup_stamp(path: str) -> Optional[list]:
+    stamp = _file_stamp(path)
+    if stamp is None:
+        return None
+    stamp = list(stamp)
+    if path.endswith(BACKUP_SQLITE):
+        # změny databáze v režimu WAL leží do checkpointu jen v -wal; seznam, ne n-tice, jinak
+        # se razítko po průchodu JSON manifestem nikdy nerovná a databáze se čte pokaždé znovu
+        wal = _file_stamp(path + "-wal")
+        stamp.append(list(wal) if wal is not None else None)
+    return stamp
+
+def _iter_backup_files(base_dir: pathlib.Path, backup_dir: pathlib.Path):
+    """(relativní cesta s '/', plná cesta) všech zálohovaných souborů v base_dir."""
+    skip = os.path.abspath(backup_dir)
+    stack = [(str(base_dir), "")]
+    while stack:
+        folder, prefix = stack.pop()
+        try:
+            it = os.scandir(folder)
+        except FileNotFoundError:
+            continue
+        with it:
+            for de in it:
+                rel = prefix + de.name
+                if de.is_dir(follow_symlinks=False):
+                    if not (not prefix and de.name in BACKUP_SKIP_DIRS) and os.path.abspath(de.path) != skip:
+                        stack.append((de.path, rel + "/"))
+                elif de.is_file(follow_symlinks=False):
+                    if (not prefix and de.name in BACKUP_SKIP_FILES) or de.name.endswith(BACKUP_SKIP_SUFFIXES):
+                        continue
+                    yield rel, de.path
+
+def _json_chunks(data: bytes):
+    """
+    Kousky podle obsahu: hranice je za řádkem, jehož crc32 vyjde na masku. Změna jedné položky
+    tak změní jen kousek (dva) kolem ní, i když se zbytek souboru posune.
+    """
+    start = pos = 0
+    n = len(data)
+    while pos < n:
+        end = data.find(b"\n", pos)
+        end = n if end < 0 else end + 1
+        size = end - start
+        if size >= BACKUP_CHUNK_MAX or (size >= BACKUP_CHUNK_MIN and not zlib.crc32(data[pos:end]) & BACKUP_CHUNK_MASK):
+            yield data[start:end]
+            start = end
+        pos = end
+    if start < n:
+        yield data[start:]
+
+def _object_path(folder: pathlib.Path, digest: str) -> pathlib.Path:
+    return folder / digest[:2] / digest
+
+def _put_chunk(chunks_dir: pathlib.Path, chunk: bytes) -> Tuple[str, int]:
+    digest = hashlib.sha256(chunk).hexdigest()
+    path = _object_path(chunks_dir, digest)
+    if path.exists():
+        return digest, 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(zlib.compress(chunk, 6))
+    os.replace(tmp, path)
+    return digest, len(chunk)
+
+def _put_file(objects_dir: pathlib.Path, path: str) -> Tuple[str, int]:
+    """Celý soubor jako objekt podle sha256; blob, jehož obsah už v záloze je, se ani nečte."""
+    expected = _blob_expected(path)
+    if expected and _object_path(objects_dir, expected).exists():
+        return expected, 0
+    objects_dir.mkdir(parents=True, exist_ok=True)
+    tmp = objects_dir / f"incoming-{uuid.uuid4().hex}.tmp"
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "rb") as src, open(tmp, "wb") as dst:
+            for block in iter(lambda: src.read(HASH_CHUNK), b""):
+                h.update(block)
+                dst.write(block)
+                size += len(block)
+        digest = h.hexdigest()
+        final = _object_path(objects_dir, digest)
+        if final.exists():
+            return digest, 0
+        final.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, final)
+        return digest, size
+    finally:
+        if tmp.exists():
+            os.remove(tmp)
+
+def _sqlite_bytes(path: str) -> bytes:
+    # konzistentní obraz i za běhu okna: záloha přes SQLite do paměti, ne kopie souboru
+    src = sqlite3.connect(f"file:{pathlib.Path(path).as_posix()}?mode=ro", uri=True)
+    mem = sqlite3.connect(":memory:")
+    try:
+        src.backup(mem)
+        return mem.serialize()
+    finally:
+        src.close()
+        mem.close()
+
+def _backup_names(backup_dir: pathlib.Path) -> List[str]:
+    try:
+        return sorted(p.name[:-5] for p in (backup_dir / "snapshots").glob("*.json"))
+    except OSError:
+        return []
+
+def _backup_time(name: str) -> float:
+    return time.mktime(time.strptime(name[:15], "%Y%m%d-%H%M%S"))
+
+def read_backup(name: str, backup_dir: pathlib.Path = BACKUP_DIR) -> dict:
+    with open(backup_dir / "snapshots" / f"{name}.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def list_backups(backup_dir: pathlib.Path = BACKUP_DIR) -> List[dict]:
+    """Zálohy od nejnovější: name, time, reason, files, size (bez obsahu manifestu)."""
+    out = []
+    for name in reversed(_backup_names(backup_dir)):
+        try:
+            m = read_backup(name, backup_dir)
+        except (OSError, ValueError):
+            continue
+        out.append({"name": name, "time": m.get("time"), "reason": m.get("reason", ""),
+                    "files": len(m.get("files", {})), "size": m.get("size", 0)})
+    return out
+
+def backup_due(backup_dir: pathlib.Path = BACKUP_DIR, interval: float = BACKUP_INTERVAL,
+               now: Optional[float] = None) -> bool:
+    names = _backup_names(backup_dir)
+    now = time.time() if now is None else now
+    return not names or now - _backup_time(names[-1]) >= interval
+
+def create_backup(base_dir: pathlib.Path = BASE_DIR, backup_dir: pathlib.Path = BACKUP_DIR,
+                  now: Optional[float] = None, reason: str = "", prune: bool = True, cancelled=None) -> dict:
+    """
+    Záloha base_dir. Soubor se stejným razítkem (mtime, velikost, inode) jako v poslední záloze
+    se nečte vůbec, jen se převezmou jeho odkazy; nový obsah se uloží jednou pro všechny zálohy.
+    Když se nic nezměnilo, nový manifest nevznikne (vrátí se unchanged=True a jméno poslední).
+    Stav okna (snapshot + žurnál) se čte pod data_lock, aby k sobě patřily.
+    """
+    started = time.perf_counter()
+    now = time.time() if now is None else now
+    objects_dir, chunks_dir = backup_dir / "objects", backup_dir / "chunks"
+    with file_lock(backup_dir / "backup.lock"):
+        names = _backup_names(backup_dir)
+        prev = read_backup(names[-1], backup_dir)["files"] if names else {}
+        files: Dict[str, dict] = {}
+        stats = {"new_bytes": 0, "reused": 0, "read": 0}
+
+        def add(rel: str, path: str):
+            stamp = _backup_stamp(path)
+            if stamp is None:
+                return    # mezitím smazaný
+            old = prev.get(rel)
+            if old is not None and old.get("stamp") == stamp:
+                files[rel] = old
+                stats["reused"] += 1
+                return
+            stats["read"] += 1
+            if path.endswith(BACKUP_SQLITE):
+                data = _sqlite_bytes(path)
+                parts = [data[i:i + BACKUP_PAGE_CHUNK] for i in range(0, len(data), BACKUP_PAGE_CHUNK)]
+            elif path.endswith(BACKUP_CHUNKED):
+                with open(path, "rb") as f:
+                    data = f.read()
+                parts = _json_chunks(data)
+            else:
+                digest, new = _put_file(objects_dir, path)
+                stats["new_bytes"] += new
+                files[rel] = {"stamp": stamp, "size": stamp[1], "obj": digest}
+                return
+            refs = []
+            for part in parts:
+                digest, new = _put_chunk(chunks_dir, part)
+                stats["new_bytes"] += new
+                refs.append(digest)
+            files[rel] = {"stamp": stamp, "size": len(data), "chunks": refs}
+
+        data_file = base_dir / DATA_FILE.name
+        state_files = {data_file.name, journal_file_for(data_file).name}
+        for rel, path in _iter_backup_files(base_dir, backup_dir):
+            if cancelled is not None and cancelled():
+                return {"cancelled": True}
+            if rel not in state_files:
+                add(rel, path)
+        with data_lock(data_file):
+            for rel in sorted(state_files):
+                add(rel, str(base_dir / rel))
+
+        result = {"files": len(files), "size": sum(f["size"] for f in files.values()), "cancelled": False,
+                  "unchanged": bool(names) and files == prev, "pruned": 0, **stats}
+        if result["unchanged"]:
+            result["name"] = names[-1]
+        else:
+            name = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+            suffix = 1
+            while name in names:
+                suffix += 1
+                name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{suffix}"
+            manifest = {"version": 1, "time": now, "reason": reason, "size": result["size"], "files": files}
+            path = backup_dir / "snapshots" / f"{name}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            result["name"] = name
+            if prune:
+                result["pruned"] = prune_backups(backup_dir, now)
+        result["ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+def retained_backups(names: List[str], now: float) -> set:
+    """
+    Které zálohy ponechat: vždy nejnovější, pak nejnovější z každé z posledních BACKUP_KEEP_HOURLY
+    hodin, BACKUP_KEEP_DAILY dní a BACKUP_KEEP_WEEKLY týdnů (kalendářních, týden od pondělí).
+    """
+    keep = set(names[-1:])
+    for count, bucket in ((BACKUP_KEEP_HOURLY, lambda t: int(t // 3600)),
+                          (BACKUP_KEEP_DAILY, lambda t: _local_ordinal(t)),
+                          (BACKUP_KEEP_WEEKLY, lambda t: (_local_ordinal(t) - 1) // 7)):
+        current = bucket(now)
+        newest: Dict[int, str] = {}
+        for name in names:    # seřazeno od nejstarší, takže vyhraje nejnovější v kbelíku
+            b = bucket(_backup_time(name))
+            if current - b < count:
+                newest[b] = name
+        keep.update(newest.values())
+    return keep
+
+def _local_ordinal(t: float) -> int:
+    lt = time.localtime(t)
+    return datetime.date(lt.tm_year, lt.tm_mon, lt.tm_mday).toordinal()
+
+def prune_backups(backup_dir: pathlib.Path = BACKUP_DIR, now: Optional[float] = None) -> int:
+    """Smaže zálohy mimo retained_backups a pak objekty, na které už žádná neodkazuje. Vrací počet smazaných."""
+    now = time.time() if now is None else now
+    with file_lock(backup_dir / "backup.lock"):
+        names = _backup_names(backup_dir)
+        keep = retained_backups(names, now)
+        dropped = [n for n in names if n not in keep]
+        if not dropped:
+            return 0
+        for name in dropped:
+            os.remove(backup_dir / "snapshots" / f"{name}.json")
+        used = set()
+        for name in keep:
+            for f in read_backup(name, backup_dir)["files"].values():
+                if "obj" in f:
+                    used.add(f["obj"])
+                used.update(f.get("chunks", ()))
+        for sub in ("objects", "chunks"):
+            for de in iter_attachment_files(backup_dir / sub):
+                if de.name not in used and not de.name.endswith(".tmp"):
+                    os.remove(de.path)
+        return len(dropped)
+
+def _restore_file(backup_dir: pathlib.Path, entry: dict, target: pathlib.Path):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, "wb") as f:
+        if "obj" in entry:
+            with open(_object_path(backup_dir / "objects", entry["obj"]), "rb") as src:
+                shutil.copyfileobj(src, f, HASH_CHUNK)
+        else:
+            for digest in entry["chunks"]:
+                with open(_object_path(backup_dir / "chunks", digest), "rb") as src:
+                    f.write(zlib.decompress(src.read()))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, target)
+
+def restore_backup(name: str, base_dir: pathlib.Path = BASE_DIR, backup_dir: pathlib.Path = BACKUP_DIR) -> dict:
+    """
+    Vrátí base_dir do stavu zálohy name. Nejdřív zálohuje současný stav (jde tedy vrátit zpět),
+    pak přepíše jen soubory, jejichž obsah se od zálohy liší, a smaže zálohované soubory, které
+    v ní nebyly. Běžící okno nad JSON daty si obnovený snapshot načte samo; databázi SQLite
+    obnovujte se zavřenou aplikací.
+    """
+    with file_lock(backup_dir / "backup.lock"):
+        wanted = read_backup(name, backup_dir)["files"]
+        safety = create_backup(base_dir, backup_dir, reason=f"před obnovou {name}", prune=False)
+        current = read_backup(safety["name"], backup_dir)["files"]
+        written = removed = 0
+        data_file = base_dir / DATA_FILE.name
+        with data_lock(data_file):
+            # snapshot stavu až nakonec: kdo ho znovu načte, najde už k němu patřící žurnál
+            for rel in sorted(wanted, key=lambda r: r == data_file.name):
+                entry, cur = wanted[rel], current.get(rel)
+                if cur is not None and cur.get("obj") == entry.get("obj") and cur.get("chunks") == entry.get("chunks"):
+                    continue
+                _restore_file(backup_dir, entry, base_dir / rel)
+                if rel.endswith(BACKUP_SQLITE):
+                    for suffix in ("-wal", "-shm"):
+                        try:
+                            os.remove(base_dir / (rel + suffix))
+                        except FileNotFoundError:
+                            pass
+                written += 1
+            for rel in current:
+                if rel not in wanted:
+                    try:
+                        os.remove(base_dir / rel)
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+        return {"name": name, "written": written, "removed": removed, "safety": safety["name"]}
@@ -0,0 +1,20 @@
+"""
+Testy logiky aplikace (maturita_core) a okna (maturita). Moduly čtou cesty z prostředí už při importu,
+proto se APPDATA přesměruje do dočasné složky dřív, než je kterýkoli test načte.
+Testy okna běží bez displeje (QT_QPA_PLATFORM=offscreen).
+"""
+import os
+import pathlib
+import sys
+import tempfile
+
+_APPDATA = tempfile.mkdtemp(prefix="maturita_tests_")
+os.environ["APPDATA"] = _APPDATA
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ["MATURITA_BACKUP"] = "0"
+os.environ.pop("MATURITA_SQLITE", None)
+os.environ.pop("MATURITA_CATALOG", None)
+os.environ.pop("MATURITA_BACKUP_DIR", None)
+os.environ.pop("MATURITA_TRACE", None)
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "app"))
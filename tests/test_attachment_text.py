@@ -0,0 +1,99 @@
+import zipfile
+
+import pytest
+
+import maturita_core as core
+
+DOCX_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+def write_docx(path, paragraphs):
+    body = "".join("<w:p>" + "".join(f"<w:r><w:t>{run}</w:t></w:r>" for run in runs) + "</w:p>"
+                   for runs in paragraphs)
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("word/document.xml", f'<w:document xmlns:w="{DOCX_NS}"><w:body>{body}</w:body></w:document>')
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        return self.text
+
+class FakePdfReader:
+    def __init__(self, path):
+        self.pages = [FakePage("strana 1"), FakePage("strana 2")]
+
+@pytest.fixture(autouse=True)
+def text_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "TEXT_CACHE_DIR", tmp_path / "attachment_text")
+    return core.TEXT_CACHE_DIR
+
+@pytest.fixture
+def extractions(monkeypatch):
+    calls = []
+    extract = core.extract_text
+    def counting(path):
+        calls.append(path.name)
+        return extract(path)
+    monkeypatch.setattr(core, "extract_text", counting)
+    return calls
+
+def test_decode_text_falls_back_to_cp1250():
+    text = "Žluťoučký kůň úpěl ďábelské ódy"
+    assert core._decode_text(text.encode("utf-8")) == text
+    assert core._decode_text(b"\xef\xbb\xbf" + text.encode("utf-8")) == text
+    assert core._decode_text(text.encode("cp1250")) == text
+
+def test_docx_text_joins_runs_per_paragraph(tmp_path):
+    path = tmp_path / "rozbor.docx"
+    write_docx(path, [["Máj", " – ", "Mácha"], [], ["Druhý odstavec"]])
+    assert core._docx_text(path) == "Máj – Mácha\n\nDruhý odstavec"
+
+def test_extract_text_by_suffix(tmp_path, monkeypatch, capsys):
+    txt = tmp_path / "stara.TXT"
+    txt.write_bytes("Čtenářský deník".encode("cp1250"))
+    assert core.extract_text(txt) == "Čtenářský deník"
+    docx = tmp_path / "rozbor.docx"
+    write_docx(docx, [["obsah"]])
+    assert core.extract_text(docx) == "obsah"
+    image = tmp_path / "obalka.png"
+    image.write_bytes(b"\x89PNG")
+    assert core.extract_text(image) == ""
+    broken = tmp_path / "poskozeny.docx"
+    broken.write_bytes(b"neni zip")
+    assert core.extract_text(broken) == ""
+    capsys.readouterr()
+    pdf = tmp_path / "kniha.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    monkeypatch.setattr(core, "PdfReader", None)
+    assert core.extract_text(pdf) is None
+    monkeypatch.setattr(core, "PdfReader", FakePdfReader)
+    assert core.extract_text(pdf) == "strana 1\nstrana 2"
+
+def test_cache_is_per_content_hash(tmp_path, text_cache, extractions):
+    first = tmp_path / "a.txt"
+    first.write_text("stejný obsah", encoding="utf-8")
+    copy = tmp_path / "b.md"
+    copy.write_text("stejný obsah", encoding="utf-8")
+    digest, text = core.cached_attachment_text(first)
+    assert text == "stejný obsah" and (text_cache / f"{digest}.txt").exists()
+    # stejný obsah pod jiným jménem se už nečte
+    assert core.cached_attachment_text(copy) == (digest, "stejný obsah")
+    assert extractions == ["a.txt"]
+    other = tmp_path / "c.txt"
+    other.write_text("jiný obsah", encoding="utf-8")
+    other_digest, text = core.cached_attachment_text(other, core.file_digest(other))
+    assert other_digest != digest and text == "jiný obsah"
+    assert extractions == ["a.txt", "c.txt"]
+
+def test_pdf_without_pypdf_is_left_uncached(tmp_path, monkeypatch, text_cache, extractions):
+    pdf = tmp_path / "kniha.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    monkeypatch.setattr(core, "PdfReader", None)
+    digest, text = core.cached_attachment_text(pdf)
+    assert text is None and not (text_cache / f"{digest}.txt").exists()
+    # po doinstalování pypdf se text vytáhne a uloží
+    monkeypatch.setattr(core, "PdfReader", FakePdfReader)
+    assert core.cached_attachment_text(pdf) == (digest, "strana 1\nstrana 2")
+    assert core.cached_attachment_text(pdf) == (digest, "strana 1\nstrana 2")
+    assert extractions == ["kniha.pdf", "kniha.pdf"]
@@ -0,0 +1,53 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+import maturita_core as core
+
+@pytest.fixture
+def source(tmp_path):
+    def make(name: str, data: bytes):
+        path = tmp_path / name
+        path.write_bytes(data)
+        return str(path)
+    return make
+
+def test_same_content_is_stored_once(source):
+    data = f"obsah {time.time_ns()}".encode()
+    a = core.store_attachment(source("rozbor.TXT", data))
+    b = core.store_attachment(source("kopie.txt", data))
+    assert a == {"name": "rozbor.TXT", "blob": hashlib.sha256(data).hexdigest() + ".txt"}
+    assert b["blob"] == a["blob"] and b["name"] == "kopie.txt"
+    path = core.attachment_path(a)
+    assert path.read_bytes() == data and core.attachment_digest(a) == a["blob"][:64]
+    assert sorted(os.listdir(path.parent)) == [a["blob"]]
+
+def test_scan_finds_missing_corrupt_and_orphans(source, tmp_path):
+    good = core.store_attachment(source("dobrá.txt", f"dobrá {time.time_ns()}".encode()))
+    bad = core.store_attachment(source("zlá.txt", f"zlá {time.time_ns()}".encode()))
+    orphan = core.store_attachment(source("sirotek.txt", f"sirotek {time.time_ns()}".encode()))
+    gone = {"name": "smazaná.txt", "blob": "0" * 64 + ".txt"}
+    bad_path = core.attachment_path(bad)
+    os.remove(bad_path)      # nový soubor místo přepisu na místě (blob může být hardlink zdroje)
+    bad_path.write_bytes(b"poskozeno")
+    old = time.time() - core.ATTACH_SCAN_GRACE - 60
+    os.utime(core.attachment_path(orphan), (old, old))
+    entries = {"a": {"completed": False, "notes": "", "attachments": [good, bad, gone]}}
+    refs = core.attachment_refs(entries)
+    cache = tmp_path / "scan.json"
+
+    report = core.scan_attachments(refs, cache_file=cache)
+    orphans = [path for path, _ in report["orphans"]]
+    assert str(core.attachment_path(orphan)) in orphans
+    assert str(core.attachment_path(good)) not in orphans
+    assert [att for _, att, _ in report["missing"]] == [gone]
+    assert str(bad_path) in report["corrupt"] and str(core.attachment_path(good)) not in report["corrupt"]
+
+    again = core.scan_attachments(refs, cache_file=cache)
+    assert again["hashed"] == 0 and again["corrupt"] == report["corrupt"]
+
+    removed, freed, errors = core.remove_attachment_files(orphans + [str(core.attachment_path(good))], refs)
+    assert not errors and removed == len(orphans) and freed > 0
+    assert not core.attachment_path(orphan).exists() and core.attachment_path(good).exists()
@@ -0,0 +1,63 @@
+import pytest
+
+import maturita_core as core
+
+@pytest.fixture
+def dirs(tmp_path):
+    base = tmp_path / "MaturitaApp"
+    base.mkdir()
+    return base, tmp_path / "backups"
+
+def test_second_backup_of_unchanged_json_is_noop(dirs):
+    base, backups = dirs
+    core.save_state({"a": core.new_entry()}, None, data_file=base / core.DATA_FILE.name)
+    (base / "attachments").mkdir()
+    (base / "attachments" / "x.txt").write_bytes(b"obsah")
+    first = core.create_backup(base, backups, now=1_700_000_000)
+    assert not first["unchanged"] and first["read"] == 3
+    second = core.create_backup(base, backups, now=1_700_000_060)
+    assert second["unchanged"] and second["name"] == first["name"]
+    assert second["read"] == 0 and second["new_bytes"] == 0
+    assert len(core.list_backups(backups)) == 1
+
+def test_second_backup_of_open_sqlite_store_is_noop(dirs):
+    base, backups = dirs
+    store = core.SqliteStore(base / core.DB_FILE.name)
+    try:
+        entry = core.new_entry()
+        entry["notes"] = "poznámka"
+        store.write({"a": entry})
+        first = core.create_backup(base, backups, now=1_700_000_000)
+        assert not first["unchanged"]
+        second = core.create_backup(base, backups, now=1_700_000_060)
+        assert second["unchanged"] and second["read"] == 0
+        store.write({"b": core.new_entry()})
+        third = core.create_backup(base, backups, now=1_700_000_120)
+        assert not third["unchanged"] and third["read"] == 1
+    finally:
+        store.close()
+
+def test_backup_then_restore(dirs):
+    base, backups = dirs
+    data_file = base / core.DATA_FILE.name
+    entry = core.new_entry()
+    entry["notes"] = "původní\n" * 5000
+    core.save_state({"a": entry}, ["a"], data_file=data_file)
+    (base / "poznamka.txt").write_text("první", encoding="utf-8")
+    saved = core.create_backup(base, backups, now=1_700_000_000)
+
+    entry["notes"] = "přepsané"
+    core.save_state({"a": entry, "b": core.new_entry()}, None, data_file=data_file)
+    (base / "poznamka.txt").unlink()
+    (base / "novy.txt").write_text("navíc", encoding="utf-8")
+    core.create_backup(base, backups, now=1_700_003_600)    # jiná hodina, retence první nezahodí
+
+    r = core.restore_backup(saved["name"], base, backups)
+    assert r["written"] >= 2 and r["removed"] == 1
+    entries, custom = core.read_state(data_file)
+    assert entries["a"]["notes"] == "původní\n" * 5000 and "b" not in entries and custom == ["a"]
+    assert (base / "poznamka.txt").read_text(encoding="utf-8") == "první"
+    assert not (base / "novy.txt").exists()
+    # stav před obnovou zůstal v bezpečnostní záloze
+    safety = core.read_backup(r["safety"], backups)
+    assert "novy.txt" in safety["files"]
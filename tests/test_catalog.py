@@ -0,0 +1,176 @@
+import io
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+import maturita_core as core
+
+RAW = {"author": "Karel Čapek", "title": "R.U.R.", "genre": "Drama", "section": "Česká literatura 20. a 21. stol."}
+OTHER = {"author": "Ota Pavel", "title": "Smrt krásných srnců", "genre": "Próza",
+         "section": "Česká literatura 20. a 21. stol."}
+
+@pytest.fixture(autouse=True)
+def warnings():
+    del core.CATALOG_WARNINGS[:]
+    yield core.CATALOG_WARNINGS
+    del core.CATALOG_WARNINGS[:]
+
+def load(path, text):
+    path.write_text(text, encoding="utf-8")
+    return core.load_books(path, core.RULES)
+
+def test_book_reads_like_dict():
+    book = core.Book.of(RAW)
+    assert book["section"] == RAW["section"] and book.get("genre") == "Drama"
+    assert book.get("year") is None and book.get("year", 0) == 0
+    assert dict(book) == RAW and dict(book.items()) == RAW and list(book.keys()) == list(core.BOOK_FIELDS)
+    assert book == RAW and book == core.Book.of(dict(RAW)) and book != dict(RAW, title="Jiné")
+    assert "author" in book and "bid" not in book and len(book) == 4
+    with pytest.raises(KeyError):
+        book["bid"]
+    with pytest.raises(TypeError):
+        hash(book)
+    assert core.Book.of(book) is book
+
+def test_book_codes_and_interning_are_shared():
+    a = core.Book("Autor", "Jedna", "Próza", "Oddíl testu")
+    b = core.Book(json.loads('"Autor"'), "Dvě", "Próza", "Oddíl testu")
+    assert (a.genre_code, a.section_code) == (b.genre_code, b.section_code)
+    assert a.author is b.author and a.section is b.section
+    assert not hasattr(a, "__dict__")
+    assert sys.getsizeof(a) < sys.getsizeof(dict(RAW))
+
+def test_registry_ids_match_make_id():
+    books = [core.Book.of(RAW), {"author": "Ota Pavel", "title": "Smrt krásných srnců", "genre": "Próza",
+                                 "section": "Česká literatura 20. a 21. stol."}, dict(RAW)]
+    reg = core.BookRegistry(books)
+    assert len(reg) == 2    # stejné dílo dvakrát -> platí první výskyt
+    for raw in books:
+        bid = core.make_id(raw)
+        assert bid in reg and reg.get(bid) == raw
+        assert reg.id_of(reg.get(bid)) == bid
+        assert reg.id_of(dict(raw)) == bid     # dict mimo katalog -> make_id
+    assert reg.resolve([core.make_id(RAW), "neznámé", dict(RAW)]) == [RAW, RAW]
+
+def test_builtin_catalog_is_books():
+    assert all(isinstance(b, core.Book) for b in core.BOOKS + core.ORIGINAL_20)
+    assert all(core.CATALOG.get(core.CATALOG.id_of(b)) == b for b in core.ORIGINAL_20)
+
+def test_rule_tally_same_for_books_and_dicts():
+    by_book, by_dict = core.RuleTally(), core.RuleTally()
+    for b in core.ORIGINAL_20:
+        by_book.add(b)
+        by_dict.add(dict(b))
+    assert by_book.report() == by_dict.report() and by_book.is_valid()
+    by_book.remove(core.ORIGINAL_20[0])
+    assert not by_book.total_ok()
+
+@pytest.mark.parametrize("suffix", [".json", ".jsonl", ".csv"])
+def test_load_books_skips_invalid_records(tmp_path, suffix, warnings):
+    rows = [RAW, dict(RAW, genre="drama"), dict(RAW, title="Bílá nemoc"), dict(RAW, genre="Román"),
+            dict(RAW, section="Neznámý oddíl"), dict(RAW, author="")]
+    if suffix == ".json":
+        text = json.dumps({"books": rows}, ensure_ascii=False)
+    elif suffix == ".jsonl":
+        text = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+    else:
+        lines = [";".join(core.BOOK_FIELDS)] + [";".join(r[k] for k in core.BOOK_FIELDS) for r in rows]
+        text = "\n".join(lines) + "\n"
+    books = load(tmp_path / f"books{suffix}", text)
+    assert books == [RAW, dict(RAW, title="Bílá nemoc")]
+    assert all(isinstance(b, core.Book) for b in books)
+    assert len(warnings) == 3
+
+@pytest.mark.parametrize("delim", [";", ","])
+def test_csv_delimiter_and_quoted_separators(tmp_path, delim):
+    quoted = dict(OTHER, title=f"Saturnin{delim} román")
+    lines = [delim.join(core.BOOK_FIELDS), delim.join(RAW[k] for k in core.BOOK_FIELDS),
+             delim.join(f'"{quoted[k]}"' for k in core.BOOK_FIELDS)]
+    # BOM a CRLF z Excelu
+    text = "\ufeff" + "\r\n".join(lines) + "\r\n"
+    assert load(tmp_path / "books.csv", text) == [RAW, quoted]
+
+def test_jsonl_reports_bad_lines(tmp_path, warnings):
+    text = json.dumps(RAW, ensure_ascii=False) + "\n\n{nedopsáno\n[1, 2]\n" + json.dumps(OTHER, ensure_ascii=False)
+    assert load(tmp_path / "books.jsonl", text) == [RAW, OTHER]
+    assert [w.split(":")[1] for w in warnings] == ["3", "4"]
+
+def test_bare_json_array(tmp_path):
+    assert load(tmp_path / "books.json", json.dumps([RAW, OTHER], ensure_ascii=False, indent=2)) == [RAW, OTHER]
+    # prvky delší než čtený blok
+    rows = [dict(RAW, title=f"Dílo {i}", author="x" * 5000) for i in range(40)]
+    path = tmp_path / "velky.json"
+    path.write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+    with open(path, "r", encoding="utf-8") as f:
+        assert list(core._iter_json_array(f, chunk=1000)) == rows
+
+def test_books_key_after_other_keys(tmp_path):
+    text = json.dumps({"version": 2, "source": "seznam školy", "books": [RAW, OTHER]}, ensure_ascii=False)
+    assert load(tmp_path / "books.json", text) == [RAW, OTHER]
+
+def json_items(text, chunk=7):
+    return list(core._iter_json_array(io.StringIO(text), chunk=chunk))
+
+@pytest.mark.parametrize("text", [
+    '{"meta": {"books": 5}, "books": [1, 2]}',
+    '{"meta": {"books": [3]}, "note": "\\"books\\": [4]", "books": [1, 2]}',
+    '{"books": [1, 2], "meta": {"books": [3]}}',
+    ' \ufeff{ "version" : 2 , "books" : [ 1 ,\n 2 ] }',
+])
+def test_books_key_only_at_top_level(text):
+    assert json_items(text) == [1, 2]
+    assert json_items(text, chunk=1 << 16) == [1, 2]
+
+@pytest.mark.parametrize("text", ['{"meta": {"books": [1, 2]}}', '{"books_old": [1]}', '{}', '{"a": 1 "books": [1]}'])
+def test_missing_top_level_books_key(text):
+    with pytest.raises(core.CatalogError):
+        json_items(text)
+
+@pytest.mark.parametrize("text", ["[,1]", "[1,,2]", "[1,]", "[1 2]", "[1, 2", "[", ""])
+def test_malformed_array(text):
+    with pytest.raises(core.CatalogError):
+        json_items(text)
+
+@pytest.mark.parametrize("text", ["[]", " [ ] ", '{"books": []}'])
+def test_empty_array(text):
+    assert json_items(text) == []
+
+def test_duplicate_id_keeps_first(tmp_path):
+    rows = [RAW, OTHER, dict(RAW, genre="Próza", section="Světová literatura 20. a 21. stol.")]
+    assert load(tmp_path / "books.json", json.dumps(rows, ensure_ascii=False)) == [RAW, OTHER]
+
+def test_catalog_dirs_order(tmp_path):
+    env = dict(os.environ, APPDATA=str(tmp_path), MATURITA_CATALOG=str(tmp_path / "vlastni"))
+    code = "import maturita_core; print('\\n'.join(map(str, maturita_core.CATALOG_DIRS)))"
+    out = subprocess.run([sys.executable, "-c", code], env=env, cwd=pathlib.Path(core.__file__).parent,
+                         capture_output=True, text=True, check=True).stdout.split()
+    assert out == [str(tmp_path / "vlastni"), str(tmp_path / "MaturitaApp" / "katalog"),
+                   str(core.RESOURCE_DIR / "katalog")]
+
+def test_first_directory_with_catalog_file_wins(tmp_path, monkeypatch):
+    dirs = [tmp_path / name for name in ("vlastni", "data", "aplikace")]
+    for d in dirs:
+        d.mkdir()
+    monkeypatch.setattr(core, "CATALOG_DIRS", dirs)
+    assert core._find_catalog_file("books") is None
+    (dirs[2] / "books.json").write_text("[]", encoding="utf-8")
+    assert core._find_catalog_file("books") == dirs[2] / "books.json"
+    (dirs[1] / "books.json").write_text("[]", encoding="utf-8")
+    (dirs[1] / "books.csv").write_text("", encoding="utf-8")
+    assert core._find_catalog_file("books") == dirs[1] / "books.csv"
+    (dirs[0] / "books.jsonl").write_text("", encoding="utf-8")
+    assert core._find_catalog_file("books") == dirs[0] / "books.jsonl"
+
+def test_load_catalog_replaces_builtin_lists(tmp_path, monkeypatch, warnings):
+    monkeypatch.setattr(core, "CATALOG_DIRS", [tmp_path])
+    rules = dict(core.RULES, total=2, section_counts={"Česká literatura 20. a 21. stol.": 1}, genre_min_each=0)
+    (tmp_path / "rules.json").write_text(json.dumps(rules, ensure_ascii=False), encoding="utf-8")
+    (tmp_path / "books.json").write_text(json.dumps([RAW, OTHER], ensure_ascii=False), encoding="utf-8")
+    (tmp_path / "original.csv").write_text("author;title\n", encoding="utf-8")
+    books, original, loaded = core.load_catalog(core.BOOKS, core.ORIGINAL_20, core.RULES)
+    assert books == [RAW, OTHER] and loaded == rules
+    assert original == core.ORIGINAL_20 and len(warnings) == 1
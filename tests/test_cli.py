@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import maturita_cli as cli
+import maturita_core as core
+
+BROKEN = '{"entries": {"a": {"notes": "x"'
+
+@pytest.fixture
+def broken(tmp_path):
+    path = tmp_path / "maturita_data.json"
+    path.write_text(BROKEN, encoding="utf-8")
+    return path
+
+@pytest.fixture
+def notes_dir(tmp_path):
+    folder = tmp_path / "notes"
+    folder.mkdir()
+    book = core.ORIGINAL_20[0]
+    (folder / f"{book['author']} - {book['title']}.md").write_text("poznámka\n", encoding="utf-8")
+    return folder
+
+def test_import_notes_keeps_corrupt_file(broken, notes_dir, capsys):
+    assert cli.main(["import-notes", str(notes_dir), "--data", str(broken)]) == 2
+    assert broken.read_text(encoding="utf-8") == BROKEN
+    assert "Nelze načíst" in capsys.readouterr().err
+
+@pytest.mark.parametrize("command", [["validate"], ["export", "--format", "jsonl"]])
+def test_read_error_is_not_empty_state(broken, command, capsys):
+    assert cli.main(command + ["--data", str(broken)]) != 0
+    assert "bez vlastního seznamu" not in capsys.readouterr().out
+
+def test_import_notes_creates_missing_file(tmp_path, notes_dir):
+    data = tmp_path / "novy.json"
+    assert cli.main(["import-notes", str(notes_dir), "--data", str(data)]) == 0
+    entries, custom = core.read_state(data)
+    assert custom is None
+    assert [e["notes"] for e in entries.values()] == ["poznámka\n"]
+
+def test_validate_saved_selection(tmp_path, capsys):
+    data = tmp_path / "maturita_data.json"
+    core.save_state({}, [core.CATALOG.id_of(b) for b in core.ORIGINAL_20], data_file=data)
+    assert cli.main(["validate", "--data", str(data)]) == 0
+    assert json.loads(data.read_text(encoding="utf-8"))["custom_selection"]
+    assert ": OK" in capsys.readouterr().out
@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+import maturita_core as core
+
+IDS = [core.CATALOG.id_of(b) for b in core.ORIGINAL_20]
+
+def entry(completed=False, notes=""):
+    e = core.new_entry()
+    e["completed"], e["notes"] = completed, notes
+    return e
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / "trida"
+    (root / "jan").mkdir(parents=True)
+    core.save_state({IDS[0]: entry(True, "dvě slova"), IDS[1]: entry(True)}, IDS,
+                    data_file=root / "jan" / "maturita_data.json")
+    core.save_state({IDS[0]: entry(True), IDS[1]: entry(notes="jen poznámka")}, IDS[:5],
+                    data_file=root / "eva.json")
+    # starý formát bez obálky a bez vlastního seznamu
+    (root / "petr.json").write_text(json.dumps({IDS[2]: entry(True)}), encoding="utf-8")
+    (root / "poskozeny.json").write_text('{"entries": {', encoding="utf-8")
+    (root / "poznamky.txt").write_text("není žákovský soubor", encoding="utf-8")
+    return root
+
+@pytest.fixture
+def dashboard(folder, tmp_path):
+    return lambda: core.ClassDashboard(folder, cache_file=tmp_path / "dashboard_cache.json")
+
+def touch(path):
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+def test_summary_aggregates_students(dashboard, folder):
+    stats = dashboard().refresh()
+    assert stats["students"] == 3 and stats["parsed"] == 4 and stats["reused"] == 0
+    assert [p for p, _ in stats["errors"]] == [str((folder / "poskozeny.json").resolve())]
+    assert stats["completed"] == {IDS[0]: 2, IDS[1]: 1, IDS[2]: 1}
+    assert stats["custom_lists"] == 2 and stats["invalid_lists"] == 1
+    assert stats["violations"]["total"] == 1 and stats["chosen"][IDS[0]] == 2 and stats["chosen"][IDS[5]] == 1
+    assert stats["notes_count"] == {IDS[0]: 1, IDS[1]: 1}
+    assert stats["notes_chars"][IDS[1]] == len("jen poznámka") and stats["notes_words"] == 4
+    rows = core.ClassDashboard.book_rows(stats)
+    assert rows[0]["id"] == IDS[0] and rows[0]["chosen"] == 2 and rows[0]["completion_rate"] == 2 / 3
+    assert len(rows) == len(IDS)
+
+def test_unreadable_files_are_reported_not_counted(dashboard, folder):
+    (folder / "pole.json").write_text("[1, 2]", encoding="utf-8")
+    stats = dashboard().refresh()
+    errors = dict(stats["errors"])
+    assert stats["students"] == 3 and len(errors) == 2
+    assert errors[str((folder / "poskozeny.json").resolve())].startswith("JSONDecodeError")
+    assert errors[str((folder / "pole.json").resolve())].startswith("ValueError")
+
+def test_cache_reuses_unchanged_files(dashboard, folder):
+    first = dashboard().refresh()
+    again = dashboard().refresh()
+    assert (again["parsed"], again["reused"]) == (0, 4)
+    assert again["completed"] == first["completed"] and again["errors"] == first["errors"]
+    # změněný snapshot jednoho žáka
+    core.save_state({IDS[3]: entry(True)}, None, data_file=folder / "eva.json")
+    stats = dashboard().refresh()
+    assert (stats["parsed"], stats["reused"]) == (1, 3)
+    assert stats["completed"] == {IDS[0]: 1, IDS[1]: 1, IDS[2]: 1, IDS[3]: 1} and stats["custom_lists"] == 1
+    # stejný obsah, jen novější mtime
+    touch(folder / "petr.json")
+    assert dashboard().refresh()["parsed"] == 1
+    # opravený poškozený soubor se načte znovu a chyba zmizí
+    core.save_state({}, None, data_file=folder / "poskozeny.json")
+    stats = dashboard().refresh()
+    assert stats["parsed"] == 1 and stats["errors"] == [] and stats["students"] == 4
+
+def test_cache_sees_journal_changes(dashboard, folder):
+    dashboard().refresh()
+    data_file = folder / "jan" / "maturita_data.json"
+    with open(core.journal_file_for(data_file), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": IDS[4], "entry": entry(True)}) + "\n")
+    stats = dashboard().refresh()
+    assert (stats["parsed"], stats["reused"]) == (1, 3)
+    assert stats["completed"][IDS[4]] == 1
+
+def test_removed_files_leave_the_summary(dashboard, folder):
+    dashboard().refresh()
+    (folder / "petr.json").unlink()
+    stats = dashboard().refresh()
+    assert (stats["parsed"], stats["reused"]) == (0, 3)
+    assert IDS[2] not in stats["completed"]
@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+import maturita_core as core
+
+def edits(seed=7, steps=120):
+    """Náhodné úpravy textu: vkládání, mazání, náhrada, občas celé smazání."""
+    rnd = random.Random(seed)
+    text = ""
+    out = []
+    for _ in range(steps):
+        pos = rnd.randint(0, len(text))
+        kind = rnd.random()
+        if kind < 0.5:
+            text = text[:pos] + "".join(rnd.choice("abcčř ě\n") for _ in range(rnd.randint(1, 30))) + text[pos:]
+        elif kind < 0.8:
+            text = text[:pos] + text[pos + rnd.randint(1, 20):]
+        elif kind < 0.97:
+            text = text[:pos] + "ž" * rnd.randint(0, 5) + text[pos + rnd.randint(0, 5):]
+        else:
+            text = ""
+        out.append(text)
+    return out
+
+@pytest.mark.parametrize("old,new", [
+    ("", ""), ("", "abc"), ("abc", ""), ("abc", "abc"), ("aa", "aaa"), ("aaa", "aa"),
+    ("ahoj světe", "ahoj krásný světe"), ("abcabc", "abc"), ("x" * 1000 + "y", "x" * 1000 + "z"),
+])
+def test_text_delta_cases(old, new):
+    pos, removed, inserted = core.text_delta(old, new)
+    assert core.apply_delta(old, pos, removed, inserted) == new
+    assert removed + len(inserted) <= max(len(old), len(new))
+
+def test_text_delta_is_minimal_single_replacement():
+    texts = edits()
+    for old, new in zip(texts, texts[1:]):
+        pos, removed, inserted = core.text_delta(old, new)
+        assert core.apply_delta(old, pos, removed, inserted) == new
+        prefix = 0
+        while prefix < min(len(old), len(new)) and old[prefix] == new[prefix]:
+            prefix += 1
+        assert pos == prefix
+
+def test_history_rebuilds_every_version(tmp_path):
+    texts = edits()
+    history = core.NotesHistory(tmp_path, interval=0, keyframe_every=8, max_versions=1000)
+    for i, text in enumerate(texts):
+        history.record("kniha", text, now=1000.0 + i)
+    stored = history.versions("kniha")
+    # prázdné verze za sebou se nezapisují, každá jiná ano
+    expected = [t for i, t in enumerate(texts) if i == 0 or t != texts[i - 1]]
+    assert [n for _, n in stored] == [len(t) for t in expected]
+    fresh = core.NotesHistory(tmp_path)
+    assert [fresh.text_at("kniha", i) for i in range(len(stored))] == expected
+
+def test_history_pending_change_and_big_drop(tmp_path):
+    history = core.NotesHistory(tmp_path, interval=60)
+    long_text = "věta poznámky. " * 40
+    history.record("b", "první", now=0)
+    history.record("b", long_text, now=10)        # v intervalu: jen čeká
+    assert len(history.versions("b")) == 1
+    history.record("b", "", now=20)               # smazání všeho: uloží se i text před ním
+    assert [history.text_at("b", i) for i in range(3)] == ["první", long_text, ""]
+    history.record("b", "znovu", now=30)
+    history.checkpoint()
+    assert history.text_at("b", 3) == "znovu"
+
+def test_history_long_text_is_compressed(tmp_path):
+    text = "dlouhá poznámka " * 2000
+    history = core.NotesHistory(tmp_path, interval=0)
+    history.record("c", text, now=1)
+    history.record("c", text + "!", now=2)
+    raw = history.path_for("c").read_text(encoding="utf-8")
+    assert len(raw) < len(text) // 4
+    assert history.text_at("c", 0) == text and history.text_at("c", 1) == text + "!"
+
+def test_history_prune_keeps_newest(tmp_path):
+    texts = edits(seed=3, steps=60)
+    history = core.NotesHistory(tmp_path, interval=0, keyframe_every=5, max_versions=20)
+    written = []
+    for i, text in enumerate(texts):
+        if not written or text != written[-1]:
+            written.append(text)
+        history.record("d", text, now=float(i))
+    count = len(history.versions("d"))
+    assert count <= 20
+    assert [history.text_at("d", i) for i in range(count)] == written[-count:]
+
+def test_history_two_windows_interleave(tmp_path):
+    a = core.NotesHistory(tmp_path, interval=0)
+    b = core.NotesHistory(tmp_path, interval=0)
+    a.record("e", "text z A", now=1)
+    b.record("e", "text z A a B", now=2)
+    a.record("e", "text z A a B a zase A", now=3)
+    versions = core.NotesHistory(tmp_path)
+    assert [versions.text_at("e", i) for i in range(3)] == ["text z A", "text z A a B", "text z A a B a zase A"]
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import maturita_core as core
+
+def entry(notes="", completed=False):
+    e = core.new_entry()
+    e["notes"], e["completed"] = notes, completed
+    return e
+
+@pytest.fixture
+def data_file(tmp_path):
+    return tmp_path / "maturita_data.json"
+
+def test_replay_after_crash(data_file):
+    core.save_state({"a": entry("snapshot"), "b": entry()}, ["a"], data_file=data_file)
+    records = [
+        {"id": "a", "entry": entry("první")},
+        {"id": "b", "entry": entry(completed=True)},
+        {"custom_selection": ["a", "b"]},
+        {"id": "a", "entry": entry("druhá")},
+    ]
+    with open(core.journal_file_for(data_file), "a", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        f.write('{"id": "a", "entry": {"notes": "useknut')     # pád uprostřed zápisu
+    entries, custom = core.load_state(data_file)
+    assert entries["a"] == entry("druhá") and entries["b"] == entry(completed=True)
+    assert custom == ["a", "b"]
+
+def test_journal_of_older_snapshot_is_ignored(data_file):
+    core.save_state({"a": entry("starý")}, None, data_file=data_file)
+    journal = core.journal_file_for(data_file)
+    old_journal = journal.read_text(encoding="utf-8")
+    old_journal += json.dumps({"id": "a", "entry": entry("ze starého žurnálu")}) + "\n"
+    core.save_state({"a": entry("nový")}, None, data_file=data_file)
+    journal.write_text(old_journal, encoding="utf-8")
+    assert core.load_state(data_file)[0]["a"] == entry("nový")
+
+def test_saver_appends_to_journal_and_compacts(data_file):
+    entries = {"a": entry()}
+    saver = core.StateSaver(entries, lambda: ["a"], data_file=data_file, delay=0, compact_every=3)
+    try:
+        for i in range(4):
+            entries["a"] = entry(f"verze {i}")
+            saver.mark_dirty("a")
+            saver.flush()
+        # první zápis je kompakce, další tři jdou do žurnálu
+        assert len(core.journal_file_for(data_file).read_text(encoding="utf-8").splitlines()) == 4
+        assert core.load_state(data_file) == ({"a": entry("verze 3")}, ["a"])
+        entries["a"] = entry("verze 4")
+        saver.mark_dirty("a")
+        saver.flush()
+    finally:
+        saver.close()
+    assert len(core.journal_file_for(data_file).read_text(encoding="utf-8").splitlines()) == 1
+    assert core.load_state(data_file) == ({"a": entry("verze 4")}, ["a"])
+
+def test_large_notes_compact_by_journal_size(tmp_path):
+    data_file = tmp_path / "maturita_data.json"
+    core.save_state({"a": entry()}, None, data_file=data_file)
+    entries, custom, sync = core.load_state_synced(data_file)
+    saver = core.StateSaver(entries, lambda: custom, sync=sync, data_file=data_file, delay=0)
+    note = "slovo " * 100_000     # 600 KB na každý záznam
+    journal = core.journal_file_for(data_file)
+    try:
+        for i in range(12):
+            entries["a"] = entry(note + str(i))
+            saver.mark_dirty("a")
+            saver.flush()
+            snapshot = data_file.stat().st_size
+            assert journal.stat().st_size <= max(core.COMPACT_MIN_BYTES, core.COMPACT_RATIO * snapshot) + len(note) + 1000
+    finally:
+        saver.close()
+    assert core.load_state(data_file)[0]["a"] == entry(note + "11")
+    assert saver._journal_records < core.COMPACT_EVERY
@@ -0,0 +1,138 @@
+import pytest
+from PySide6.QtCore import QPersistentModelIndex, Qt
+from PySide6.QtWidgets import QApplication
+
+import maturita as m
+import maturita_core as core
+
+SECTION = "Česká literatura 20. a 21. stol."
+
+def book(author, title="Dílo", genre="Próza"):
+    return {"author": author, "title": title, "genre": genre, "section": SECTION}
+
+BOOKS = [book("Řeka"), book("Ihned", "Bílá", "Drama"), book("Chata", "Áda"), book("Hrad", "Cesta", "Poezie"),
+         book("Rak", "Čas"), book("Ábel", "Ano"), book("abeceda", "Dub")]
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+@pytest.fixture
+def models(app):
+    state = {}
+    source = m.BookListModel(state)
+    proxy = m.BookProxyModel()
+    proxy.setSourceModel(source)
+    source.set_books(BOOKS)
+    return state, source, proxy
+
+def shown(proxy, role=Qt.DisplayRole):
+    return [proxy.index(r).data(role) for r in range(proxy.rowCount())]
+
+def authors(proxy):
+    return [text.split(" — ")[0] for text in shown(proxy)]
+
+@pytest.mark.parametrize("before,after", [("hrad", "chata"), ("chata", "ihned"), ("rak", "řeka"), ("abeceda", "Ábel"),
+                                          ("Adam", "Ádam"), ("cesta", "čas"), ("10 let", "abeceda"),
+                                          ("Ra", "rak")])
+def test_czech_key_order(before, after):
+    assert core.czech_key(before) < core.czech_key(after)
+
+def test_czech_key_ignores_punctuation_and_case():
+    assert sorted(["RUR", "R.U.R.", "Rur"], key=core.czech_key) == ["R.U.R.", "RUR", "Rur"]
+    assert core.czech_key("R.U.R.").split("\x00")[0] == core.czech_key("rur").split("\x00")[0]
+
+def test_proxy_sorts_with_czech_keys(models):
+    state, source, proxy = models
+    assert authors(proxy) == [b["author"] for b in BOOKS]
+    proxy.set_view("author", None)
+    assert authors(proxy) == ["abeceda", "Ábel", "Hrad", "Chata", "Ihned", "Rak", "Řeka"]
+    proxy.set_view("title", None)
+    assert [t.split(" — ")[1] for t in shown(proxy)] == ["Áda", "Ano", "Bílá", "Cesta", "Čas", "Dílo", "Dub"]
+    for row in range(proxy.rowCount()):
+        src = proxy.mapToSource(proxy.index(row))
+        assert proxy.mapFromSource(src).row() == row
+        assert src.data(Qt.UserRole) == proxy.index(row).data(Qt.UserRole)
+    # zebra podle zobrazeného řádku, ne podle zdroje
+    colors = [b.color().name() for b in shown(proxy, Qt.BackgroundRole)]
+    assert colors[0::2] == [m.COLOR_ALTERNATE] * 4 and colors[1::2] == [m.COLOR_ALTERNATE2] * 3
+
+def test_proxy_filter_keeps_selection_on_its_book(models):
+    state, source, proxy = models
+    proxy.set_view("author", None)
+    rak = core.make_id(book("Rak", "Čas"))
+    kept = QPersistentModelIndex(proxy.index(authors(proxy).index("Rak")))
+    hrad = QPersistentModelIndex(proxy.index(authors(proxy).index("Hrad")))
+    allowed = {source.ids[i] for i in (0, 2, 4)}     # Řeka, Chata, Rak
+    proxy.set_view("author", allowed)
+    assert authors(proxy) == ["Chata", "Rak", "Řeka"]
+    assert kept.data(Qt.UserRole) == rak and kept.row() == 1
+    assert not hrad.isValid()
+    assert not proxy.mapFromSource(source.index(3)).isValid()
+    # jiné pořadí stejných knih ve zdroji: proxy drží řazení i výběr
+    source.set_books(list(reversed(BOOKS)))
+    assert authors(proxy) == ["Chata", "Rak", "Řeka"] and kept.data(Qt.UserRole) == rak
+    proxy.set_view(None, allowed)
+    assert authors(proxy) == ["Rak", "Chata", "Řeka"]
+
+def test_toggled_row_maps_to_one_proxy_row(models):
+    state, source, proxy = models
+    proxy.set_view("author", {source.ids[i] for i in (0, 2, 4, 6)})     # Řeka, Chata, Rak, abeceda
+    changed = []
+    proxy.dataChanged.connect(lambda tl, br, roles: changed.append((tl.row(), br.row(), list(roles))))
+    state[source.ids[4]] = dict(core.new_entry(), completed=True)
+    source.refresh_row(source.ids[4])
+    assert changed == [(2, 2, [Qt.ForegroundRole])]
+    assert proxy.index(2).data(Qt.ForegroundRole).color().name() == m.COLOR_COMPLETED.lower()
+    # odfiltrovaný řádek se nepřekresluje vůbec
+    changed.clear()
+    source.refresh_row(source.ids[3])
+    assert changed == []
+    source.refresh_rows()
+    assert changed == [(0, 3, [Qt.ForegroundRole])]
+
+def test_window_filter_and_search_intersect(app):
+    w = m.MainWindow()
+    w.show()
+    try:
+        a, b, c = w.list_model.ids[:3]
+        for bid, text in ((a, "společné slovo"), (b, "společné"), (c, "jiné")):
+            w.state.setdefault(bid, core.new_entry())["notes"] = text
+            w.notes_index.update(bid, text)
+        w.state[a]["completed"] = True
+        w.on_search_changed("spolecne")
+        assert set(shown(w.list_proxy, Qt.UserRole)) == {a, b}
+        w.filter_combo.setCurrentText("Dokončené")
+        assert shown(w.list_proxy, Qt.UserRole) == [a]
+        w.filter_combo.setCurrentText("Nedokončené")
+        assert shown(w.list_proxy, Qt.UserRole) == [b]
+        w.on_search_changed("")
+        assert set(shown(w.list_proxy, Qt.UserRole)) == set(w.list_model.ids) - {a}
+    finally:
+        w.close()
+
+def test_window_completed_filter_uses_index_and_pending_changes(app, tmp_path, monkeypatch):
+    db_file = tmp_path / "maturita_data.sqlite3"
+    ids = [core.CATALOG.id_of(b) for b in core.ORIGINAL_20[:3]]
+    store = core.SqliteStore(db_file)
+    store.write({bid: dict(core.new_entry(), completed=True) for bid in ids[:2]})
+    store.close()
+    monkeypatch.setattr(m, "USE_SQLITE", True)
+    monkeypatch.setattr(m, "DB_FILE", db_file)
+    w = m.MainWindow()
+    try:
+        a, b, c = ids
+        assert w.store is not None and w.store.completed_ids() == {a, b}
+        # filtr nesmí na GUI vlákně čekat na zápis; neuložené přepnutí se vezme z paměti
+        monkeypatch.setattr(w.saver, "flush", lambda: pytest.fail("flush na GUI vlákně"))
+        w.state[b]["completed"] = False
+        w.state[c]["completed"] = True
+        w.saver.mark_dirty(b)
+        w.saver.mark_dirty(c)
+        w.filter_combo.setCurrentText("Dokončené")
+        assert set(shown(w.list_proxy, Qt.UserRole)) == {a, c}
+        w.filter_combo.setCurrentText("Nedokončené")
+        assert set(shown(w.list_proxy, Qt.UserRole)) == set(w.list_model.ids) - {a, c}
+        monkeypatch.undo()
+    finally:
+        w.close()
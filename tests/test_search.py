@@ -0,0 +1,40 @@
+import maturita_core as core
+
+NOTES = {
+    "a": {"notes": "Řehoř Samsa se proměnil v brouka. Samsa!"},
+    "b": {"notes": "Samotář v lese, brouk ani jeden."},
+    "c": {"notes": ""},
+}
+
+def test_search_folds_diacritics_and_matches_prefixes():
+    index = core.NotesIndex(NOTES)
+    assert len(index) == 2
+    assert [bid for bid, _ in index.search("rehor")] == ["a"]
+    assert {bid for bid, _ in index.search("sam")} == {"a", "b"}
+    # všechna slova dotazu musí být v poznámce; přesná shoda váží víc než prefix
+    assert [bid for bid, _ in index.search("brouk sam")] == ["b", "a"]
+    assert index.search("brouk neexistuje") == []
+
+def test_update_matches_fresh_index():
+    index = core.NotesIndex(NOTES)
+    index.update("a", "jen lesy")
+    index.update("b", "")
+    fresh = core.NotesIndex({"a": {"notes": "jen lesy"}})
+    assert index.postings == fresh.postings and index.vocab == fresh.vocab
+    assert [bid for bid, _ in index.search("les")] == ["a"]
+
+def test_find_match_returns_position_in_original_text():
+    text = "Poznámka: Řehoř Samsa"
+    start, end = core.NotesIndex.find_match(text, "rehor")
+    assert text[start:end] == "Řehoř"
+    assert core.NotesIndex.find_match(text, "xyz") is None
+
+def test_update_terms_matches_update():
+    text = "Řehoř Samsa se proměnil v brouka. Samsa!"
+    by_text, by_terms = core.NotesIndex(), core.NotesIndex()
+    by_text.update("h1", text)
+    by_terms.update_terms("h1", core.note_terms(text))
+    assert by_text.postings == by_terms.postings and by_text.vocab == by_terms.vocab
+    assert [bid for bid, _ in by_terms.search("rehor sam")] == ["h1"]
+    by_terms.update_terms("h1", core.note_terms(""))
+    assert by_terms.search("samsa") == [] and not by_terms.vocab
@@ -0,0 +1,84 @@
+import random
+from itertools import combinations
+
+import pytest
+
+import maturita_core as core
+
+RULES = {
+    "total": 5,
+    "section_counts": {"Starší": 1, "Novější": 2},
+    "genres": ["Próza", "Poezie", "Drama"],
+    "genre_min_each": 1,
+    "max_per_author": 2,
+}
+SECTIONS = ["Starší", "Novější", "Mimo pravidla"]
+GENRES = ["Próza", "Poezie", "Drama", "Esej"]
+
+def catalog(seed: int, size: int = 11):
+    rnd = random.Random(seed)
+    authors = [f"Autor {i}" for i in range(rnd.randint(4, 7))]
+    return [core.Book(rnd.choice(authors), f"Dílo {seed}-{i}", rnd.choice(GENRES), rnd.choice(SECTIONS))
+            for i in range(size)]
+
+def valid(books) -> bool:
+    tally = core.RuleTally(RULES)
+    for b in books:
+        tally.add(b)
+    return tally.is_valid()
+
+def brute_completions(books, selected, excluded=()):
+    """Všechna doplnění jako množiny id, prostým průchodem všech podmnožin."""
+    taken = {core.CATALOG.id_of(b) for b in list(selected) + list(excluded)}
+    rest = [b for b in books if core.CATALOG.id_of(b) not in taken]
+    need = RULES["total"] - len(selected)
+    if need < 0:
+        return set()
+    return {frozenset(core.CATALOG.id_of(b) for b in extra)
+            for extra in combinations(rest, need) if valid(list(selected) + list(extra))}
+
+def cases():
+    for seed in range(12):
+        books = catalog(seed)
+        rnd = random.Random(100 + seed)
+        for k in (0, 1, 2, 3):
+            selected = rnd.sample(books, k)
+            excluded = [b for b in rnd.sample(books, rnd.randint(0, 2)) if b not in selected]
+            yield pytest.param(books, selected, excluded, id=f"{seed}-{k}")
+
+@pytest.mark.parametrize("books,selected,excluded", list(cases()))
+def test_solver_matches_brute_force(books, selected, excluded):
+    solver = core.RuleSolver(books, RULES)
+    expected = brute_completions(books, selected, excluded)
+    assert solver.is_feasible(selected, excluded) == bool(expected)
+    assert solver.count(selected, excluded) == len(expected)
+    found = [frozenset(core.CATALOG.id_of(b) for b in c) for c in solver.iter_completions(selected, excluded)]
+    assert len(found) == len(set(found)) and set(found) == expected
+    done = solver.complete(selected, excluded=excluded)
+    if expected:
+        ids = [core.CATALOG.id_of(b) for b in done]
+        assert valid(done) and len(set(ids)) == len(ids)
+        assert frozenset(ids) - {core.CATALOG.id_of(b) for b in selected} in expected
+    else:
+        assert done is None
+
+@pytest.mark.parametrize("seed", range(12))
+def test_blocked_additions_match_brute_force(seed):
+    books = catalog(seed)
+    selected = random.Random(seed).sample(books, 2)
+    solver = core.RuleSolver(books, RULES)
+    blocked = solver.blocked_additions(selected)
+    sel_ids = {core.CATALOG.id_of(b) for b in selected}
+    for b in books:
+        bid = core.CATALOG.id_of(b)
+        if bid in sel_ids:
+            continue
+        assert (bid in blocked) == (not brute_completions(books, selected + [b])), bid
+
+def test_preferred_books_are_taken_when_possible():
+    books = catalog(5)
+    solver = core.RuleSolver(books, RULES)
+    for b in books:
+        done = solver.complete([], preferred=[b])
+        if brute_completions(books, [b]):
+            assert b in done
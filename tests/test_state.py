@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+import maturita_core as core
+
+def sample_entries():
+    return {
+        "Karel%20%C4%8Capek%7CR.U.R.": {"completed": True, "notes": "Roboti — „vzpoura“\nřádek 2",
+                                         "attachments": [{"name": "rozbor.pdf", "blob": "ab" * 32 + ".pdf"},
+                                                         "stara_priloha.txt"]},
+        "b": {"completed": False, "notes": "", "attachments": []},
+    }
+
+@pytest.mark.parametrize("custom", [None, [], ["b", "Karel%20%C4%8Capek%7CR.U.R."]])
+def test_json_round_trip(tmp_path, custom):
+    data_file = tmp_path / "maturita_data.json"
+    core.save_state(sample_entries(), custom, data_file=data_file)
+    assert core.read_state(data_file) == (sample_entries(), custom)
+    assert core.load_state(data_file) == (sample_entries(), custom)
+
+def test_json_legacy_format(tmp_path):
+    data_file = tmp_path / "maturita_data.json"
+    data_file.write_text(json.dumps(sample_entries(), ensure_ascii=False), encoding="utf-8")
+    assert core.read_state(data_file) == (sample_entries(), None)
+
+def test_read_state_raises_on_corrupt_file(tmp_path):
+    data_file = tmp_path / "maturita_data.json"
+    data_file.write_text('{"entries": {', encoding="utf-8")
+    with pytest.raises(ValueError):
+        core.read_state(data_file)
+    assert core.load_state(data_file) == ({}, None)
+
+@pytest.mark.parametrize("custom", [None, [], ["b"]])
+def test_sqlite_round_trip(tmp_path, custom):
+    path = tmp_path / "maturita_data.sqlite3"
+    store = core.SqliteStore(path)
+    store.write(sample_entries(), True, custom)
+    store.close()
+    store = core.SqliteStore(path)
+    try:
+        assert store.load() == (sample_entries(), custom)
+        assert store.completed_ids() == {"Karel%20%C4%8Capek%7CR.U.R."}
+    finally:
+        store.close()
+
+def test_sqlite_updates_only_changed_rows(tmp_path):
+    store = core.SqliteStore(tmp_path / "maturita_data.sqlite3")
+    try:
+        store.write(sample_entries(), True, ["b"])
+        entries, _ = store.load()
+        entries["b"]["attachments"].append({"name": "nová.txt", "blob": "cd" * 32 + ".txt"})
+        entries["b"]["notes"] = "změna"
+        store.write({"b": entries["b"]})
+        entries["Karel%20%C4%8Capek%7CR.U.R."]["attachments"].pop()
+        store.write({"Karel%20%C4%8Capek%7CR.U.R.": entries["Karel%20%C4%8Capek%7CR.U.R."]})
+        assert store.load() == (entries, ["b"])
+    finally:
+        store.close()
+
+def test_sqlite_migrates_json_with_journal(tmp_path):
+    data_file = tmp_path / "maturita_data.json"
+    core.save_state(sample_entries(), ["b"], data_file=data_file)
+    changed = {"completed": True, "notes": "ze žurnálu", "attachments": []}
+    with open(core.journal_file_for(data_file), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "b", "entry": changed}, ensure_ascii=False) + "\n")
+    store = core.SqliteStore(tmp_path / "maturita_data.sqlite3")
+    try:
+        assert store.migrate_from_json(data_file)
+        assert not store.migrate_from_json(data_file)
+        expected = sample_entries()
+        expected["b"] = changed
+        assert store.load() == (expected, ["b"])
+    finally:
+        store.close()
+    assert core.read_state(data_file)[0]["b"] == changed    # JSON zůstal beze změny
+
+def test_saver_writes_through_sqlite_store(tmp_path):
+    path = tmp_path / "maturita_data.sqlite3"
+    store = core.SqliteStore(path)
+    entries, custom = store.load()
+    selection = ["b"]
+    saver = core.StateSaver(entries, lambda: selection, store=store, delay=0)
+    try:
+        entries.update(sample_entries())
+        for bid in entries:
+            saver.mark_dirty(bid)
+        saver.mark_selection_dirty()
+        saver.flush()
+    finally:
+        saver.close()
+        store.close()
+    store = core.SqliteStore(path)
+    try:
+        assert store.load() == (sample_entries(), ["b"])
+    finally:
+        store.close()
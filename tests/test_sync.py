@@ -0,0 +1,135 @@
+import json
+import os
+
+import pytest
+
+import maturita_core as core
+
+def entry(notes="", completed=False):
+    e = core.new_entry()
+    e["notes"], e["completed"] = notes, completed
+    return e
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "maturita_data.json"
+    core.save_state({"a": entry("a0"), "b": entry("b0")}, None, data_file=path)
+    return path
+
+def saver_for(data_file, **kw):
+    entries, custom, sync = core.load_state_synced(data_file)
+    return entries, core.StateSaver(entries, lambda: custom, sync=sync, data_file=data_file, **kw)
+
+def test_catch_up_reads_only_foreign_records(data_file):
+    a_entries, a = saver_for(data_file)
+    b_entries, b = saver_for(data_file)
+    try:
+        a_entries["a"] = entry("z okna A")
+        a.mark_dirty("a")
+        a.flush()
+        changes, selection = b._catch_up()
+        assert changes == {"a": entry("z okna A")} and selection is None
+        assert b._catch_up() == ({}, None)
+        # vlastní záznamy se při dočítání přeskočí
+        b_entries["b"] = entry("z okna B")
+        b.mark_dirty("b")
+        b.flush()
+        assert b._catch_up() == ({}, None)
+        assert a._catch_up()[0] == {"b": entry("z okna B")}
+    finally:
+        a.close()
+        b.close()
+
+def test_replaced_journal_is_reread_from_header(data_file):
+    a_entries, a = saver_for(data_file)
+    b_entries, b = saver_for(data_file)
+    try:
+        a_entries["a"] = entry("krátká")
+        a.mark_dirty("a")
+        a.flush()
+        b._deliver(*b._catch_up())     # bez on_external se převezme rovnou do b_entries
+        assert b_entries["a"] == entry("krátká")
+        # obnova zálohy nahradí žurnál souborem se stejnou hlavičkou, ale jiným a delším obsahem
+        journal = core.journal_file_for(data_file)
+        header = journal.read_bytes().splitlines(keepends=True)[0]
+        tmp = journal.with_name(journal.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.write((json.dumps({"id": "b", "entry": entry("x" * 500), "src": "jinde"}) + "\n").encode())
+        os.replace(tmp, journal)
+        changes, _ = b._catch_up()
+        # ne zbytek řádku od starého offsetu, ale skutečný obsah nového žurnálu (a v něm už není)
+        assert changes == {"b": entry("x" * 500), "a": entry("a0")}
+    finally:
+        a.close()
+        b.close()
+
+def test_journal_of_other_compaction_is_not_appended_to(data_file):
+    # pád mezi zápisem snapshotu a založením žurnálu: žurnál má hlavičku jiného journal_id
+    core.journal_file_for(data_file).write_text(json.dumps({"journal_id": "cizí"}) + "\n", encoding="utf-8")
+    entries, saver = saver_for(data_file)
+    try:
+        entries["a"] = entry("po pádu")
+        saver.mark_dirty("a")
+        saver.flush()
+    finally:
+        saver.close()
+    assert core.read_state(data_file)[0]["a"] == entry("po pádu")
+
+def test_saver_uses_its_own_data_file(data_file):
+    entries, saver = saver_for(data_file, compact_every=1)
+    try:
+        for i in range(3):
+            entries["a"] = entry(f"verze {i}")
+            saver.mark_dirty("a")
+            saver.flush()
+    finally:
+        saver.close()
+    assert core.read_state(data_file)[0]["a"] == entry("verze 2")
+    assert not core.DATA_FILE.exists()
+
+def test_merge_entry_unions_attachments_and_flags_note_conflict():
+    a1, a2 = {"name": "a.txt", "blob": "1" * 64 + ".txt"}, {"name": "b.txt", "blob": "2" * 64 + ".txt"}
+    local = {"completed": True, "notes": "tady", "attachments": [a1, "stara.txt"]}
+    external = {"completed": False, "notes": "jinde", "attachments": [dict(a2), dict(a1)]}
+    merged, conflict = core.merge_entry(local, external)
+    assert merged == {"completed": True, "notes": "tady", "attachments": [a1, "stara.txt", a2]}
+    assert conflict and local["attachments"] == [a1, "stara.txt"]
+    assert core.merge_entry(local, dict(external, notes="tady")) == (merged, False)
+
+def test_headless_saver_keeps_local_change_over_external(data_file):
+    a_entries, a = saver_for(data_file)
+    b_entries, b = saver_for(data_file)
+    try:
+        a_entries["a"] = entry("z A")
+        a_entries["b"] = entry("b z A")
+        a.mark_dirty("a")
+        a.mark_dirty("b")
+        a.flush()
+        # B má vlastní neuloženou změnu "a"; "b" převezme, "a" ne – jeho zápis přijde po A
+        b_entries["a"] = entry("z B")
+        b.mark_dirty("a")
+        b.flush()
+        assert b_entries["b"] == entry("b z A") and b_entries["a"] == entry("z B")
+    finally:
+        a.close()
+        b.close()
+    assert core.read_state(data_file)[0] == {"a": entry("z B"), "b": entry("b z A")}
+
+def test_compaction_keeps_changes_of_other_window(data_file):
+    a_entries, a = saver_for(data_file)
+    b_entries, b = saver_for(data_file, compact_every=1)
+    try:
+        a_entries["b"] = entry("z A")
+        a.mark_dirty("b")
+        a.flush()
+        b_entries["a"] = entry("z B")
+        b.mark_dirty("a")
+        b.flush()       # kompakce B zapíše celý snapshot – "b" z okna A v něm zůstane
+        b_entries["a"] = entry("z B podruhé")
+        b.mark_dirty("a")
+        b.flush()
+    finally:
+        a.close()
+        b.close()
+    assert core.read_state(data_file)[0] == {"a": entry("z B podruhé"), "b": entry("z A")}